@@ -1,9 +1,22 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import Response, StreamingResponse
+from starlette.datastructures import FormData
+from starlette.requests import ClientDisconnect
+from starlette.formparsers import MultiPartException, MultiPartParser
+from pydantic import BaseModel, Field, ValidationError
 import numpy as np
-from typing import List, Optional
+from typing import Annotated, List, Optional, Tuple, Union
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from itertools import repeat
+import asyncio
+import importlib.util
+import json
 import logging
+import threading
 import time
 import sys
 import os
@@ -15,13 +28,59 @@ logger = logging.getLogger(__name__)
 # Añadir el directorio actual al path para importar main.py
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# Importar la clase SudokuBoardDetector de main.py
-try:
-    from main import SudokuBoardDetector
-    SUDOKU_DETECTOR_AVAILABLE = True
-except ImportError as e:
-    logger.warning(f"No se pudo importar SudokuBoardDetector: {e}")
-    SUDOKU_DETECTOR_AVAILABLE = False
+# SudokuBoardDetector (main.py) arrastra OpenCV: se importa en la primera
+# llamada a /solve_image, o al arrancar con SUDOKU_VISION_PRELOAD=1. Con
+# SUDOKU_SOLVE_ONLY=1 no se carga nunca.
+SOLVE_ONLY = os.environ.get("SUDOKU_SOLVE_ONLY", "0") == "1"
+VISION_PRELOAD = os.environ.get("SUDOKU_VISION_PRELOAD", "0") == "1"
+
+# Los detectores del servidor son headless (sin ventanas ni visualizaciones).
+# Con SUDOKU_DEBUG_DIR, una fracción SUDOKU_DEBUG_SAMPLE de las imágenes
+# deja sus fotogramas anotados en ese directorio (escritos en segundo plano)
+DEBUG_DIR = os.environ.get("SUDOKU_DEBUG_DIR", "")
+DEBUG_SAMPLE = float(os.environ.get("SUDOKU_DEBUG_SAMPLE", 0.01))
+DEBUG_QUEUE = int(os.environ.get("SUDOKU_DEBUG_QUEUE", 32))
+debug_sink = None
+
+# Reconocedor de dígitos: "templates" (correlación con templates/<n>.png)
+# o "classifier" (red de digit_classifier.py, pesos en templates/)
+RECOGNIZERS = ("templates", "classifier")
+RECOGNIZER = os.environ.get("SUDOKU_RECOGNIZER", "templates")
+if RECOGNIZER not in RECOGNIZERS:
+    raise ValueError(f"SUDOKU_RECOGNIZER={RECOGNIZER!r} no es válido (válidos: {', '.join(RECOGNIZERS)})")
+if RECOGNIZER == "classifier" and not SOLVE_ONLY:
+    from digit_classifier import PESOS_PATH
+    # Sin pesos el detector volvería a los templates mientras / dice "classifier"
+    if not os.path.exists(PESOS_PATH):
+        raise RuntimeError(f"SUDOKU_RECOGNIZER=classifier requiere los pesos en {PESOS_PATH}")
+SUDOKU_DETECTOR_AVAILABLE = not SOLVE_ONLY and importlib.util.find_spec("cv2") is not None
+_detector_pool = None
+_detector_lock = threading.Lock()
+
+def cargar_detector():
+    """
+    Devuelve el pool de detectores del proceso, importando main.py y
+    cargando los templates la primera vez (None si no está disponible)
+    """
+    global _detector_pool, debug_sink, SUDOKU_DETECTOR_AVAILABLE
+    if _detector_pool is not None or not SUDOKU_DETECTOR_AVAILABLE:
+        return _detector_pool
+    with _detector_lock:
+        if _detector_pool is None:
+            try:
+                inicio = time.perf_counter()
+                from main import DebugSink, DetectorPool
+                if DEBUG_DIR:
+                    debug_sink = DebugSink(DEBUG_DIR, DEBUG_SAMPLE, DEBUG_QUEUE)
+                config = {"headless": True, "debug_sink": debug_sink, "recognizer": RECOGNIZER}
+                pool = DetectorPool(MAX_CONCURRENT_SOLVES, config)
+                pool.precargar(MAX_CONCURRENT_SOLVES)
+                _detector_pool = pool
+                logger.info(f"Detectores cargados en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+            except ImportError as e:
+                logger.warning(f"No se pudo importar SudokuBoardDetector: {e}")
+                SUDOKU_DETECTOR_AVAILABLE = False
+    return _detector_pool
 
 # Importar py-sudoku como alternativa
 try:
@@ -31,8 +90,101 @@ except ImportError:
     PY_SUDOKU_AVAILABLE = False
     logger.warning("py-sudoku no está disponible, usando algoritmo propio")
 
+from bitmask_solver import BitmaskSudokuSolver, dimensiones_caja
+from dlx_solver import DLXSudokuSolver
+from canonical_cache import SolutionCache
+from solution_store import SolutionStore
+from conflicts import Conflicto, buscar_conflictos
+from logic_solver import LogicSudokuSolver
+from portfolio import PortfolioSolver
+from generator import DIFICULTADES, SIMETRIAS, generar_lote
+from limits import AdmissionControl, Budget, BudgetExceeded
+from sessions import SesionSudoku, SessionStore
+from metrics import (
+    BUCKETS_PASOS, BUCKETS_SEGUNDOS, Counter, Gauge, Histogram, MetricsMiddleware, Registry,
+)
+from wire_format import (
+    desempaquetar, empaquetar, grilla_a_cadena, parsear_cadena, parsear_cadenas, parsear_linea,
+)
+
+# Pool de procesos para /solve_batch (un proceso por núcleo salvo que se configure)
+BATCH_WORKERS = int(os.environ.get("SUDOKU_BATCH_WORKERS", os.cpu_count() or 1))
+MAX_BATCH_SIZE = int(os.environ.get("SUDOKU_MAX_BATCH_SIZE", 10000))
+_batch_pool: Optional[ProcessPoolExecutor] = None
+
+# /solve_stream: puzzles en vuelo por flujo y longitud máxima de línea
+STREAM_MAX_IN_FLIGHT = int(os.environ.get("SUDOKU_STREAM_IN_FLIGHT", BATCH_WORKERS * 4))
+STREAM_MAX_LINE = 64 * 1024
+
+# Presupuesto por defecto de cada resolución y control de admisión. Es
+# finito para que un puzzle patológico no ocupe un worker indefinidamente;
+# el max_ms de una petición no puede superar SUDOKU_MAX_MS_LIMIT
+# (0 en cualquiera de ellos = sin límite)
+DEFAULT_MAX_MS = float(os.environ.get("SUDOKU_DEFAULT_MAX_MS", 5000))
+DEFAULT_MAX_STEPS = int(os.environ.get("SUDOKU_DEFAULT_MAX_STEPS", 0))
+MAX_MS_LIMIT = float(os.environ.get("SUDOKU_MAX_MS_LIMIT", 30000))
+MAX_CONCURRENT_SOLVES = int(os.environ.get("SUDOKU_MAX_CONCURRENT", os.cpu_count() or 1))
+MAX_SOLVE_QUEUE = int(os.environ.get("SUDOKU_MAX_QUEUE", 16))
+RETRY_AFTER_S = int(os.environ.get("SUDOKU_RETRY_AFTER", 1))
+admission = AdmissionControl(MAX_CONCURRENT_SOLVES, MAX_SOLVE_QUEUE)
+
+# Métricas expuestas en /metrics (las resoluciones del pool se registran
+# en el proceso principal a partir de los resultados devueltos)
+metricas = Registry()
+HTTP_REQUESTS = metricas.register(Counter(
+    "sudoku_http_requests_total", "Peticiones HTTP por ruta y código", ["route", "status"]))
+HTTP_SECONDS = metricas.register(Histogram(
+    "sudoku_http_request_duration_seconds", "Duración de las peticiones HTTP", BUCKETS_SEGUNDOS, ["route"]))
+SOLVES = metricas.register(Counter(
+    "sudoku_solves_total", "Resoluciones por método y resultado", ["method", "outcome"]))
+SOLVE_SECONDS = metricas.register(Histogram(
+    "sudoku_solve_duration_seconds", "Tiempo de resolución por método", BUCKETS_SEGUNDOS, ["method"]))
+SOLVE_STEPS = metricas.register(Histogram(
+    "sudoku_solve_steps", "Pasos de búsqueda por resolución", BUCKETS_PASOS))
+CACHE_LOOKUPS = metricas.register(Counter(
+    "sudoku_cache_lookups_total", "Consultas a la caché canónica (todos los procesos)", ["result"]))
+IMAGE_STAGE_SECONDS = metricas.register(Histogram(
+    "sudoku_image_stage_duration_seconds", "Duración de cada etapa del procesado de imagen",
+    BUCKETS_SEGUNDOS, ["stage"]))
+QUEUE_WAIT_SECONDS = metricas.register(Histogram(
+    "sudoku_queue_wait_seconds", "Espera en la cola de admisión", BUCKETS_SEGUNDOS))
+ADMISSION_REJECTED = metricas.register(Counter(
+    "sudoku_admission_rejected_total", "Peticiones rechazadas con 429"))
+metricas.register(Gauge(
+    "sudoku_cache_size", "Entradas en la caché canónica del proceso principal",
+    lambda: solution_cache.stats()["size"]))
+metricas.register(Gauge(
+    "sudoku_cache_hit_ratio", "Proporción de aciertos de la caché del proceso principal",
+    lambda: solution_cache.stats()["hit_ratio"]))
+metricas.register(Gauge(
+    "sudoku_in_flight", "Resoluciones en curso o en cola", lambda: admission.stats()["in_flight"]))
+
+def obtener_pool() -> ProcessPoolExecutor:
+    """Crea el pool de procesos en el primer uso y lo reutiliza"""
+    global _batch_pool
+    if _batch_pool is None:
+        # Con fork los procesos heredan el almacén ya abierto; con spawn o
+        # forkserver lo abren al iniciarse
+        _batch_pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS, initializer=abrir_almacen)
+        logger.info(f"Pool de resolución iniciado con {BATCH_WORKERS} procesos")
+    return _batch_pool
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    abrir_almacen()
+    if VISION_PRELOAD and not SOLVE_ONLY:
+        cargar_detector()
+    yield
+    # Liberar recursos compartidos al apagar el servidor
+    global _batch_pool
+    if _batch_pool is not None:
+        _batch_pool.shutdown(cancel_futures=True)
+        _batch_pool = None
+    if debug_sink is not None:
+        debug_sink.cerrar()
+
 # Crear aplicación FastAPI
-app = FastAPI(title="Sudoku Solver API", version="2.0.0")
+app = FastAPI(title="Sudoku Solver API", version="2.0.0", lifespan=lifespan)
 
 # Configurar CORS para permitir peticiones desde Tampermonkey
 app.add_middleware(
@@ -42,10 +194,24 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware, peticiones=HTTP_REQUESTS, duracion=HTTP_SECONDS)
 
 # Modelos de datos
+
+# Presupuesto pedido por el cliente: si se indica ha de ser positivo
+MaxMs = Annotated[Optional[float], Field(gt=0)]
+MaxSteps = Annotated[Optional[int], Field(gt=0)]
+QueryMaxMs = Annotated[Optional[float], Query(gt=0)]
+QueryMaxSteps = Annotated[Optional[int], Query(gt=0)]
+
 class SudokuGrid(BaseModel):
-    grid: List[List[int]]
+    grid: Union[List[List[int]], str]
+    engine: str = "auto"
+    use_cache: bool = True
+    max_ms: MaxMs = None
+    max_steps: MaxSteps = None
+    box_rows: Optional[int] = None
+    box_cols: Optional[int] = None
 
 class SudokuSolution(BaseModel):
     solved: bool
@@ -54,14 +220,109 @@ class SudokuSolution(BaseModel):
     steps: int = 0
     time_ms: float = 0
     method: str = ""
+    cache_hit: Optional[bool] = None
+    trace: Optional[List[dict]] = None
+    difficulty: Optional[int] = None
+    level: Optional[str] = None
+    budget_exceeded: bool = False
+    timings: Optional[dict] = None
+    conflicts: Optional[List[List[int]]] = None
+    conflict_reason: Optional[str] = None
+    confidence: Optional[List[List[float]]] = None
+
+class SudokuBatchRequest(BaseModel):
+    grids: List[Union[List[List[int]], str]]
+    engine: str = "auto"
+    max_ms: MaxMs = None
+    max_steps: MaxSteps = None
+    box_rows: Optional[int] = None
+    box_cols: Optional[int] = None
+
+class SudokuBatchSolution(BaseModel):
+    results: List[SudokuSolution]
+    total: int
+    solved: int
+    workers: int
+    time_ms: float = 0
+    puzzles_per_sec: float = 0
+
+class SudokuCountRequest(BaseModel):
+    grid: List[List[int]]
+    limit: int = 1000
+    max_ms: MaxMs = None
+
+class SudokuCount(BaseModel):
+    count: int
+    exact: bool
+    limit: int
+    nodes: int = 0
+    time_ms: float = 0
+    budget_exceeded: bool = False
+
+class SudokuGenerateRequest(BaseModel):
+    count: int = 1
+    symmetry: str = "none"
+    difficulty: Optional[str] = None
+    seed: Optional[int] = None
+    max_ms: MaxMs = None
+
+class GeneratedPuzzle(BaseModel):
+    puzzle: List[List[int]]
+    solution: List[List[int]]
+    clues: int
+    difficulty: int
+    level: str
+
+class SudokuGenerateResult(BaseModel):
+    puzzles: List[GeneratedPuzzle]
+    total: int
+    time_ms: float = 0
+    puzzles_per_sec: float = 0
+    budget_exceeded: bool = False
+
+class SudokuSessionRequest(BaseModel):
+    grid: Union[List[List[int]], str]
+    max_ms: MaxMs = None
+    max_steps: MaxSteps = None
+
+class SudokuSessionState(BaseModel):
+    session_id: str
+    grid: List[List[int]]
+    remaining: int
+    expires_in_s: float
+
+class SudokuFillRequest(BaseModel):
+    row: int
+    col: int
+    value: int
+
+class SudokuHintRequest(BaseModel):
+    session_id: str
+    apply: bool = False
+
+class SudokuHint(BaseModel):
+    session_id: str
+    solved: bool
+    cell: Optional[List[int]] = None
+    value: Optional[int] = None
+    technique: Optional[str] = None
+    explanation: List[dict] = []
+    remaining: int = 0
+    time_ms: float = 0
 
 class SudokuImageRequest(BaseModel):
-    image_path: str
+    image_path: Optional[str] = None
+    engine: str = "auto"
+    max_ms: MaxMs = None
+    max_steps: MaxSteps = None
+    box_rows: int = 3
+    box_cols: int = 3
 
 # Algoritmo de backtracking puro para la API
 class APISudokuSolver:
-    def __init__(self):
+    def __init__(self, budget: Optional[Budget] = None):
         self.steps = 0
+        self.budget = budget
         
     def solve(self, grid: List[List[int]]) -> Optional[List[List[int]]]:
         """Resuelve un Sudoku usando backtracking"""
@@ -98,6 +359,8 @@ class APISudokuSolver:
         
         def solve_recursive(board):
             self.steps += 1
+            if self.budget is not None:
+                self.budget.check(self.steps)
             row, col = find_empty(board)
             
             if row is None:
@@ -118,6 +381,309 @@ class APISudokuSolver:
             return board
         return None
 
+# Motores de resolución seleccionables con el campo `engine`.
+# "auto" intenta py-sudoku y cae en el motor de máscaras de bits;
+# "portfolio" clasifica el puzzle y elige motor o los lanza en carrera.
+SOLVER_ENGINES = {
+    "bitmask": BitmaskSudokuSolver,
+    "dlx": DLXSudokuSolver,
+    "logic": LogicSudokuSolver,
+    "backtracking": APISudokuSolver,
+    "portfolio": PortfolioSolver,
+}
+
+# Motores que admiten grillas N x N distintas de 9x9 y tamaño máximo aceptado
+NXN_ENGINES = {"bitmask", "portfolio"}
+MAX_GRID_SIZE = 25
+
+# Valores admitidos en una grilla N x N (0 = vacía)
+VALORES_VALIDOS = {n: frozenset(range(n + 1)) for n in range(MAX_GRID_SIZE + 1)}
+
+# Almacén persistente en SQLite compartido por workers y pool, y que
+# sobrevive a los reinicios. Solo se usa si SUDOKU_STORE_PATH indica un
+# fichero; la ruta se fija como absoluta al arrancar y la base se abre en
+# el arranque del servidor (abrir_almacen), no al importar el módulo.
+STORE_PATH = os.path.abspath(os.environ["SUDOKU_STORE_PATH"]) if os.environ.get("SUDOKU_STORE_PATH") else None
+STORE_MAX_ENTRIES = int(os.environ.get("SUDOKU_STORE_MAX", 100000))
+solution_store: Optional[SolutionStore] = None
+
+# Caché de soluciones por forma canónica (por proceso, respaldada por el almacén)
+solution_cache = SolutionCache(int(os.environ.get("SUDOKU_CACHE_SIZE", 4096)))
+
+def abrir_almacen() -> None:
+    """Abre el almacén configurado y lo conecta a la caché (una vez por proceso)"""
+    global solution_store
+    if STORE_PATH and solution_store is None:
+        solution_store = SolutionStore(STORE_PATH, STORE_MAX_ENTRIES)
+        solution_cache.store = solution_store
+        logger.info(f"Almacén de soluciones en {STORE_PATH}")
+
+# Máximo de soluciones que /count puede enumerar en una petición
+MAX_COUNT_LIMIT = 1_000_000
+
+# Máximo de puzzles que /generate crea en una petición
+MAX_GENERATE = int(os.environ.get("SUDOKU_MAX_GENERATE", 1000))
+
+# Tiempo por defecto de una petición de /generate (acotado por
+# MAX_MS_LIMIT); al agotarse se devuelven los puzzles ya generados
+GENERATE_MAX_MS = float(os.environ.get("SUDOKU_GENERATE_MAX_MS", 30000))
+
+# Sesiones de /session y /hint: en memoria del proceso, caducan tras
+# SUDOKU_SESSION_TTL segundos sin uso
+sesiones = SessionStore(
+    float(os.environ.get("SUDOKU_SESSION_TTL", 900)),
+    int(os.environ.get("SUDOKU_MAX_SESSIONS", 10000))
+)
+
+def validar_engine(engine: str, n: int = 9) -> None:
+    if engine != "auto" and engine not in SOLVER_ENGINES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Motor desconocido: {engine}. Opciones: auto, {', '.join(SOLVER_ENGINES)}"
+        )
+    if n != 9 and engine != "auto" and engine not in NXN_ENGINES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El motor {engine} solo admite grillas 9x9. Opciones: auto, {', '.join(NXN_ENGINES)}"
+        )
+
+def validar_dimensiones(n: int, box_rows: Optional[int] = None,
+                        box_cols: Optional[int] = None) -> Tuple[int, int]:
+    """Comprueba (o deduce) las dimensiones de caja de una grilla N x N"""
+    if box_rows is None or box_cols is None:
+        box_rows, box_cols = dimensiones_caja(n) if n > 0 else (0, 0)
+    if box_rows < 2 or box_cols < 2 or box_rows * box_cols != n or n > MAX_GRID_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Dimensiones no admitidas: grilla {n}x{n} con cajas {box_rows}x{box_cols}"
+        )
+    return box_rows, box_cols
+
+def validar_grilla(grid: List[List[int]], box_rows: Optional[int] = None,
+                   box_cols: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Valida dimensiones y valores de una grilla N x N (HTTP 400 si es inválida).
+    Devuelve las dimensiones de caja, deducidas del tamaño si no se indican.
+    """
+    n = box_rows * box_cols if box_rows and box_cols else len(grid)
+    if len(grid) != n:
+        raise HTTPException(status_code=400, detail=f"La grilla debe tener {n} filas")
+    box_rows, box_cols = validar_dimensiones(n, box_rows, box_cols)
+    
+    # Una comprobación de conjunto por fila; la celda exacta solo se busca si falla
+    valores = VALORES_VALIDOS[n]
+    for i, row in enumerate(grid):
+        if len(row) != n:
+            raise HTTPException(status_code=400, detail=f"La fila {i} debe tener {n} columnas")
+        if not valores.issuperset(row):
+            j, val = next((j, val) for j, val in enumerate(row) if val not in valores)
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Valor inválido en posición ({i},{j}): {val}"
+            )
+    return box_rows, box_cols
+
+def normalizar_grilla(grid: Union[List[List[int]], str], box_rows: Optional[int] = None,
+                      box_cols: Optional[int] = None) -> Tuple[List[List[int]], int, int]:
+    """
+    Acepta una grilla como lista de filas o en formato de 81 caracteres.
+    Devuelve la grilla como lista y sus dimensiones de caja.
+    """
+    if isinstance(grid, str):
+        try:
+            return parsear_cadena(grid), 3, 3
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return (grid, *validar_grilla(grid, box_rows, box_cols))
+
+def crear_budget(max_ms: Optional[float], max_steps: Optional[int]) -> Optional[Budget]:
+    """
+    Presupuesto de la petición (acotado por MAX_MS_LIMIT) o el del
+    servidor; None solo si el servidor está configurado sin límites.
+    Con presupuesto, el modo auto no usa py-sudoku (no es interrumpible).
+    """
+    max_ms = max_ms if max_ms else DEFAULT_MAX_MS
+    max_steps = max_steps if max_steps else DEFAULT_MAX_STEPS
+    if MAX_MS_LIMIT:
+        max_ms = min(max_ms, MAX_MS_LIMIT) if max_ms else MAX_MS_LIMIT
+    if not max_ms and not max_steps:
+        return None
+    return Budget(max_ms or None, max_steps or None)
+
+@contextmanager
+def admitir_peticion():
+    """Reserva un hueco de resolución o responde 429 si la cola está llena"""
+    inicio = time.perf_counter()
+    if not admission.entrar():
+        ADMISSION_REJECTED.inc()
+        raise HTTPException(
+            status_code=429,
+            detail="Servidor saturado, reintente más tarde",
+            headers={"Retry-After": str(RETRY_AFTER_S)}
+        )
+    QUEUE_WAIT_SECONDS.observe(time.perf_counter() - inicio)
+    try:
+        yield
+    finally:
+        admission.salir()
+
+def registrar_solucion(result: SudokuSolution) -> None:
+    """Anota una resolución en las métricas (tiempo, pasos, método y caché)"""
+    if result.budget_exceeded:
+        outcome = "budget_exceeded"
+    elif result.conflicts is not None:
+        outcome = "conflict"
+    else:
+        outcome = "solved" if result.solved else "unsolved"
+    SOLVES.inc(result.method, outcome)
+    SOLVE_SECONDS.observe(result.time_ms / 1000, result.method)
+    SOLVE_STEPS.observe(result.steps)
+    if result.cache_hit is not None:
+        CACHE_LOOKUPS.inc("hit" if result.cache_hit else "miss")
+
+# Motores que empiezan propagando: ante una contradicción terminan enseguida,
+# así que antes de resolver basta con las comprobaciones lineales
+MOTORES_CON_PROPAGACION = {"bitmask", "portfolio"}
+
+def respuesta_conflicto(conflicto: Conflicto, start_time: float,
+                        method: str = "precheck") -> SudokuSolution:
+    """Respuesta para una grilla con pistas contradictorias"""
+    return SudokuSolution(
+        solved=False,
+        message=f"Grilla contradictoria: {conflicto.message}",
+        time_ms=(time.time() - start_time) * 1000,
+        method=method,
+        conflicts=[list(celda) for celda in conflicto.cells],
+        conflict_reason=conflicto.reason
+    )
+
+def resolver_grilla(grid: List[List[int]], engine: str = "auto",
+                    start_time: Optional[float] = None,
+                    use_cache: bool = True,
+                    max_ms: Optional[float] = None,
+                    max_steps: Optional[int] = None,
+                    box_rows: Optional[int] = None,
+                    box_cols: Optional[int] = None) -> SudokuSolution:
+    """Resuelve una grilla ya validada con el motor indicado"""
+    if start_time is None:
+        start_time = time.time()
+    budget = crear_budget(max_ms, max_steps)
+    # La caché y py-sudoku solo se usan con la grilla clásica 9x9
+    clasica = len(grid) == 9
+    
+    # Motor real del modo auto: py-sudoku solo sin presupuesto (no se puede
+    # interrumpir) y, si no, máscaras de bits
+    if engine == "auto":
+        engine = "py_sudoku" if budget is None and clasica and PY_SUDOKU_AVAILABLE else "bitmask"
+    
+    # Rechazar en tiempo lineal las pistas contradictorias (nunca están en
+    # la caché); la propagación completa queda para después de la caché
+    conflicto = buscar_conflictos(grid, box_rows, box_cols, propagar=False)
+    if conflicto is not None:
+        return respuesta_conflicto(conflicto, start_time)
+    
+    # Consultar la caché (la grilla tal cual y, si puede haberla, una
+    # equivalente por simetría). El motor lógico se ejecuta siempre: su
+    # valor está en la traza de deducciones.
+    usar_cache = clasica and use_cache and engine != "logic"
+    if usar_cache:
+        cached = solution_cache.buscar(grid)
+        if cached is not None:
+            return SudokuSolution(
+                solved=True,
+                solution=cached,
+                message="Resuelto desde caché",
+                steps=0,
+                time_ms=(time.time() - start_time) * 1000,
+                method="cache",
+                cache_hit=True
+            )
+    
+    # Los motores que no empiezan propagando buscan antes una contradicción
+    # por propagación, que su búsqueda tardaría en descubrir
+    propaga = engine in MOTORES_CON_PROPAGACION
+    if not propaga:
+        conflicto = buscar_conflictos(grid, box_rows, box_cols)
+        if conflicto is not None:
+            return respuesta_conflicto(conflicto, start_time)
+    
+    result = None
+    inicio_resolucion = time.perf_counter()
+    
+    # py-sudoku (modo auto sin presupuesto); si falla se sigue con bitmask
+    if engine == "py_sudoku":
+        try:
+            puzzle = Sudoku(3, 3, board=grid)
+            if puzzle.validate():
+                solved_puzzle = puzzle.solve()
+                if solved_puzzle:
+                    end_time = time.time()
+                    result = SudokuSolution(
+                        solved=True,
+                        solution=solved_puzzle.board,
+                        message="Resuelto con py-sudoku",
+                        steps=0,  # py-sudoku no provee contador de pasos
+                        time_ms=(end_time - start_time) * 1000,
+                        method="py_sudoku"
+                    )
+        except Exception as e:
+            logger.warning(f"py-sudoku falló: {e}")
+    
+    if result is None:
+        # Usar algoritmo propio (motor elegido o máscaras de bits en modo auto)
+        engine = "bitmask" if engine == "py_sudoku" else engine
+        solver = SOLVER_ENGINES[engine](budget)
+        try:
+            solution = solver.solve(grid) if clasica else solver.solve(grid, box_rows, box_cols)
+        except BudgetExceeded as e:
+            return SudokuSolution(
+                solved=False,
+                message=f"Presupuesto excedido: {e}",
+                steps=solver.steps,
+                time_ms=(time.time() - start_time) * 1000,
+                method=getattr(solver, "method", engine),
+                budget_exceeded=True
+            )
+        
+        end_time = time.time()
+        # El motor de cartera registra qué motor ganó ("portfolio:<motor>")
+        method = getattr(solver, "method", engine)
+        
+        if solution:
+            result = SudokuSolution(
+                solved=True,
+                solution=solution,
+                message=f"Resuelto con {method}",
+                steps=solver.steps,
+                time_ms=(end_time - start_time) * 1000,
+                method=method,
+                trace=getattr(solver, "trace", None),
+                difficulty=getattr(solver, "difficulty", None),
+                level=getattr(solver, "level", None)
+            )
+        else:
+            # Sin solución: localizar las pistas implicadas si la propagación
+            # basta para demostrarlo (no se hizo antes para estos motores)
+            conflicto = buscar_conflictos(grid, box_rows, box_cols) if propaga else None
+            if conflicto is not None:
+                result = respuesta_conflicto(conflicto, start_time, method)
+                result.steps = solver.steps
+                return result
+            result = SudokuSolution(
+                solved=False,
+                message="No se pudo resolver el Sudoku",
+                steps=solver.steps,
+                time_ms=(end_time - start_time) * 1000,
+                method=method
+            )
+    
+    if usar_cache:
+        result.cache_hit = False
+        if result.solved:
+            solution_cache.guardar(grid, result.solution, (time.perf_counter() - inicio_resolucion) * 1000)
+    
+    return result
+
 # Endpoints
 @app.get("/")
 def read_root():
@@ -125,167 +691,813 @@ def read_root():
         "message": "Sudoku Solver API v2.0",
         "version": "2.0.0",
         "features": {
-            "solve_grid": "Resuelve una grilla 9x9",
-            "solve_image": "Procesa y resuelve una imagen de Sudoku"
+            "solve_grid": "Resuelve una grilla 9x9 (o N x N: 4x4, 16x16, 25x25...)",
+            "solve_image": "Procesa y resuelve una imagen de Sudoku",
+            "solve_batch": "Resuelve una lista de grillas en paralelo",
+            "solve_stream": "Resuelve puzzles NDJSON en streaming",
+            "count": "Cuenta soluciones exactas con Dancing Links",
+            "generate": "Genera puzzles de solución única por simetría y dificultad",
+            "metrics": "Métricas de latencia y resolución en formato Prometheus",
+            "session": "Partidas interactivas con pistas paso a paso (/session, /hint)"
         },
+        "engines": ["auto", *SOLVER_ENGINES],
         "available_backends": {
             "sudoku_detector": SUDOKU_DETECTOR_AVAILABLE,
+            "solve_only": SOLVE_ONLY,
+            "recognizer": RECOGNIZER,
             "py_sudoku": PY_SUDOKU_AVAILABLE
         }
     }
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "timestamp": time.time()}
+    return {
+        "status": "healthy",
+        "timestamp": time.time(),
+        "cache": solution_cache.stats(),
+        "admission": admission.stats(),
+        "sessions": sesiones.stats(),
+        "store": solution_store.stats() if solution_store is not None else None,
+        "debug_sink": debug_sink.stats() if debug_sink is not None else None
+    }
+
+# Formatos de cuerpo de /solve y /solve_batch: JSON, texto de 81
+# caracteres por grilla o binario empaquetado (41 bytes por grilla)
+TIPO_JSON = "application/json"
+TIPO_TEXTO = "text/plain"
+TIPO_BINARIO = "application/octet-stream"
+GRILLA_VACIA = [[0] * 9 for _ in range(9)]
 
-@app.post("/solve", response_model=SudokuSolution)
-def solve_sudoku(sudoku: SudokuGrid):
-    """Resuelve una grilla de Sudoku 9x9"""
+def tipo_medio(cabecera: Optional[str]) -> str:
+    """Primer tipo de medio de una cabecera Content-Type o Accept"""
+    return (cabecera or "").split(",")[0].split(";")[0].strip().lower()
+
+def cuerpo_openapi(modelo) -> dict:
+    """Documenta en OpenAPI los formatos de cuerpo aceptados"""
+    return {"requestBody": {"required": True, "content": {
+        TIPO_JSON: {"schema": modelo.model_json_schema()},
+        TIPO_TEXTO: {"schema": {"type": "string"}},
+        TIPO_BINARIO: {"schema": {"type": "string", "format": "binary"}},
+    }}}
+
+def leer_compacto(request: Request, cuerpo: bytes) -> Optional[List[List[List[int]]]]:
+    """
+    Grillas de un cuerpo de texto o binario (HTTP 400 si es inválido).
+    Devuelve None si el cuerpo es JSON.
+    """
+    tipo = tipo_medio(request.headers.get("content-type"))
+    try:
+        if tipo == TIPO_TEXTO:
+            return parsear_cadenas(cuerpo)
+        if tipo == TIPO_BINARIO:
+            return desempaquetar(cuerpo).tolist()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return None
+
+def validar_json(modelo, cuerpo: bytes):
+    """Parsea y valida un cuerpo JSON en una pasada con pydantic-core (422 si falla)"""
+    try:
+        return modelo.model_validate_json(cuerpo)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+        )
+
+def respuesta_json(modelo: BaseModel) -> Response:
+    """Serializa el modelo directamente con pydantic-core, sin revalidarlo"""
+    return Response(modelo.model_dump_json(), media_type=TIPO_JSON)
+
+def respuesta_compacta(results: List[SudokuSolution], accept: Optional[str]) -> Optional[Response]:
+    """
+    Soluciones en formato compacto si Accept lo pide (una cadena de 81
+    caracteres por línea o 41 bytes por grilla); None si se pidió JSON.
+    Las grillas no resueltas se devuelven vacías.
+    """
+    tipo = tipo_medio(accept)
+    if tipo not in (TIPO_TEXTO, TIPO_BINARIO):
+        return None
+    if any(r.solved and len(r.solution) != 9 for r in results):
+        raise HTTPException(status_code=406, detail="El formato compacto solo admite grillas 9x9")
+    
+    soluciones = [r.solution if r.solved else GRILLA_VACIA for r in results]
+    headers = {"X-Solved": str(sum(1 for r in results if r.solved))}
+    if tipo == TIPO_TEXTO:
+        texto = "".join(grilla_a_cadena(s) + "\n" for s in soluciones)
+        return Response(texto, media_type=TIPO_TEXTO, headers=headers)
+    return Response(empaquetar(soluciones), media_type=TIPO_BINARIO, headers=headers)
+
+def resolver_peticion(sudoku: SudokuGrid, start_time: float) -> SudokuSolution:
     try:
-        start_time = time.time()
-        
         # Validar la grilla
-        if len(sudoku.grid) != 9:
-            raise HTTPException(status_code=400, detail="La grilla debe tener 9 filas")
-        
-        for i, row in enumerate(sudoku.grid):
-            if len(row) != 9:
-                raise HTTPException(status_code=400, detail=f"La fila {i} debe tener 9 columnas")
-            for j, val in enumerate(row):
-                if not isinstance(val, int) or val < 0 or val > 9:
-                    raise HTTPException(
-                        status_code=400, 
-                        detail=f"Valor inválido en posición ({i},{j}): {val}"
-                    )
+        grid, box_rows, box_cols = normalizar_grilla(sudoku.grid, sudoku.box_rows, sudoku.box_cols)
+        validar_engine(sudoku.engine, len(grid))
         
         # Contar celdas con pistas
-        filled_cells = sum(1 for row in sudoku.grid for cell in row if cell != 0)
-        logger.info(f"Celdas con pistas: {filled_cells}/81")
+        filled_cells = sum(1 for row in grid for cell in row if cell != 0)
+        logger.info(f"Celdas con pistas: {filled_cells}/{len(grid) ** 2}")
+        
+        with admitir_peticion():
+            result = resolver_grilla(grid, sudoku.engine, start_time, sudoku.use_cache,
+                                     sudoku.max_ms, sudoku.max_steps, box_rows, box_cols)
+        registrar_solucion(result)
+        return result
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error inesperado: {e}")
+        raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
+
+@app.get("/metrics")
+def metrics():
+    """Métricas del proceso en formato de exposición de Prometheus"""
+    return Response(metricas.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/solve", response_model=SudokuSolution, openapi_extra=cuerpo_openapi(SudokuGrid))
+async def solve_sudoku(request: Request, engine: str = "auto", use_cache: bool = True,
+                       max_ms: QueryMaxMs = None, max_steps: QueryMaxSteps = None):
+    """
+    Resuelve una grilla de Sudoku 9x9 (o N x N con box_rows/box_cols).
+    
+    El cuerpo puede ser JSON (la grilla como lista o cadena de 81
+    caracteres), text/plain con 81 caracteres o application/octet-stream
+    con 41 bytes; con los dos últimos las opciones van en la query. Con
+    Accept text/plain u application/octet-stream se responde en compacto.
+    """
+    start_time = time.time()
+    cuerpo = await request.body()
+    grids = leer_compacto(request, cuerpo)
+    if grids is None:
+        sudoku = validar_json(SudokuGrid, cuerpo)
+    elif len(grids) != 1:
+        raise HTTPException(status_code=400, detail=f"Se esperaba una grilla, se recibieron {len(grids)}")
+    else:
+        sudoku = SudokuGrid.model_construct(grid=grids[0], engine=engine, use_cache=use_cache,
+                                            max_ms=max_ms, max_steps=max_steps)
+    
+    result = await run_in_threadpool(resolver_peticion, sudoku, start_time)
+    return respuesta_compacta([result], request.headers.get("accept")) or respuesta_json(result)
+
+def resolver_lote(batch: SudokuBatchRequest, start_time: float) -> SudokuBatchSolution:
+    try:
+        validar_engine(batch.engine)
+        
+        if len(batch.grids) > MAX_BATCH_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"El lote supera el máximo de {MAX_BATCH_SIZE} grillas"
+            )
         
-        # Intentar usar py-sudoku si está disponible
-        if PY_SUDOKU_AVAILABLE:
+        # Validar todas las grillas antes de repartir trabajo
+        grids = []
+        for k, grid in enumerate(batch.grids):
             try:
-                puzzle = Sudoku(3, 3, board=sudoku.grid)
-                if puzzle.validate():
-                    solved_puzzle = puzzle.solve()
-                    if solved_puzzle:
-                        end_time = time.time()
-                        return SudokuSolution(
-                            solved=True,
-                            solution=solved_puzzle.board,
-                            message="Resuelto con py-sudoku",
-                            steps=0,  # py-sudoku no provee contador de pasos
-                            time_ms=(end_time - start_time) * 1000,
-                            method="py_sudoku"
-                        )
-            except Exception as e:
-                logger.warning(f"py-sudoku falló: {e}")
+                grid, _, _ = normalizar_grilla(grid, batch.box_rows, batch.box_cols)
+                validar_engine(batch.engine, len(grid))
+            except HTTPException as e:
+                raise HTTPException(status_code=400, detail=f"Grilla {k}: {e.detail}")
+            grids.append(grid)
         
-        # Usar algoritmo propio como fallback
-        solver = APISudokuSolver()
-        solution = solver.solve(sudoku.grid)
+        total = len(grids)
+        chunksize = max(1, total // (BATCH_WORKERS * 4))
+        with admitir_peticion():
+            results = list(obtener_pool().map(
+                resolver_grilla, grids, repeat(batch.engine), repeat(None), repeat(True),
+                repeat(batch.max_ms), repeat(batch.max_steps),
+                repeat(batch.box_rows), repeat(batch.box_cols), chunksize=chunksize
+            ))
+        for result in results:
+            registrar_solucion(result)
         
-        end_time = time.time()
+        elapsed = time.time() - start_time
+        logger.info(f"Lote de {total} grillas resuelto en {elapsed * 1000:.1f} ms")
         
-        if solution:
-            return SudokuSolution(
-                solved=True,
-                solution=solution,
-                message="Resuelto con backtracking",
-                steps=solver.steps,
-                time_ms=(end_time - start_time) * 1000,
-                method="backtracking"
-            )
-        else:
-            return SudokuSolution(
-                solved=False,
-                message="No se pudo resolver el Sudoku",
-                steps=solver.steps,
-                time_ms=(end_time - start_time) * 1000,
-                method="backtracking"
-            )
+        return SudokuBatchSolution(
+            results=results,
+            total=total,
+            solved=sum(1 for r in results if r.solved),
+            workers=BATCH_WORKERS,
+            time_ms=elapsed * 1000,
+            puzzles_per_sec=total / elapsed if elapsed > 0 else 0
+        )
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error inesperado: {e}")
+        logger.error(f"Error resolviendo lote: {e}")
         raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
 
-@app.post("/solve_image", response_model=SudokuSolution)
-def solve_sudoku_image(request: SudokuImageRequest):
-    """Procesa una imagen de Sudoku y la resuelve"""
-    if not SUDOKU_DETECTOR_AVAILABLE:
-        raise HTTPException(
-            status_code=501, 
-            detail="Funcionalidad de imagen no disponible (SudokuBoardDetector no encontrado)"
-        )
+@app.post("/solve_batch", response_model=SudokuBatchSolution,
+          openapi_extra=cuerpo_openapi(SudokuBatchRequest))
+async def solve_sudoku_batch(request: Request, engine: str = "auto",
+                             max_ms: QueryMaxMs = None, max_steps: QueryMaxSteps = None):
+    """
+    Resuelve varias grillas repartiéndolas entre los procesos del pool.
+    Admite los mismos formatos que /solve: en texto una grilla por línea y
+    en binario bloques consecutivos de 41 bytes.
+    """
+    start_time = time.time()
+    cuerpo = await request.body()
+    grids = leer_compacto(request, cuerpo)
+    if grids is None:
+        batch = validar_json(SudokuBatchRequest, cuerpo)
+    else:
+        batch = SudokuBatchRequest.model_construct(grids=grids, engine=engine,
+                                                   max_ms=max_ms, max_steps=max_steps)
     
+    result = await run_in_threadpool(resolver_lote, batch, start_time)
+    return respuesta_compacta(result.results, request.headers.get("accept")) or respuesta_json(result)
+
+class BodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse que no escucha la desconexión en paralelo: con ASGI
+    < 2.4 ese oyente consume los mensajes del cuerpo que el generador aún
+    está leyendo. La desconexión se detecta al leer (ClientDisconnect).
+    """
+    
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self.stream_response(send)
+        finally:
+            # Cerrar el generador aunque el envío falle: su finally cancela
+            # el trabajo pendiente
+            if hasattr(self.body_iterator, "aclose"):
+                await self.body_iterator.aclose()
+        if self.background is not None:
+            await self.background()
+
+async def leer_lineas(request: Request):
+    """Itera las líneas del cuerpo a medida que llegan, sin cargarlo entero"""
+    pendiente = b""
+    async for chunk in request.stream():
+        pendiente += chunk
+        *lineas, pendiente = pendiente.split(b"\n")
+        for linea in lineas:
+            yield linea
+        if len(pendiente) > STREAM_MAX_LINE:
+            raise ValueError(f"Línea de más de {STREAM_MAX_LINE} bytes")
+    if pendiente:
+        yield pendiente
+
+@app.post("/solve_stream")
+async def solve_sudoku_stream(request: Request, engine: str = "auto",
+                              max_ms: QueryMaxMs = None, max_steps: QueryMaxSteps = None):
+    """
+    Resuelve un flujo NDJSON de puzzles (81 caracteres o grillas JSON) y
+    devuelve un resultado NDJSON por puzzle, etiquetado con su índice, en
+    el orden en que terminan, sin esperar a que llegue la línea siguiente.
+    Solo hay STREAM_MAX_IN_FLIGHT puzzles en curso a la vez, por lo que la
+    memoria no crece con la longitud del flujo.
+    
+    Cada puzzle ocupa un hueco de admisión solo mientras se resuelve, así
+    un flujo abierto no bloquea al resto de endpoints; si la cola está
+    llena, o el puzzle falla, su línea lleva el índice y el error.
+    """
+    validar_engine(engine)
+    # Al cerrarse el flujo: los puzzles aún sin hueco no llegan a enviarse
+    # y los que esperan en el pool se cancelan (los que ya corren terminan
+    # solos dentro de su presupuesto)
+    cerrado = threading.Event()
+    enviados = set()
+    
+    def linea_ndjson(dato: dict) -> str:
+        return json.dumps(dato) + "\n"
+    
+    def resolver_admitido(grid: List[List[int]]) -> Optional[SudokuSolution]:
+        with admitir_peticion():
+            if cerrado.is_set():
+                return None
+            futuro = obtener_pool().submit(resolver_grilla, grid, engine, None, True, max_ms, max_steps)
+            enviados.add(futuro)
+            try:
+                return futuro.result()
+            except CancelledError:
+                return None
+            finally:
+                enviados.discard(futuro)
+    
+    async def resolver_indexado(index: int, grid: List[List[int]]) -> str:
+        try:
+            result = await run_in_threadpool(resolver_admitido, grid)
+        except HTTPException as e:
+            return linea_ndjson({"index": index, "error": e.detail})
+        except Exception as e:
+            # Un puzzle que falla no corta el flujo: se informa en su línea
+            logger.error(f"Error resolviendo el puzzle {index} del flujo: {e}")
+            return linea_ndjson({"index": index, "error": f"Error interno: {str(e)}"})
+        if result is None:
+            return linea_ndjson({"index": index, "error": "Flujo cerrado"})
+        registrar_solucion(result)
+        # Serializado por pydantic-core; se antepone el índice al objeto
+        return f'{{"index":{index},' + result.model_dump_json()[1:] + "\n"
+    
+    async def generar():
+        lineas = leer_lineas(request)
+        en_curso = set()
+        siguiente = None
+        entrada_abierta = True
+        index = 0
+        try:
+            while entrada_abierta or en_curso:
+                # Se lee la línea siguiente a la vez que se espera lo que está
+                # en curso, salvo que ya se haya alcanzado el límite
+                if entrada_abierta and siguiente is None and len(en_curso) < STREAM_MAX_IN_FLIGHT:
+                    siguiente = asyncio.ensure_future(lineas.__anext__())
+                esperadas = (en_curso | {siguiente}) if siguiente is not None else en_curso
+                hechas, _ = await asyncio.wait(esperadas, return_when=asyncio.FIRST_COMPLETED)
+                
+                for tarea in hechas & en_curso:
+                    en_curso.discard(tarea)
+                    yield tarea.result()
+                
+                if siguiente not in hechas:
+                    continue
+                tarea, siguiente = siguiente, None
+                try:
+                    linea = tarea.result()
+                except StopAsyncIteration:
+                    entrada_abierta = False
+                    continue
+                except ClientDisconnect:
+                    # Nadie va a leer lo que falta: el finally lo cancela
+                    return
+                except ValueError as e:
+                    entrada_abierta = False
+                    yield linea_ndjson({"index": index, "error": str(e)})
+                    continue
+                
+                if not linea.strip():
+                    continue
+                try:
+                    grid = parsear_linea(linea.decode())
+                    validar_grilla(grid)
+                    validar_engine(engine, len(grid))
+                except HTTPException as e:
+                    yield linea_ndjson({"index": index, "error": e.detail})
+                    index += 1
+                    continue
+                except (ValueError, UnicodeDecodeError) as e:
+                    yield linea_ndjson({"index": index, "error": str(e)})
+                    index += 1
+                    continue
+                
+                en_curso.add(asyncio.ensure_future(resolver_indexado(index, grid)))
+                index += 1
+        finally:
+            cerrado.set()
+            for futuro in list(enviados):
+                futuro.cancel()
+            for tarea in en_curso:
+                tarea.cancel()
+            if siguiente is not None:
+                siguiente.cancel()
+                await asyncio.gather(siguiente, return_exceptions=True)
+            await lineas.aclose()
+    
+    return BodyStreamingResponse(generar(), media_type="application/x-ndjson")
+
+@app.post("/count", response_model=SudokuCount)
+def count_solutions(request: SudokuCountRequest):
+    """Cuenta las soluciones de una grilla hasta el límite indicado"""
     try:
         start_time = time.time()
+        validar_grilla(request.grid, 3, 3)
         
-        # Verificar que la imagen existe
-        if not os.path.exists(request.image_path):
-            raise HTTPException(status_code=404, detail="Imagen no encontrada")
+        if request.limit < 1 or request.limit > MAX_COUNT_LIMIT:
+            raise HTTPException(
+                status_code=400,
+                detail=f"El límite debe estar entre 1 y {MAX_COUNT_LIMIT}"
+            )
         
-        # Usar SudokuBoardDetector para procesar la imagen
-        detector = SudokuBoardDetector()
+        solver = DLXSudokuSolver(crear_budget(request.max_ms, None))
+        with admitir_peticion():
+            try:
+                total = solver.count(request.grid, request.limit)
+            except BudgetExceeded:
+                # Conteo parcial: es una cota inferior
+                return SudokuCount(
+                    count=solver.solutions,
+                    exact=False,
+                    limit=request.limit,
+                    nodes=solver.steps,
+                    time_ms=(time.time() - start_time) * 1000,
+                    budget_exceeded=True
+                )
         
-        # Obtener la grilla desde la imagen
-        grid_result = detector.obtener_grilla_final(request.image_path)
+        return SudokuCount(
+            count=total,
+            exact=total < request.limit,
+            limit=request.limit,
+            nodes=solver.steps,
+            time_ms=(time.time() - start_time) * 1000
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error contando soluciones: {e}")
+        raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
+
+@app.post("/generate", response_model=SudokuGenerateResult)
+def generate_puzzles(request: SudokuGenerateRequest):
+    """
+    Genera puzzles de solución única repartiéndolos entre los procesos del
+    pool, sin pasar de max_ms (o SUDOKU_GENERATE_MAX_MS): si se agota se
+    devuelven los generados hasta entonces con budget_exceeded.
+    """
+    try:
+        start_time = time.time()
         
-        if grid_result is None:
-            return SudokuSolution(
-                solved=False,
-                message="No se pudo detectar el Sudoku en la imagen",
-                time_ms=(time.time() - start_time) * 1000,
-                method="image_processing"
+        if request.symmetry not in SIMETRIAS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Simetría desconocida: {request.symmetry}. Opciones: {', '.join(SIMETRIAS)}"
+            )
+        if request.difficulty is not None and request.difficulty not in DIFICULTADES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Dificultad desconocida: {request.difficulty}. Opciones: {', '.join(DIFICULTADES)}"
+            )
+        if request.count < 1 or request.count > MAX_GENERATE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"count debe estar entre 1 y {MAX_GENERATE}"
             )
         
-        # Resolver la grilla detectada
-        grid_list = grid_result.tolist()
+        # Hora límite compartida por todos los procesos del pool; los
+        # puzzles que no llegan a tiempo vuelven como None
+        max_ms = request.max_ms if request.max_ms else GENERATE_MAX_MS
+        if MAX_MS_LIMIT:
+            max_ms = min(max_ms, MAX_MS_LIMIT)
+        hasta = start_time + max_ms / 1000
         
-        # Usar py-sudoku si está disponible
-        if PY_SUDOKU_AVAILABLE:
+        chunksize = max(1, request.count // (BATCH_WORKERS * 4))
+        with admitir_peticion():
             try:
-                puzzle = Sudoku(3, 3, board=grid_list)
-                if puzzle.validate():
-                    solved_puzzle = puzzle.solve()
-                    if solved_puzzle:
-                        end_time = time.time()
-                        return SudokuSolution(
-                            solved=True,
-                            solution=solved_puzzle.board,
-                            message="Sudoku detectado y resuelto",
-                            steps=0,
-                            time_ms=(end_time - start_time) * 1000,
-                            method="image_processing+py_sudoku"
-                        )
-            except Exception as e:
-                logger.warning(f"py-sudoku falló en solución de imagen: {e}")
+                generados = list(generar_lote(request.count, request.symmetry, request.difficulty,
+                                              request.seed, obtener_pool(), chunksize, hasta))
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=str(e))
+        puzzles = [GeneratedPuzzle(**g._asdict()) for g in generados if g is not None]
         
-        # Fallback a algoritmo propio
-        solver = APISudokuSolver()
-        solution = solver.solve(grid_list)
+        elapsed = time.time() - start_time
+        logger.info(f"{len(puzzles)}/{request.count} puzzles generados en {elapsed * 1000:.1f} ms")
         
-        end_time = time.time()
+        return SudokuGenerateResult(
+            puzzles=puzzles,
+            total=len(puzzles),
+            time_ms=elapsed * 1000,
+            puzzles_per_sec=len(puzzles) / elapsed if elapsed > 0 else 0,
+            budget_exceeded=len(puzzles) < request.count
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error generando puzzles: {e}")
+        raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
+
+def obtener_sesion(session_id: str) -> SesionSudoku:
+    sesion = sesiones.obtener(session_id)
+    if sesion is None:
+        raise HTTPException(status_code=404, detail="Sesión no encontrada o caducada")
+    return sesion
+
+def estado_sesion(session_id: str, sesion: SesionSudoku) -> SudokuSessionState:
+    return SudokuSessionState(
+        session_id=session_id,
+        grid=sesion.grid,
+        remaining=sesion.restantes,
+        expires_in_s=sesiones.ttl_s
+    )
+
+@app.post("/session", response_model=SudokuSessionState)
+def create_session(request: SudokuSessionRequest):
+    """
+    Crea una partida interactiva 9x9. La grilla se resuelve una sola vez;
+    después /hint y /session/{id}/fill trabajan sobre el estado guardado.
+    """
+    try:
+        grid, box_rows, box_cols = normalizar_grilla(request.grid)
+        if len(grid) != 9:
+            raise HTTPException(status_code=400, detail="Las sesiones solo admiten grillas 9x9")
         
-        if solution:
-            return SudokuSolution(
-                solved=True,
-                solution=solution,
-                message="Sudoku detectado y resuelto",
-                steps=solver.steps,
-                time_ms=(end_time - start_time) * 1000,
-                method="image_processing+backtracking"
+        conflicto = buscar_conflictos(grid)
+        if conflicto is not None:
+            raise HTTPException(
+                status_code=422,
+                detail={"message": f"Grilla contradictoria: {conflicto.message}",
+                        "conflicts": [list(celda) for celda in conflicto.cells]}
             )
-        else:
-            return SudokuSolution(
-                solved=False,
-                message="Sudoku detectado pero no se pudo resolver",
-                steps=solver.steps,
-                time_ms=(end_time - start_time) * 1000,
-                method="image_processing"
+        
+        solver = BitmaskSudokuSolver(crear_budget(request.max_ms, request.max_steps))
+        with admitir_peticion():
+            try:
+                solucion = solver.solve(grid)
+            except BudgetExceeded as e:
+                raise HTTPException(status_code=422, detail=f"Presupuesto excedido: {e}")
+        if solucion is None:
+            raise HTTPException(status_code=422, detail="El Sudoku no tiene solución")
+        
+        sesion = SesionSudoku(grid, solucion)
+        session_id = sesiones.crear(sesion)
+        logger.info(f"Sesión creada ({sesion.restantes} celdas vacías)")
+        return estado_sesion(session_id, sesion)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error creando sesión: {e}")
+        raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
+
+@app.get("/session/{session_id}", response_model=SudokuSessionState)
+def get_session(session_id: str):
+    """Estado actual de la grilla de una sesión"""
+    return estado_sesion(session_id, obtener_sesion(session_id))
+
+@app.post("/session/{session_id}/fill", response_model=SudokuSessionState)
+def fill_cell(session_id: str, request: SudokuFillRequest):
+    """Rellena (o borra con value=0) una celda; 409 si no coincide con la solución"""
+    sesion = obtener_sesion(session_id)
+    if not (0 <= request.row < 9 and 0 <= request.col < 9 and 0 <= request.value <= 9):
+        raise HTTPException(status_code=400, detail="Celda o valor fuera de rango")
+    
+    with sesion.lock:
+        try:
+            correcto = sesion.rellenar(request.row, request.col, request.value)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        if not correcto:
+            raise HTTPException(
+                status_code=409,
+                detail=f"El valor {request.value} no es correcto en ({request.row},{request.col})"
             )
+        return estado_sesion(session_id, sesion)
+
+@app.delete("/session/{session_id}")
+def delete_session(session_id: str):
+    if not sesiones.eliminar(session_id):
+        raise HTTPException(status_code=404, detail="Sesión no encontrada o caducada")
+    return {"deleted": True}
+
+@app.post("/hint", response_model=SudokuHint)
+def get_hint(request: SudokuHintRequest):
+    """
+    Siguiente movimiento de una sesión, calculado desde los candidatos
+    guardados (solo se avanzan las deducciones necesarias). Con `apply`
+    el movimiento se rellena en la sesión.
+    """
+    start_time = time.time()
+    sesion = obtener_sesion(request.session_id)
+    
+    with sesion.lock:
+        pista = sesion.pista()
+        if pista is not None and request.apply:
+            sesion.rellenar(*pista["cell"], pista["value"])
+        restantes = sesion.restantes
+    
+    return SudokuHint(
+        session_id=request.session_id,
+        solved=pista is None,
+        remaining=restantes,
+        time_ms=(time.time() - start_time) * 1000,
+        **(pista or {})
+    )
+
+def procesar_imagen(request: SudokuImageRequest, start_time: float,
+                    datos: Optional[bytes] = None) -> SudokuSolution:
+    """Detecta la grilla de la imagen (en `datos` o en image_path) y la resuelve"""
+    # Obtener la grilla desde la imagen con un detector del pool
+    with cargar_detector().usar(request.box_rows, request.box_cols) as detector:
+        if datos is not None:
+            grid_result = detector.obtener_grilla_desde_bytes(datos)
+        else:
+            grid_result = detector.obtener_grilla_final(request.image_path)
+        tiempos = dict(detector.tiempos)
+        conteos = dict(detector.conteos)
+        confianza = detector.confianza
+    for etapa, ms in tiempos.items():
+        IMAGE_STAGE_SECONDS.observe(ms / 1000, etapa)
+    
+    # Desglose por etapa (ms) y trabajo realizado; la resolución se añade al final
+    timings = {
+        "stages_ms": {etapa: round(ms, 3) for etapa, ms in tiempos.items()},
+        "counts": conteos,
+    }
+    
+    if grid_result is None:
+        return SudokuSolution(
+            solved=False,
+            message="No se pudo detectar el Sudoku en la imagen",
+            time_ms=(time.time() - start_time) * 1000,
+            method="image_processing",
+            timings=timings
+        )
+    
+    # Resolver la grilla detectada
+    grid_list = grid_result.tolist()
+    inicio_resolucion = time.perf_counter()
+    
+    def con_tiempos(result: SudokuSolution) -> SudokuSolution:
+        timings["stages_ms"]["solve"] = round((time.perf_counter() - inicio_resolucion) * 1000, 3)
+        result.timings = timings
+        # Confianza del reconocimiento por celda, para señalar lecturas dudosas
+        result.confidence = np.round(confianza, 3).tolist()
+        return result
+    
+    # Un dígito mal reconocido suele dejar pistas contradictorias: se
+    # devuelven las celdas implicadas para revisarlas en lugar de resolver
+    conflicto = buscar_conflictos(grid_list, request.box_rows, request.box_cols)
+    if conflicto is not None:
+        result = respuesta_conflicto(conflicto, start_time, "image_processing")
+        result.message = f"Sudoku detectado con pistas contradictorias: {conflicto.message}"
+        return con_tiempos(result)
+    
+    # La misma captura (o una equivalente) puede estar ya resuelta en la
+    # caché o en el almacén persistente
+    usar_cache = len(grid_list) == 9 and request.engine != "logic"
+    if usar_cache:
+        cached = solution_cache.buscar(grid_list)
+        if cached is not None:
+            return con_tiempos(SudokuSolution(
+                solved=True,
+                solution=cached,
+                message="Sudoku detectado y resuelto desde caché",
+                time_ms=(time.time() - start_time) * 1000,
+                method="image_processing+cache",
+                cache_hit=True
+            ))
+    
+    def guardar(solucion: List[List[int]]) -> None:
+        if usar_cache:
+            solution_cache.guardar(grid_list, solucion, (time.perf_counter() - inicio_resolucion) * 1000)
+    
+    # Usar py-sudoku si está disponible (solo en modo auto y sin presupuesto)
+    budget = crear_budget(request.max_ms, request.max_steps)
+    if request.engine == "auto" and budget is None and PY_SUDOKU_AVAILABLE:
+        try:
+            puzzle = Sudoku(request.box_cols, request.box_rows, board=grid_list)
+            if puzzle.validate():
+                solved_puzzle = puzzle.solve()
+                if solved_puzzle:
+                    end_time = time.time()
+                    guardar(solved_puzzle.board)
+                    return con_tiempos(SudokuSolution(
+                        solved=True,
+                        solution=solved_puzzle.board,
+                        message="Sudoku detectado y resuelto",
+                        steps=0,
+                        time_ms=(end_time - start_time) * 1000,
+                        method="image_processing+py_sudoku"
+                    ))
+        except Exception as e:
+            logger.warning(f"py-sudoku falló en solución de imagen: {e}")
+    
+    # Fallback a algoritmo propio
+    engine = "bitmask" if request.engine == "auto" else request.engine
+    solver = SOLVER_ENGINES[engine](budget)
+    try:
+        if len(grid_list) == 9:
+            solution = solver.solve(grid_list)
+        else:
+            solution = solver.solve(grid_list, request.box_rows, request.box_cols)
+    except BudgetExceeded as e:
+        return con_tiempos(SudokuSolution(
+            solved=False,
+            message=f"Sudoku detectado pero se excedió el presupuesto: {e}",
+            steps=solver.steps,
+            time_ms=(time.time() - start_time) * 1000,
+            method=f"image_processing+{getattr(solver, 'method', engine)}",
+            budget_exceeded=True
+        ))
+    
+    end_time = time.time()
+    
+    if solution:
+        guardar(solution)
+        return con_tiempos(SudokuSolution(
+            solved=True,
+            solution=solution,
+            message="Sudoku detectado y resuelto",
+            steps=solver.steps,
+            time_ms=(end_time - start_time) * 1000,
+            method=f"image_processing+{getattr(solver, 'method', engine)}"
+        ))
+    else:
+        return con_tiempos(SudokuSolution(
+            solved=False,
+            message="Sudoku detectado pero no se pudo resolver",
+            steps=solver.steps,
+            time_ms=(end_time - start_time) * 1000,
+            method="image_processing"
+        ))
+
+# /solve_image admite la imagen subida (multipart o cuerpo binario) además
+# de una ruta del servidor en JSON; se decodifica en memoria con cv2.imdecode
+MAX_IMAGE_BYTES = int(os.environ.get("SUDOKU_MAX_IMAGE_BYTES", 10 * 1024 * 1024))
+TIPO_MULTIPART = "multipart/form-data"
+MULTIPART_AVAILABLE = importlib.util.find_spec("python_multipart") is not None
+
+# Holgura sobre MAX_IMAGE_BYTES para los delimitadores, cabeceras y campos
+# de un cuerpo multipart
+MARGEN_MULTIPART = 64 * 1024
+
+def cuerpo_imagen_openapi() -> dict:
+    """Documenta en OpenAPI los formatos de cuerpo de /solve_image"""
+    binario = {"schema": {"type": "string", "format": "binary"}}
+    return {"requestBody": {"required": True, "content": {
+        TIPO_JSON: {"schema": SudokuImageRequest.model_json_schema()},
+        TIPO_MULTIPART: {"schema": {"type": "object", "properties": {"image": binario["schema"]}}},
+        "image/*": binario,
+        TIPO_BINARIO: binario,
+    }}}
+
+def limite_cuerpo_imagen(request: Request) -> int:
+    """Bytes que puede ocupar el cuerpo de /solve_image según su tipo"""
+    if tipo_medio(request.headers.get("content-type")) == TIPO_MULTIPART:
+        return MAX_IMAGE_BYTES + MARGEN_MULTIPART
+    return MAX_IMAGE_BYTES
+
+def comprobar_tamano_imagen(request: Request) -> None:
+    longitud = request.headers.get("content-length")
+    if longitud is not None and longitud.isdigit() and int(longitud) > limite_cuerpo_imagen(request):
+        raise HTTPException(status_code=413, detail=f"La imagen supera el máximo de {MAX_IMAGE_BYTES} bytes")
+
+async def leer_cuerpo_limitado(request: Request, limite: int) -> bytes:
+    """
+    Lee el cuerpo contando los bytes a medida que llegan: corta con 413 en
+    cuanto supera el límite, también sin Content-Length (chunked)
+    """
+    partes = []
+    recibidos = 0
+    async for parte in request.stream():
+        recibidos += len(parte)
+        if recibidos > limite:
+            raise HTTPException(status_code=413, detail=f"La imagen supera el máximo de {MAX_IMAGE_BYTES} bytes")
+        partes.append(parte)
+    return b"".join(partes)
+
+async def leer_formulario(request: Request, cuerpo: bytes) -> FormData:
+    """
+    Analiza en memoria un cuerpo multipart ya leído (y acotado). Starlette
+    vuelca a disco los ficheros de más de 1 MB; aquí no hace falta.
+    """
+    async def flujo():
+        yield cuerpo
+    
+    parser = MultiPartParser(request.headers, flujo(), max_files=1, max_fields=8)
+    parser.spool_max_size = len(cuerpo) + 1
+    try:
+        return await parser.parse()
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
+
+async def leer_imagen(request: Request) -> bytes:
+    """Bytes de la imagen de un cuerpo multipart (campo image o file) o binario"""
+    comprobar_tamano_imagen(request)
+    multipart = tipo_medio(request.headers.get("content-type")) == TIPO_MULTIPART
+    if multipart and not MULTIPART_AVAILABLE:
+        raise HTTPException(
+            status_code=415,
+            detail="multipart/form-data requiere python-multipart; enviar la imagen como cuerpo binario"
+        )
+    
+    # Ambos formatos pasan por el mismo conteo, así un multipart chunked
+    # tampoco puede superar el límite
+    datos = await leer_cuerpo_limitado(request, limite_cuerpo_imagen(request))
+    if multipart:
+        form = await leer_formulario(request, datos)
+        try:
+            archivo = form.get("image") or form.get("file")
+            if archivo is None or isinstance(archivo, str):
+                raise HTTPException(status_code=400, detail="Falta el fichero de imagen (campo image)")
+            datos = await archivo.read()
+        finally:
+            await form.close()
+    
+    if len(datos) > MAX_IMAGE_BYTES:
+        raise HTTPException(status_code=413, detail=f"La imagen supera el máximo de {MAX_IMAGE_BYTES} bytes")
+    if not datos:
+        raise HTTPException(status_code=400, detail="El cuerpo no contiene ninguna imagen")
+    return datos
+
+def resolver_imagen(opciones: SudokuImageRequest, datos: Optional[bytes], start_time: float) -> SudokuSolution:
+    try:
+        validar_dimensiones(opciones.box_rows * opciones.box_cols, opciones.box_rows, opciones.box_cols)
+        validar_engine(opciones.engine, opciones.box_rows * opciones.box_cols)
+        
+        # Verificar que la imagen existe
+        if datos is None:
+            if not opciones.image_path:
+                raise HTTPException(status_code=400, detail="Falta image_path o la imagen en el cuerpo")
+            if not os.path.exists(opciones.image_path):
+                raise HTTPException(status_code=404, detail="Imagen no encontrada")
+        
+        with admitir_peticion():
+            result = procesar_imagen(opciones, start_time, datos)
+        registrar_solucion(result)
+        return result
     
     except HTTPException:
         raise
@@ -293,6 +1505,40 @@ def solve_sudoku_image(request: SudokuImageRequest):
         logger.error(f"Error procesando imagen: {e}")
         raise HTTPException(status_code=500, detail=f"Error procesando imagen: {str(e)}")
 
+@app.post("/solve_image", response_model=SudokuSolution, openapi_extra=cuerpo_imagen_openapi())
+async def solve_sudoku_image(request: Request, engine: str = "auto", max_ms: QueryMaxMs = None,
+                             max_steps: QueryMaxSteps = None, box_rows: int = 3, box_cols: int = 3):
+    """
+    Procesa una imagen de Sudoku y la resuelve.
+    
+    El cuerpo puede ser JSON con image_path (una ruta del servidor), un
+    multipart/form-data con el fichero en el campo image, o la imagen
+    codificada (PNG, JPEG...) como cuerpo image/* u octet-stream; en
+    estos dos casos las opciones van en la query y no se usa el disco.
+    """
+    if SOLVE_ONLY:
+        raise HTTPException(
+            status_code=501,
+            detail="Funcionalidad de imagen desactivada (SUDOKU_SOLVE_ONLY=1)"
+        )
+    if await run_in_threadpool(cargar_detector) is None:
+        raise HTTPException(
+            status_code=501, 
+            detail="Funcionalidad de imagen no disponible (SudokuBoardDetector no encontrado)"
+        )
+    
+    start_time = time.time()
+    if tipo_medio(request.headers.get("content-type")) in ("", TIPO_JSON):
+        opciones = validar_json(SudokuImageRequest, await request.body())
+        datos = None
+    else:
+        datos = await leer_imagen(request)
+        opciones = SudokuImageRequest.model_construct(engine=engine, max_ms=max_ms, max_steps=max_steps,
+                                                      box_rows=box_rows, box_cols=box_cols)
+    
+    result = await run_in_threadpool(resolver_imagen, opciones, datos, start_time)
+    return respuesta_json(result)
+
 # Ejecutar el servidor
 if __name__ == "__main__":
     import uvicorn
@@ -22,15 +22,18 @@ except ImportError as e:
 class SudokuAutoSolver:
     """Clase para automatizar la resolución de Sudoku en sudoku.com"""
     
-    def __init__(self, browser_url: str = "https://sudoku.com"):
+    def __init__(self, browser_url: str = "https://sudoku.com", box_rows: int = 3, box_cols: int = 3):
         """
         Inicializa el solucionador automático de Sudoku.
         
         Args:
             browser_url: URL del sitio web de Sudoku (por defecto: sudoku.com)
+            box_rows: Filas de cada caja (3 para el tablero clásico 9x9)
+            box_cols: Columnas de cada caja
         """
         self.browser_url = browser_url
-        self.detector = SudokuBoardDetector()
+        self.detector = SudokuBoardDetector({"box_rows": box_rows, "box_cols": box_cols})
+        self.grid_size = self.detector.GRID_SIZE
         
         # Configuración de pyautogui
         pyautogui.PAUSE = 0.1  # Pausa entre acciones
@@ -73,12 +76,12 @@ class SudokuAutoSolver:
             print(f"Error al abrir el navegador: {e}")
             return False
     
-    def capture_game_screenshot(self, save_path: str = "sudoku_screenshot.png") -> Optional[np.ndarray]:
+    def capture_game_screenshot(self, save_path: Optional[str] = None) -> Optional[np.ndarray]:
         """
-        Captura una screenshot del juego y la guarda.
+        Captura una screenshot del juego (y la guarda si se indica una ruta).
         
         Args:
-            save_path: Ruta donde guardar la captura
+            save_path: Ruta donde guardar la captura (None = solo en memoria)
             
         Returns:
             Imagen capturada o None si falla
@@ -99,9 +102,10 @@ class SudokuAutoSolver:
             # Convertir de RGB a BGR (formato OpenCV)
             screenshot_bgr = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
             
-            # Guardar la imagen
-            cv2.imwrite(save_path, screenshot_bgr)
-            print(f"Captura guardada en: {save_path}")
+            # Guardar la imagen solo si se pide (el resto del proceso usa el array)
+            if save_path is not None:
+                cv2.imwrite(save_path, screenshot_bgr)
+                print(f"Captura guardada en: {save_path}")
             
             return screenshot_bgr
             
@@ -109,19 +113,22 @@ class SudokuAutoSolver:
             print(f"Error al capturar pantalla: {e}")
             return None
     
-    def detect_and_locate_board(self, screenshot_path: str = "sudoku_screenshot.png") -> Optional[Tuple]:
+    def detect_and_locate_board(self, screenshot_path: str = "sudoku_screenshot.png",
+                                screenshot: Optional[np.ndarray] = None) -> Optional[Tuple]:
         """
         Detecta el tablero en la captura y calcula sus coordenadas en pantalla.
         
         Args:
             screenshot_path: Ruta de la imagen capturada
+            screenshot: Captura ya en memoria (si se pasa, no se lee el fichero)
             
         Returns:
             Tupla (x, y, w, h) con las coordenadas del tablero o None si falla
         """
         try:
             # Cargar la imagen
-            screenshot = cv2.imread(screenshot_path)
+            if screenshot is None:
+                screenshot = cv2.imread(screenshot_path)
             if screenshot is None:
                 print("No se pudo cargar la captura de pantalla")
                 return None
@@ -162,14 +169,14 @@ class SudokuAutoSolver:
             x, y, w, h = self.board_region
             
             # Calcular dimensiones de cada celda
-            cell_width = w // 9
-            cell_height = h // 9
+            cell_width = w // self.grid_size
+            cell_height = h // self.grid_size
             
             # Calcular posición central de cada celda
             cell_positions = []
             
-            for row in range(9):
-                for col in range(9):
+            for row in range(self.grid_size):
+                for col in range(self.grid_size):
                     # Calcular posición central de la celda
                     cell_x = x + (col * cell_width) + (cell_width // 2)
                     cell_y = y + (row * cell_height) + (cell_height // 2)
@@ -202,7 +209,7 @@ class SudokuAutoSolver:
         
         # Mostrar cada posición
         for i, (x, y) in enumerate(cell_positions):
-            row, col = divmod(i, 9)
+            row, col = divmod(i, self.grid_size)
             pyautogui.moveTo(x, y, duration=0.1)
             pyautogui.click()
             time.sleep(0.05)
@@ -220,12 +227,14 @@ class SudokuAutoSolver:
         
         print("Visualización completada")
     
-    def solve_and_fill_board(self, screenshot_path: str = "sudoku_screenshot.png") -> bool:
+    def solve_and_fill_board(self, screenshot_path: str = "sudoku_screenshot.png",
+                             screenshot: Optional[np.ndarray] = None) -> bool:
         """
         Proceso completo: detectar, resolver y rellenar el tablero.
         
         Args:
             screenshot_path: Ruta de la imagen capturada
+            screenshot: Captura ya en memoria (si se pasa, no se lee el fichero)
             
         Returns:
             True si se completó exitosamente, False en caso contrario
@@ -233,7 +242,10 @@ class SudokuAutoSolver:
         try:
             # Paso 1: Obtener grilla del Sudoku
             print("\n=== Paso 1: Detectando Sudoku ===")
-            grilla = self.detector.obtener_grilla_final(screenshot_path)
+            if screenshot is not None:
+                grilla = self.detector.obtener_grilla_desde_array(screenshot)
+            else:
+                grilla = self.detector.obtener_grilla_final(screenshot_path)
             
             if grilla is None:
                 print("No se pudo obtener la grilla del Sudoku")
@@ -273,7 +285,7 @@ class SudokuAutoSolver:
             # Rellenar cada celda vacía
             for row, col, value in diferencia:
                 # Calcular índice de la celda
-                cell_index = row * 9 + col
+                cell_index = row * self.grid_size + col
                 
                 if cell_index < len(self.cell_positions):
                     x, y = self.cell_positions[cell_index]
@@ -327,8 +339,8 @@ class SudokuAutoSolver:
             
             # Paso 1: Capturar pantalla
             print("\n[Paso 1] Capturando pantalla...")
-            screenshot_path = "sudoku_screenshot.png"
-            screenshot = self.capture_game_screenshot(screenshot_path)
+            # La captura se procesa en memoria, sin escribirla a disco
+            screenshot = self.capture_game_screenshot()
             
             if screenshot is None:
                 print("Error al capturar pantalla")
@@ -336,7 +348,7 @@ class SudokuAutoSolver:
             
             # Paso 2: Detectar tablero
             print("\n[Paso 2] Detectando tablero...")
-            board_coords = self.detect_and_locate_board(screenshot_path)
+            board_coords = self.detect_and_locate_board(screenshot=screenshot)
             
             if board_coords is None:
                 print("No se pudo detectar el tablero. Intentando procesar directamente...")
@@ -354,7 +366,7 @@ class SudokuAutoSolver:
             
             # Paso 4: Resolver y rellenar
             print("\n[Paso 4] Resolviendo y rellenando...")
-            success = self.solve_and_fill_board(screenshot_path)
+            success = self.solve_and_fill_board(screenshot=screenshot)
             
             if success:
                 print("\n" + "=" * 50)
@@ -0,0 +1,112 @@
+import numpy as np
+from typing import Optional, Tuple
+
+from bitmask_solver import BitmaskSudokuSolver, UNIDADES, PARES, POPCOUNT, TODOS
+from limits import Budget, BudgetExceeded
+
+# Tablas para operar sobre las máscaras de candidatos (N, 81) de todo el lote
+_UNIDADES = np.array(UNIDADES, dtype=np.intp)          # (27, 9): filas, columnas, cajas
+_GRUPOS = [_UNIDADES[g * 9:(g + 1) * 9].ravel() for g in range(3)]
+_PARES = np.array([sorted(p) for p in PARES], dtype=np.intp)  # (81, 20)
+_POPCOUNT = np.array(POPCOUNT, dtype=np.int8)
+_DIGITO = np.zeros(TODOS + 1, dtype=np.int64)             # máscara de un bit -> dígito
+_DIGITO[[1 << d for d in range(9)]] = np.arange(1, 10)
+
+
+def _propagar(cand: np.ndarray) -> np.ndarray:
+    """
+    Elimina candidatos y aplica singles desnudos/ocultos sobre todos los
+    puzzles a la vez, hasta que ninguno cambie. Modifica `cand` (N, 81),
+    con una máscara de 9 bits por celda, in situ.
+
+    Returns:
+        Array booleano (N,) con False en los puzzles contradictorios
+    """
+    validos = np.ones(cand.shape[0], dtype=bool)
+    activos = np.arange(cand.shape[0])
+
+    while activos.size:
+        antes = cand[activos]
+        n = antes.shape[0]
+
+        # Singles desnudos: un valor fijo se elimina de todos sus pares
+        fijos = np.where(_POPCOUNT[antes] == 1, antes, 0).astype(np.uint16)
+        sub = antes & ~np.bitwise_or.reduce(fijos[:, _PARES], axis=2)
+
+        # Singles ocultos: dígito con un único lugar dentro de una unidad
+        # (una = dígitos con algún lugar, varias = con más de uno)
+        por_unidad = sub[:, _UNIDADES]                       # (n, 27, 9)
+        una = np.zeros((n, 27), dtype=np.uint16)
+        varias = np.zeros((n, 27), dtype=np.uint16)
+        for k in range(9):
+            varias |= una & por_unidad[:, :, k]
+            una |= por_unidad[:, :, k]
+        ocultos = (por_unidad & (una & ~varias)[:, :, None])
+        marcas = np.zeros_like(sub)
+        for g, celdas in enumerate(_GRUPOS):
+            marcas[:, celdas] |= ocultos[:, g * 9:(g + 1) * 9].reshape(n, 81)
+        sub = np.where(marcas != 0, marcas, sub)
+
+        invalidos = (
+            (sub == 0).any(axis=1)
+            | (_POPCOUNT[marcas] > 1).any(axis=1)
+            | (una != TODOS).any(axis=1)
+        )
+        cambiados = (sub != antes).any(axis=1)
+
+        cand[activos] = sub
+        validos[activos[invalidos]] = False
+        activos = activos[cambiados & ~invalidos]
+
+    return validos
+
+
+def solve_many(grids: np.ndarray, max_ms: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Resuelve un lote de Sudokus 9x9 con propagación vectorizada.
+
+    Los puzzles que quedan indecisos tras la propagación se terminan uno a
+    uno con BitmaskSudokuSolver partiendo del estado ya reducido.
+
+    Args:
+        grids: Array (N, 9, 9) o (9, 9) con 0 en celdas vacías
+        max_ms: Presupuesto de la búsqueda de cada puzzle indeciso; los que
+            lo superan quedan sin resolver
+
+    Returns:
+        Tupla (soluciones (N, 9, 9), resueltos (N,) booleano). Las filas no
+        resueltas quedan en cero.
+    """
+    grids = np.asarray(grids)
+    if grids.ndim == 2:
+        grids = grids[None]
+    if grids.ndim != 3 or grids.shape[1:] != (9, 9):
+        raise ValueError(f"Se esperaba un array (N, 9, 9), se recibió {grids.shape}")
+    if grids.size and (grids.min() < 0 or grids.max() > 9):
+        raise ValueError("Los valores deben estar entre 0 y 9")
+
+    n = grids.shape[0]
+    planas = grids.reshape(n, 81).astype(np.intp)
+
+    cand = np.where(planas > 0, 1 << np.maximum(planas - 1, 0), TODOS).astype(np.uint16)
+
+    validos = _propagar(cand)
+
+    valores = _DIGITO[cand]
+    resueltos = validos & (valores != 0).all(axis=1)
+
+    soluciones = np.zeros((n, 81), dtype=int)
+    soluciones[resueltos] = valores[resueltos]
+
+    # Búsqueda individual solo para los puzzles que siguen indecisos
+    for k in np.flatnonzero(validos & ~resueltos):
+        solver = BitmaskSudokuSolver(Budget(max_ms) if max_ms else None)
+        try:
+            solucion = solver.solve(valores[k].reshape(9, 9).tolist())
+        except BudgetExceeded:
+            continue
+        if solucion is not None:
+            soluciones[k] = np.asarray(solucion).ravel()
+            resueltos[k] = True
+
+    return soluciones.reshape(n, 9, 9), resueltos
@@ -0,0 +1,367 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import signal
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from api import NXN_ENGINES, PY_SUDOKU_AVAILABLE, SOLVER_ENGINES
+from batch_solver import solve_many
+from limits import Budget, BudgetExceeded
+from wire_format import parsear_linea
+
+if PY_SUDOKU_AVAILABLE:
+    from sudoku import Sudoku
+
+# Corpus incluidos en el repositorio (un puzzle por línea, '#' = comentario)
+CORPORA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpora")
+
+# Tiempo máximo por puzzle; los que lo superan cuentan como timeout
+DEFAULT_MAX_MS = 2000
+
+# Modos de arranque de la API que mide --startup: variables de entorno y
+# código extra tras importar api (vision fuerza la carga de OpenCV)
+MODOS_ARRANQUE = {
+    "solve_only": ({"SUDOKU_SOLVE_ONLY": "1"}, ""),
+    "lazy": ({}, ""),
+    "vision": ({}, "api.cargar_detector()"),
+}
+
+_SONDA_ARRANQUE = """
+import json, resource, time
+inicio = time.perf_counter()
+import api
+{extra}
+print(json.dumps({{"import_ms": (time.perf_counter() - inicio) * 1000,
+                  "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+"""
+
+
+class PySudokuEngine:
+    """Adaptador de py-sudoku con la interfaz de los motores (no admite presupuesto)"""
+
+    def __init__(self, budget: Optional[Budget] = None):
+        self.steps = 0
+
+    def solve(self, grid: List[List[int]]) -> Optional[List[List[int]]]:
+        puzzle = Sudoku(3, 3, board=grid)
+        if not puzzle.validate():
+            return None
+        resuelto = puzzle.solve()
+        if any(v is None for fila in resuelto.board for v in fila):
+            return None
+        return resuelto.board
+
+
+@contextmanager
+def limite_duro(max_ms: float):
+    """
+    Interrumpe con SIGALRM el código que no comprueba presupuestos
+    (py-sudoku). Solo disponible en sistemas con signal.setitimer.
+    """
+    def vencido(signum, frame):
+        raise BudgetExceeded(f"más de {max_ms:g} ms")
+
+    anterior = signal.signal(signal.SIGALRM, vencido)
+    signal.setitimer(signal.ITIMER_REAL, max_ms / 1000)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, anterior)
+
+
+# Motor que resuelve el corpus entero de una vez (batch_solver.solve_many);
+# su latencia por puzzle es el tiempo del lote dividido entre los puzzles
+MOTOR_LOTE = "batch"
+
+
+def motores_disponibles() -> Dict[str, type]:
+    motores = dict(SOLVER_ENGINES)
+    motores[MOTOR_LOTE] = solve_many
+    if PY_SUDOKU_AVAILABLE and hasattr(signal, "setitimer"):
+        motores["py_sudoku"] = PySudokuEngine
+    return motores
+
+
+def cargar_corpus(ruta: str) -> List[List[List[int]]]:
+    """Lee un corpus: cadenas de 81 caracteres o grillas JSON, una por línea"""
+    with open(ruta) as f:
+        return [parsear_linea(linea) for linea in f if linea.strip() and not linea.startswith("#")]
+
+
+def corpora_disponibles() -> Dict[str, str]:
+    rutas = sorted(glob.glob(os.path.join(CORPORA_DIR, "*.txt")))
+    return {os.path.splitext(os.path.basename(r))[0]: r for r in rutas}
+
+
+def _resolver(motor: str, clase: type, grid: List[List[int]], max_ms: float):
+    """Ejecuta un puzzle; devuelve (resuelto, timeout, pasos)"""
+    if motor == "py_sudoku":
+        solver = clase()
+        try:
+            with limite_duro(max_ms):
+                return solver.solve(grid) is not None, False, solver.steps
+        except BudgetExceeded:
+            return False, True, solver.steps
+
+    solver = clase(Budget(max_ms))
+    try:
+        return solver.solve(grid) is not None, False, solver.steps
+    except BudgetExceeded:
+        return False, True, solver.steps
+
+
+def medir(motor: str, clase: type, grids: List[List[List[int]]], max_ms: float,
+          repeticiones: int = 1, memoria: bool = True) -> dict:
+    """Mide latencias, pasos y (en una pasada aparte) el pico de memoria"""
+    latencias = []
+    pasos = []
+    resueltos = timeouts = 0
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for grid in grids:
+            t0 = time.perf_counter()
+            resuelto, timeout, steps = _resolver(motor, clase, grid, max_ms)
+            latencias.append((time.perf_counter() - t0) * 1000)
+            pasos.append(steps)
+            resueltos += resuelto
+            timeouts += timeout
+    total = time.perf_counter() - inicio
+
+    # tracemalloc ralentiza mucho la ejecución: se mide en una pasada separada
+    pico_kb = None
+    if memoria:
+        tracemalloc.start()
+        pico = 0
+        for grid in grids:
+            tracemalloc.reset_peak()
+            _resolver(motor, clase, grid, max_ms)
+            pico = max(pico, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        pico_kb = round(pico / 1024, 1)
+
+    p50, p95, p99 = np.percentile(latencias, [50, 95, 99])
+    n = len(latencias)
+    return {
+        "puzzles": n,
+        "solved": resueltos,
+        "unsolved": n - resueltos - timeouts,
+        "timeouts": timeouts,
+        "puzzles_per_sec": round(n / total, 2) if total > 0 else 0,
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "mean_steps": round(float(np.mean(pasos)), 1),
+        "max_steps": int(max(pasos)),
+        "peak_kb": pico_kb,
+    }
+
+
+def medir_lote(grids: List[List[List[int]]], max_ms: float, repeticiones: int = 1,
+               memoria: bool = True) -> dict:
+    """Como `medir`, pero resolviendo el corpus en una sola llamada a solve_many"""
+    lote = np.array(grids)
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        _, resueltos = solve_many(lote, max_ms)
+        tiempos.append(time.perf_counter() - t0)
+
+    pico_kb = None
+    if memoria:
+        tracemalloc.start()
+        solve_many(lote, max_ms)
+        pico_kb = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        tracemalloc.stop()
+
+    n = len(grids)
+    por_puzzle = round(float(np.median(tiempos)) * 1000 / n, 3) if n else 0
+    resueltos = int(resueltos.sum())
+    return {
+        "puzzles": n * repeticiones,
+        "solved": resueltos * repeticiones,
+        # Sin distinguir timeouts: los que agotan max_ms quedan sin resolver
+        "unsolved": (n - resueltos) * repeticiones,
+        "timeouts": 0,
+        "puzzles_per_sec": round(n * repeticiones / sum(tiempos), 2) if sum(tiempos) > 0 else 0,
+        "p50_ms": por_puzzle,
+        "p95_ms": por_puzzle,
+        "p99_ms": por_puzzle,
+        "mean_steps": 0,
+        "max_steps": 0,
+        "peak_kb": pico_kb,
+    }
+
+
+def ejecutar(motores: List[str], corpora: List[str], max_ms: float = DEFAULT_MAX_MS,
+             repeticiones: int = 1, memoria: bool = True) -> dict:
+    disponibles = motores_disponibles()
+    rutas = corpora_disponibles()
+    resultados = []
+    for nombre in corpora:
+        grids = cargar_corpus(rutas[nombre])
+        clasico = all(len(g) == 9 for g in grids)
+        for motor in motores:
+            if not clasico and motor not in NXN_ENGINES:
+                continue
+            print(f"[INFO] {motor} / {nombre} ({len(grids)} puzzles)", file=sys.stderr)
+            fila = {"engine": motor, "corpus": nombre}
+            if motor == MOTOR_LOTE:
+                fila.update(medir_lote(grids, max_ms, repeticiones, memoria))
+            else:
+                fila.update(medir(motor, disponibles[motor], grids, max_ms, repeticiones, memoria))
+            resultados.append(fila)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "max_ms": max_ms,
+            "repeat": repeticiones,
+        },
+        "results": resultados,
+    }
+
+
+def medir_arranque(repeticiones: int = 5) -> dict:
+    """
+    Arranca la API en procesos nuevos con cada modo de MODOS_ARRANQUE y
+    mide el tiempo de importación, el del proceso completo y el pico de
+    memoria residente (medianas de `repeticiones` arranques).
+    """
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    resultados = []
+    for modo, (entorno, extra) in MODOS_ARRANQUE.items():
+        print(f"[INFO] arranque / {modo} ({repeticiones} procesos)", file=sys.stderr)
+        muestras = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            salida = subprocess.run(
+                [sys.executable, "-c", _SONDA_ARRANQUE.format(extra=extra)],
+                cwd=directorio, env={**os.environ, **entorno},
+                capture_output=True, text=True, check=True
+            )
+            muestra = json.loads(salida.stdout.strip().splitlines()[-1])
+            muestra["process_ms"] = (time.perf_counter() - inicio) * 1000
+            muestras.append(muestra)
+        resultados.append({
+            "mode": modo,
+            "import_ms": round(float(np.median([m["import_ms"] for m in muestras])), 1),
+            "process_ms": round(float(np.median([m["process_ms"] for m in muestras])), 1),
+            "rss_mb": round(float(np.median([m["rss_kb"] for m in muestras])) / 1024, 1),
+        })
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": repeticiones,
+        },
+        "startup": resultados,
+    }
+
+
+def imprimir_tabla(informe: dict) -> None:
+    if "startup" in informe:
+        columnas = ["mode", "import_ms", "process_ms", "rss_mb"]
+        _imprimir_filas(columnas, informe["startup"])
+        return
+    columnas = ["engine", "corpus", "puzzles", "solved", "timeouts", "puzzles_per_sec",
+                "p50_ms", "p95_ms", "p99_ms", "mean_steps", "max_steps", "peak_kb"]
+    _imprimir_filas(columnas, informe["results"])
+
+
+def _imprimir_filas(columnas: List[str], resultados: List[dict]) -> None:
+    filas = [[str(r[c]) for c in columnas] for r in resultados]
+    anchos = [max(len(c), *(len(f[i]) for f in filas)) for i, c in enumerate(columnas)]
+    print("  ".join(c.ljust(a) for c, a in zip(columnas, anchos)))
+    print("  ".join("-" * a for a in anchos))
+    for f in filas:
+        print("  ".join(v.ljust(a) for v, a in zip(f, anchos)))
+
+
+def comparar(informe: dict, base: dict, tolerancia: float) -> List[str]:
+    """
+    Regresiones respecto a un informe base: p50 más lento o menos
+    puzzles/s que la base más la tolerancia relativa.
+    """
+    anteriores = {(r["engine"], r["corpus"]): r for r in base["results"]}
+    regresiones = []
+    for r in informe["results"]:
+        previo = anteriores.get((r["engine"], r["corpus"]))
+        if previo is None:
+            continue
+        if r["p50_ms"] > previo["p50_ms"] * (1 + tolerancia):
+            regresiones.append(f"{r['engine']}/{r['corpus']}: p50 {previo['p50_ms']} -> {r['p50_ms']} ms")
+        if r["puzzles_per_sec"] < previo["puzzles_per_sec"] * (1 - tolerancia):
+            regresiones.append(f"{r['engine']}/{r['corpus']}: "
+                               f"{previo['puzzles_per_sec']} -> {r['puzzles_per_sec']} puzzles/s")
+    return regresiones
+
+
+def main():
+    motores = motores_disponibles()
+    corpora = corpora_disponibles()
+
+    parser = argparse.ArgumentParser(description="Benchmark de los motores de resolución")
+    parser.add_argument("-e", "--engines", default=",".join(motores),
+                        help=f"Motores separados por comas ({', '.join(motores)})")
+    parser.add_argument("-c", "--corpora", default=",".join(corpora),
+                        help=f"Corpus separados por comas ({', '.join(corpora)})")
+    parser.add_argument("--max-ms", type=float, default=DEFAULT_MAX_MS,
+                        help="Tiempo máximo por puzzle antes de contarlo como timeout")
+    parser.add_argument("-r", "--repeat", type=int, default=1, help="Pasadas por corpus")
+    parser.add_argument("--no-memory", action="store_true", help="No medir el pico de memoria")
+    parser.add_argument("-o", "--json", help="Guardar el informe JSON (sirve de base)")
+    parser.add_argument("--baseline", help="Informe base: termina con error si hay regresiones")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Empeoramiento relativo admitido frente a la base")
+    parser.add_argument("--startup", action="store_true",
+                        help="Medir el arranque de la API (tiempo y memoria) en lugar de los motores")
+    args = parser.parse_args()
+
+    if args.startup:
+        informe = medir_arranque(args.repeat if args.repeat > 1 else 5)
+        imprimir_tabla(informe)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(informe, f, indent=2)
+            print(f"[INFO] Informe guardado en {args.json}")
+        return
+
+    elegidos = args.engines.split(",")
+    desconocidos = [m for m in elegidos if m not in motores]
+    desconocidos += [c for c in args.corpora.split(",") if c not in corpora]
+    if desconocidos:
+        parser.error(f"Motores o corpus desconocidos: {', '.join(desconocidos)}")
+
+    informe = ejecutar(elegidos, args.corpora.split(","), args.max_ms, args.repeat, not args.no_memory)
+    imprimir_tabla(informe)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(informe, f, indent=2)
+        print(f"[INFO] Informe guardado en {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            base = json.load(f)
+        regresiones = comparar(informe, base, args.tolerance)
+        for r in regresiones:
+            print(f"[REGRESIÓN] {r}")
+        if regresiones:
+            sys.exit(1)
+        print("[INFO] Sin regresiones respecto a la base")
+
+
+if __name__ == "__main__":
+    main()
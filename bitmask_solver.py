@@ -0,0 +1,244 @@
+from functools import lru_cache
+from math import isqrt
+from typing import List, NamedTuple, Optional, Tuple
+
+from limits import Budget
+
+
+class _PopcountGrande:
+    """Popcount para máscaras demasiado anchas para una tabla (N > 16)"""
+
+    def __getitem__(self, mascara: int) -> int:
+        return bin(mascara).count("1")
+
+
+class Tablas(NamedTuple):
+    """Tablas precalculadas de una grilla N x N con cajas box_rows x box_cols"""
+    n: int
+    box_rows: int
+    box_cols: int
+    todos: int
+    filas: List[List[int]]
+    columnas: List[List[int]]
+    cajas: List[List[int]]
+    unidades: List[List[int]]
+    pares: List[Tuple[int, ...]]
+    popcount: object
+
+
+@lru_cache(maxsize=None)
+def tablas(box_rows: int = 3, box_cols: int = 3) -> Tablas:
+    """Construye (una vez por tamaño) las unidades y pares de cada celda"""
+    n = box_rows * box_cols
+    filas = [[r * n + c for c in range(n)] for r in range(n)]
+    columnas = [[r * n + c for r in range(n)] for c in range(n)]
+    cajas = [
+        [(br + r) * n + (bc + c) for r in range(box_rows) for c in range(box_cols)]
+        for br in range(0, n, box_rows) for bc in range(0, n, box_cols)
+    ]
+
+    pares = []
+    for i in range(n * n):
+        r, c = divmod(i, n)
+        b = (r // box_rows) * box_rows + c // box_cols
+        pares.append(tuple(sorted((set(filas[r]) | set(columnas[c]) | set(cajas[b])) - {i})))
+
+    todos = (1 << n) - 1
+    popcount = [bin(m).count("1") for m in range(todos + 1)] if n <= 16 else _PopcountGrande()
+    return Tablas(n, box_rows, box_cols, todos, filas, columnas, cajas,
+                  filas + columnas + cajas, pares, popcount)
+
+
+def dimensiones_caja(n: int) -> Tuple[int, int]:
+    """Cajas por defecto para una grilla N x N (3x3 para 9, 2x3 para 6, 3x4 para 12...)"""
+    box_rows = isqrt(n)
+    while n % box_rows:
+        box_rows -= 1
+    return box_rows, n // box_rows
+
+
+# Tablas de la grilla clásica 9x9 (índices de celda 0..80)
+_T9 = tablas(3, 3)
+TODOS = _T9.todos
+FILAS = _T9.filas
+COLUMNAS = _T9.columnas
+CAJAS = _T9.cajas
+UNIDADES = _T9.unidades
+PARES = _T9.pares
+POPCOUNT = _T9.popcount
+BIT_A_DIGITO = {1 << d: d + 1 for d in range(9)}
+
+
+class BitmaskSudokuSolver:
+    """
+    Motor de resolución con candidatos como máscaras de bits.
+
+    Cada celda guarda un entero de N bits con sus candidatos. Tras cada
+    asignación se eliminan candidatos de los pares y se propagan los
+    singles desnudos y ocultos; la búsqueda elige siempre la celda con
+    menos candidatos (MRV). `steps` cuenta los nodos de búsqueda visitados
+    y `solutions` las soluciones encontradas. Con un `budget`, la búsqueda
+    lanza BudgetExceeded al agotarlo.
+
+    Admite grillas N x N (4x4, 6x6, 16x16, 25x25...); las dimensiones de
+    caja se deducen del tamaño si no se indican.
+    """
+
+    def __init__(self, budget: Optional[Budget] = None):
+        self.steps = 0
+        self.solutions = 0
+        self.budget = budget
+
+    def solve(self, grid: List[List[int]], box_rows: Optional[int] = None,
+              box_cols: Optional[int] = None) -> Optional[List[List[int]]]:
+        """Resuelve un Sudoku N x N; devuelve None si no tiene solución"""
+        resultado = self._ejecutar(grid, 1, box_rows, box_cols)
+        if resultado is None:
+            return None
+        n = len(grid)
+        return [resultado[r * n:(r + 1) * n] for r in range(n)]
+
+    def count(self, grid: List[List[int]], limit: int = 1000, box_rows: Optional[int] = None,
+              box_cols: Optional[int] = None) -> int:
+        """Cuenta soluciones hasta `limit` (con limit=2 comprueba unicidad)"""
+        self._ejecutar(grid, limit, box_rows, box_cols)
+        return self.solutions
+
+    def propagate(self, grid: List[List[int]], box_rows: Optional[int] = None,
+                  box_cols: Optional[int] = None) -> Optional[List[int]]:
+        """
+        Solo propagación (singles desnudos y ocultos), sin búsqueda.
+        Devuelve la máscara de candidatos de cada celda o None si hay
+        contradicción; las celdas decididas tienen un único bit.
+        """
+        self.steps = 0
+        inicial = self._preparar(grid, box_rows, box_cols)
+        if inicial is None or not self._singles_ocultos(*inicial):
+            return None
+        return inicial[1]
+
+    def _preparar(self, grid: List[List[int]], box_rows: Optional[int],
+                  box_cols: Optional[int]) -> Optional[Tuple[List[int], List[int]]]:
+        """Valores y candidatos tras colocar las pistas; None si se contradicen"""
+        n = len(grid)
+        if box_rows is None or box_cols is None:
+            box_rows, box_cols = dimensiones_caja(n)
+        self._t = tablas(box_rows, box_cols)
+
+        valores = [0] * (n * n)
+        candidatos = [self._t.todos] * (n * n)
+
+        for r in range(n):
+            for c in range(n):
+                if grid[r][c]:
+                    if not self._asignar(valores, candidatos, r * n + c, grid[r][c]):
+                        return None
+        return valores, candidatos
+
+    def _ejecutar(self, grid: List[List[int]], limite: int, box_rows: Optional[int],
+                  box_cols: Optional[int]) -> Optional[List[int]]:
+        self.steps = 0
+        self.solutions = 0
+        self._limite = limite
+        inicial = self._preparar(grid, box_rows, box_cols)
+        if inicial is None:
+            return None
+        return self._buscar(*inicial)
+
+    def _asignar(self, valores: List[int], candidatos: List[int], idx: int, digito: int) -> bool:
+        """Asigna un dígito y propaga singles desnudos. False si hay contradicción."""
+        pares = self._t.pares
+        popcount = self._t.popcount
+        pendientes = [(idx, digito)]
+        while pendientes:
+            i, d = pendientes.pop()
+            bit = 1 << (d - 1)
+            if valores[i]:
+                if valores[i] != d:
+                    return False
+                continue
+            if not candidatos[i] & bit:
+                return False
+
+            valores[i] = d
+            candidatos[i] = bit
+            for p in pares[i]:
+                cand = candidatos[p]
+                if cand & bit:
+                    cand ^= bit
+                    candidatos[p] = cand
+                    if cand == 0:
+                        return False
+                    if not valores[p] and popcount[cand] == 1:
+                        pendientes.append((p, cand.bit_length()))
+        return True
+
+    def _singles_ocultos(self, valores: List[int], candidatos: List[int]) -> bool:
+        """Coloca dígitos con un único lugar posible en su unidad hasta estabilizar."""
+        todos = self._t.todos
+        popcount = self._t.popcount
+        cambio = True
+        while cambio:
+            cambio = False
+            for unidad in self._t.unidades:
+                una_vez = 0
+                varias = 0
+                for i in unidad:
+                    cand = candidatos[i]
+                    varias |= una_vez & cand
+                    una_vez |= cand
+                if una_vez != todos:
+                    return False
+
+                unicos = una_vez & ~varias
+                if not unicos:
+                    continue
+                for i in unidad:
+                    if valores[i]:
+                        continue
+                    bit = candidatos[i] & unicos
+                    if bit:
+                        if popcount[bit] > 1:
+                            return False
+                        if not self._asignar(valores, candidatos, i, bit.bit_length()):
+                            return False
+                        cambio = True
+        return True
+
+    def _buscar(self, valores: List[int], candidatos: List[int]) -> Optional[List[int]]:
+        self.steps += 1
+        if self.budget is not None:
+            self.budget.check(self.steps)
+
+        if not self._singles_ocultos(valores, candidatos):
+            return None
+
+        # Heurística MRV: celda vacía con menos candidatos
+        popcount = self._t.popcount
+        mejor = -1
+        menor = self._t.n + 1
+        for i in range(len(valores)):
+            if not valores[i]:
+                n = popcount[candidatos[i]]
+                if n < menor:
+                    menor = n
+                    mejor = i
+                    if n == 2:
+                        break
+
+        if mejor == -1:
+            # Solución completa: se devuelve al alcanzar el límite pedido
+            self.solutions += 1
+            return valores if self.solutions >= self._limite else None
+
+        cand = candidatos[mejor]
+        while cand:
+            bit = cand & -cand
+            cand ^= bit
+            valores_rama = valores[:]
+            candidatos_rama = candidatos[:]
+            if self._asignar(valores_rama, candidatos_rama, mejor, bit.bit_length()):
+                resultado = self._buscar(valores_rama, candidatos_rama)
+                if resultado is not None:
+                    return resultado
+        return None
@@ -0,0 +1,319 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from itertools import permutations
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from solution_store import SolutionStore
+from wire_format import grilla_a_cadena, parsear_cadena
+
+# Todas las permutaciones de columnas que preservan el Sudoku:
+# orden de las 3 pilas x orden de columnas dentro de cada pila (6 * 6^3 = 1296)
+_PERMS3 = list(permutations(range(3)))
+_PERMS_COLUMNAS = np.array([
+    [pila * 3 + dentro[k][i] for k, pila in enumerate(pilas) for i in range(3)]
+    for pilas in _PERMS3
+    for dentro in ((a, b, c) for a in _PERMS3 for b in _PERMS3 for c in _PERMS3)
+], dtype=np.intp)
+_PESOS = 10 ** np.arange(8, -1, -1, dtype=np.int64)
+
+# Grillas muy vacías o simétricas empatan en demasiados estados; no se cachean
+MAX_ESTADOS = 30000
+
+# Canonicalizar cuesta ~10 ms y resolver un puzzle típico menos de 1 ms: la
+# caché busca primero la grilla tal cual y solo canonicaliza (para reconocer
+# grillas equivalentes) las soluciones que costaron al menos esto
+CANONICALIZAR_DESDE_MS = 20.0
+
+
+class Transformacion(NamedTuple):
+    """Lleva una grilla original a su forma canónica"""
+    transpuesta: bool
+    filas: Tuple[int, ...]      # fila canónica t <- fila filas[t] (tras transponer)
+    columnas: Tuple[int, ...]   # columna canónica j <- columna columnas[j]
+    digitos: Tuple[int, ...]    # digitos[v] = etiqueta canónica del dígito original v
+
+
+def canonicalizar(grid: List[List[int]]) -> Optional[Tuple[str, Transformacion]]:
+    """
+    Calcula la forma canónica de una grilla bajo las simetrías del Sudoku:
+    transposición, permutación de bandas, pilas, filas y columnas dentro de
+    ellas, y reetiquetado de dígitos por orden de aparición.
+
+    Se construye fila a fila: en cada paso se conservan los estados cuya
+    fila tiene el patrón de pistas mínimo y, entre ellos, el menor código
+    tras reetiquetar, evaluando todos los candidatos de forma vectorizada.
+    Por esa poda previa no es necesariamente la grilla mínima
+    lexicográfica, pero el orden es fijo, así que el resultado es el mismo
+    para todas las grillas equivalentes.
+
+    Returns:
+        Tupla (clave de 81 caracteres, transformación aplicada), o None si la
+        búsqueda supera MAX_ESTADOS
+    """
+    g = np.asarray(grid, dtype=np.intp)
+    orientaciones = np.stack([g, g.T])
+
+    n_perms = len(_PERMS_COLUMNAS)
+    orient = np.repeat(np.arange(2), n_perms)
+    cols = np.tile(_PERMS_COLUMNAS, (2, 1))
+    filas = np.zeros((len(orient), 0), dtype=np.intp)
+    etiquetas = np.zeros((len(orient), 10), dtype=np.intp)
+    siguiente = np.ones(len(orient), dtype=np.intp)
+    codigos = []
+
+    for t in range(9):
+        k = len(orient)
+        # Filas candidatas para la posición t según la estructura de bandas
+        if t % 3 == 0:
+            if t == 0:
+                libres = np.tile(np.arange(3), (k, 1))
+            elif t == 3:
+                b0 = filas[:, 0] // 3
+                libres = np.stack([(b0 + 1) % 3, (b0 + 2) % 3], axis=1)
+            else:
+                libres = (3 - filas[:, 0] // 3 - filas[:, 3] // 3)[:, None]
+            candidatas = (libres[:, :, None] * 3 + np.arange(3)).reshape(k, -1)
+        elif t % 3 == 1:
+            previa = filas[:, t - 1]
+            base = (previa // 3) * 3
+            candidatas = np.stack([base + (previa % 3 + 1) % 3, base + (previa % 3 + 2) % 3], axis=1)
+        else:
+            base = (filas[:, t - 1] // 3) * 3
+            candidatas = (base + 3 - filas[:, t - 1] % 3 - filas[:, t - 2] % 3)[:, None]
+
+        m = candidatas.shape[1]
+        if k * m > MAX_ESTADOS:
+            return None
+        origen = np.repeat(np.arange(k), m)
+        nuevas_filas = candidatas.ravel()
+        valores = orientaciones[orient[origen][:, None], nuevas_filas[:, None], cols[origen]]
+
+        # Poda previa: el mínimo lexicográfico exige el patrón de pistas mínimo
+        patron = (valores > 0).astype(np.int64) @ _PESOS
+        previos = patron == patron.min()
+        origen = origen[previos]
+        nuevas_filas = nuevas_filas[previos]
+        valores = valores[previos]
+
+        # Reetiquetar dígitos por orden de primera aparición
+        etq = etiquetas[origen]
+        sig = siguiente[origen]
+        salida = np.empty_like(valores)
+        indices = np.arange(len(origen))
+        for j in range(9):
+            v = valores[:, j]
+            nuevo = (v > 0) & (etq[indices, v] == 0)
+            etq[indices[nuevo], v[nuevo]] = sig[nuevo]
+            sig = sig + nuevo
+            salida[:, j] = etq[indices, v]
+
+        codigo = salida @ _PESOS
+        minimo = codigo.min()
+        codigos.append(int(minimo))
+
+        conservar = codigo == minimo
+        orient = orient[origen][conservar]
+        cols = cols[origen][conservar]
+        filas = np.column_stack([filas[origen], nuevas_filas])[conservar]
+        etiquetas = etq[conservar]
+        siguiente = sig[conservar]
+
+    # Completar el reetiquetado con los dígitos ausentes en orden ascendente
+    digitos = etiquetas[0].tolist()
+    libre = int(siguiente[0])
+    for v in range(1, 10):
+        if digitos[v] == 0:
+            digitos[v] = libre
+            libre += 1
+
+    clave = "".join(f"{c:09d}" for c in codigos)
+    return clave, Transformacion(
+        transpuesta=bool(orient[0]),
+        filas=tuple(filas[0].tolist()),
+        columnas=tuple(cols[0].tolist()),
+        digitos=tuple(digitos),
+    )
+
+
+def huella(grid: List[List[int]]) -> str:
+    """
+    Resumen barato de una grilla que no cambia con las simetrías de
+    canonicalizar: pistas por fila agrupadas por banda, por columna
+    agrupadas por pila (sin distinguir filas de columnas), pistas por caja
+    y frecuencias de los dígitos, todo como conjuntos ordenados. Dos
+    grillas equivalentes tienen la misma huella; lo contrario no siempre.
+    """
+    filas = [sum(1 for v in fila if v) for fila in grid]
+    columnas = [sum(1 for fila in grid if fila[c]) for c in range(9)]
+    cajas = sorted(sum(1 for r in range(br, br + 3) for c in range(bc, bc + 3) if grid[r][c])
+                   for br in (0, 3, 6) for bc in (0, 3, 6))
+    frecuencias = [0] * 10
+    for fila in grid:
+        for v in fila:
+            frecuencias[v] += 1
+
+    def grupos(cuentas: List[int]) -> str:
+        return "/".join(sorted("".join(map(str, sorted(cuentas[i:i + 3]))) for i in (0, 3, 6)))
+
+    ejes = sorted((grupos(filas), grupos(columnas)))
+    return "h:" + ":".join(ejes) + ":" + "".join(map(str, cajas)) + ":" + ",".join(
+        map(str, sorted(frecuencias[1:])))
+
+
+def aplicar(grid: List[List[int]], tr: Transformacion) -> List[List[int]]:
+    """Lleva una grilla (p. ej. la solución) al espacio canónico"""
+    g = np.asarray(grid, dtype=np.intp)
+    if tr.transpuesta:
+        g = g.T
+    canon = np.asarray(tr.digitos)[g[np.ix_(tr.filas, tr.columnas)]]
+    return canon.tolist()
+
+
+def invertir(grid_canonica: List[List[int]], tr: Transformacion) -> List[List[int]]:
+    """Devuelve una grilla del espacio canónico a la orientación original"""
+    inversa = np.zeros(10, dtype=np.intp)
+    inversa[np.asarray(tr.digitos)] = np.arange(10)
+    g = np.zeros((9, 9), dtype=np.intp)
+    g[np.ix_(tr.filas, tr.columnas)] = inversa[np.asarray(grid_canonica, dtype=np.intp)]
+    if tr.transpuesta:
+        g = g.T
+    return g.tolist()
+
+
+class SolutionCache:
+    """
+    Caché LRU acotada de soluciones indexada por la grilla.
+
+    Cada clave es una grilla de 81 caracteres y su valor la solución de
+    esa misma grilla; las formas canónicas son grillas más, así que
+    comparten el espacio de claves. `buscar` prueba primero la grilla tal
+    cual. Solo si su huella coincide con la de una solución cara ya
+    guardada la canonicaliza, para obtener la solución de una grilla
+    equivalente (por simetría) transformada a su orientación. `guardar`
+    canonicaliza solo las soluciones que costaron al menos
+    `canonicalizar_desde_ms`.
+
+    Con `store`, los fallos se consultan en el almacén persistente
+    (compartido entre procesos) y cada solución nueva se guarda en él.
+    Sus errores no interrumpen la resolución: solo se cuentan.
+    """
+
+    def __init__(self, max_size: int = 4096, store: Optional[SolutionStore] = None,
+                 canonicalizar_desde_ms: float = CANONICALIZAR_DESDE_MS):
+        self.max_size = max_size
+        self.store = store
+        self.canonicalizar_desde_ms = canonicalizar_desde_ms
+        self.hits = 0
+        self.misses = 0
+        self.store_hits = 0
+        self.store_errors = 0
+        self.canonical_hits = 0
+        self._datos: "OrderedDict[str, List[List[int]]]" = OrderedDict()
+        self._huellas: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def buscar(self, grid: List[List[int]]) -> Optional[List[List[int]]]:
+        """Solución de la grilla 9x9 o de una equivalente ya resuelta; None si no hay"""
+        solucion = self._leer(grilla_a_cadena(grid))
+        if solucion is None and self._huella_conocida(huella(grid)):
+            canonica = canonicalizar(grid)
+            if canonica is not None:
+                clave, tr = canonica
+                guardada = self._leer(clave)
+                if guardada is not None:
+                    solucion = invertir(guardada, tr)
+                    with self._lock:
+                        self.canonical_hits += 1
+        with self._lock:
+            if solucion is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return solucion
+
+    def guardar(self, grid: List[List[int]], solucion: List[List[int]], coste_ms: float) -> None:
+        """Guarda la solución; canonicalizada también si costó obtenerla"""
+        if self.max_size <= 0 and self.store is None:
+            return
+        self._escribir(grilla_a_cadena(grid), solucion)
+        if coste_ms < self.canonicalizar_desde_ms:
+            return
+        canonica = canonicalizar(grid)
+        if canonica is None:
+            return
+        clave, tr = canonica
+        self._escribir(clave, aplicar(solucion, tr))
+        clave_huella = huella(grid)
+        self._guardar_local(self._huellas, clave_huella, None)
+        self._escribir_store(clave_huella, "")
+
+    def _leer(self, clave: str) -> Optional[List[List[int]]]:
+        with self._lock:
+            solucion = self._datos.get(clave)
+            if solucion is not None:
+                self._datos.move_to_end(clave)
+                return solucion
+        guardada = self._leer_store(clave)
+        if guardada is None:
+            return None
+        with self._lock:
+            self.store_hits += 1
+        solucion = parsear_cadena(guardada)
+        self._guardar_local(self._datos, clave, solucion)
+        return solucion
+
+    def _huella_conocida(self, clave: str) -> bool:
+        with self._lock:
+            if clave in self._huellas:
+                self._huellas.move_to_end(clave)
+                return True
+        if self._leer_store(clave) is None:
+            return False
+        self._guardar_local(self._huellas, clave, None)
+        return True
+
+    def _escribir(self, clave: str, solucion: List[List[int]]) -> None:
+        self._guardar_local(self._datos, clave, solucion)
+        self._escribir_store(clave, grilla_a_cadena(solucion))
+
+    def _escribir_store(self, clave: str, valor: str) -> None:
+        if self.store is None:
+            return
+        try:
+            self.store.put(clave, valor)
+        except sqlite3.Error:
+            self.store_errors += 1
+
+    def _leer_store(self, clave: str) -> Optional[str]:
+        if self.store is None:
+            return None
+        try:
+            return self.store.get(clave)
+        except sqlite3.Error:
+            self.store_errors += 1
+            return None
+
+    def _guardar_local(self, datos: OrderedDict, clave: str, valor) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            datos[clave] = valor
+            datos.move_to_end(clave)
+            while len(datos) > self.max_size:
+                datos.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._datos),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "canonical_hits": self.canonical_hits,
+            "store_hits": self.store_hits,
+            "store_errors": self.store_errors,
+        }
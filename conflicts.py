@@ -0,0 +1,105 @@
+from typing import List, NamedTuple, Optional, Tuple
+
+from bitmask_solver import BitmaskSudokuSolver, dimensiones_caja, tablas
+
+# Análisis previo a la resolución: detecta en tiempo lineal las grillas
+# imposibles (típicamente un dígito mal leído por el OCR) y devuelve las
+# pistas implicadas, para no lanzar una búsqueda que no puede terminar bien.
+
+
+class Conflicto(NamedTuple):
+    reason: str  # duplicate, no_candidates, no_place o propagation
+    cells: List[Tuple[int, int]]
+    message: str
+
+
+def _testigo(valores: List[int], pares: Tuple[int, ...], digito: int) -> int:
+    """Primer par de la celda que contiene el dígito"""
+    return next(p for p in pares if valores[p] == digito)
+
+
+def buscar_conflictos(grid: List[List[int]], box_rows: Optional[int] = None,
+                      box_cols: Optional[int] = None, propagar: bool = True) -> Optional[Conflicto]:
+    """
+    Busca una contradicción en las pistas de una grilla ya validada:
+
+    - duplicate: un dígito repetido en una fila, columna o caja
+    - no_candidates: una celda vacía sin ningún dígito posible
+    - no_place: un dígito que no cabe en ninguna celda de una unidad
+    - propagation (con `propagar`): la propagación de singles llega a una
+      contradicción; se reduce a un conjunto mínimo de pistas quitando
+      una a una las que no son necesarias
+
+    Las tres primeras comprobaciones son una pasada sobre las unidades.
+    Devuelve None si no se encuentra contradicción (lo que no garantiza
+    que la grilla tenga solución).
+    """
+    n = len(grid)
+    if box_rows is None or box_cols is None:
+        box_rows, box_cols = dimensiones_caja(n)
+    t = tablas(box_rows, box_cols)
+    valores = [v for fila in grid for v in fila]
+
+    def celdas(indices) -> List[Tuple[int, int]]:
+        return sorted(divmod(i, n) for i in indices)
+
+    # Dígitos presentes en cada unidad (filas, columnas y cajas, en ese orden)
+    usados = []
+    for unidad in t.unidades:
+        vistos = {}
+        mascara = 0
+        for i in unidad:
+            d = valores[i]
+            if not d:
+                continue
+            if d in vistos:
+                return Conflicto("duplicate", celdas([vistos[d], i]),
+                                 f"El dígito {d} está repetido en {celdas([vistos[d], i])}")
+            vistos[d] = i
+            mascara |= 1 << (d - 1)
+        usados.append(mascara)
+
+    # Candidatos de cada celda vacía según las pistas de sus unidades
+    candidatos = {}
+    for i, v in enumerate(valores):
+        if v:
+            continue
+        r, c = divmod(i, n)
+        b = (r // box_rows) * box_rows + c // box_cols
+        libres = t.todos & ~(usados[r] | usados[n + c] | usados[2 * n + b])
+        if not libres:
+            testigos = [_testigo(valores, t.pares[i], d) for d in range(1, n + 1)]
+            return Conflicto("no_candidates", celdas([i, *testigos]),
+                             f"La celda ({r},{c}) no admite ningún dígito")
+        candidatos[i] = libres
+
+    for k, unidad in enumerate(t.unidades):
+        vacias = [i for i in unidad if not valores[i]]
+        faltan = t.todos & ~usados[k]
+        for i in vacias:
+            faltan &= ~candidatos[i]
+        if faltan:
+            d = (faltan & -faltan).bit_length()
+            testigos = {_testigo(valores, t.pares[i], d) for i in vacias}
+            ocupadas = [i for i in unidad if valores[i]]
+            return Conflicto("no_place", celdas(testigos | set(ocupadas)),
+                             f"El dígito {d} no cabe en ninguna celda de la unidad de {celdas(vacias)}")
+
+    if not propagar or BitmaskSudokuSolver().propagate(grid, box_rows, box_cols) is not None:
+        return None
+
+    # Filtro por eliminación: se quita cada pista y se conserva solo si
+    # sin ella la propagación deja de encontrar la contradicción
+    reducida = [fila[:] for fila in grid]
+    solver = BitmaskSudokuSolver()
+    necesarias = []
+    for i, v in enumerate(valores):
+        if not v:
+            continue
+        r, c = divmod(i, n)
+        reducida[r][c] = 0
+        if solver.propagate(reducida, box_rows, box_cols) is not None:
+            reducida[r][c] = v
+            necesarias.append(i)
+    return Conflicto("propagation", celdas(necesarias),
+                     "La propagación de singles llega a una contradicción")
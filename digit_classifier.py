@@ -0,0 +1,308 @@
+import argparse
+import os
+import time
+from typing import Dict, Tuple
+
+import numpy as np
+
+# Clasificador de dígitos alternativo al template matching: una red de una
+# capa oculta con inferencia por lotes solo con NumPy (dos productos de
+# matrices), entrenada offline con renders aumentados de los templates.
+# La entrada son los trazos canónicos de SudokuBoardDetector.trazos_celdas
+# y su tamaño relativo a la celda: normalizado, un segmento corto se parece
+# a un 1, y solo el tamaño los distingue.
+
+PESOS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "digit_classifier.npz")
+
+# Los trazos canónicos se reducen a LADO_ENTRADA x LADO_ENTRADA por promedio
+LADO_ENTRADA = 16
+
+# Clase 0: trazo que no es un dígito (restos de líneas, ruido); 1-9: dígitos
+CLASES = 10
+
+
+def caracteristicas(trazos: np.ndarray, tamanos: np.ndarray) -> np.ndarray:
+    """
+    Trazos canónicos (una fila de lado x lado por celda) reducidos a
+    LADO_ENTRADA x LADO_ENTRADA, con media cero y desviación uno por fila,
+    más una columna con el tamaño relativo del trazo centrado en 0.5.
+    """
+    n = len(trazos)
+    lado = int(round(np.sqrt(trazos.shape[1])))
+    f = lado // LADO_ENTRADA
+    bloques = trazos.astype(np.float32, copy=False).reshape(n, LADO_ENTRADA, f, LADO_ENTRADA, f)
+    # Suma de las f x f vistas desplazadas: mucho más rápido que mean(axis=(2, 4))
+    x = sum(bloques[:, :, i, :, j] for i in range(f) for j in range(f)).reshape(n, -1)
+    x -= x.mean(axis=1, keepdims=True)
+    x /= np.maximum(np.sqrt(np.einsum("ij,ij->i", x, x) / x.shape[1]), 1e-6)[:, None]
+    return np.hstack([x, (4 * (np.asarray(tamanos, dtype=np.float32) - 0.5))[:, None]])
+
+
+class DigitClassifier:
+    """
+    Red entrada -> `ocultas` (ReLU) -> CLASES (softmax). `predecir` clasifica
+    un lote de trazos y devuelve la clase y su probabilidad por fila.
+    """
+
+    def __init__(self, w1: np.ndarray, b1: np.ndarray, w2: np.ndarray, b2: np.ndarray):
+        self.w1 = w1.astype(np.float32)
+        self.b1 = b1.astype(np.float32)
+        self.w2 = w2.astype(np.float32)
+        self.b2 = b2.astype(np.float32)
+
+    @classmethod
+    def cargar(cls, path: str = PESOS_PATH) -> "DigitClassifier":
+        with np.load(path) as pesos:
+            return cls(pesos["w1"], pesos["b1"], pesos["w2"], pesos["b2"])
+
+    def guardar(self, path: str = PESOS_PATH) -> None:
+        np.savez(path, w1=self.w1, b1=self.b1, w2=self.w2, b2=self.b2)
+
+    def probabilidades(self, x: np.ndarray) -> np.ndarray:
+        """Probabilidad de cada clase para un lote de características"""
+        oculta = np.maximum(x @ self.w1 + self.b1, 0)
+        z = oculta @ self.w2 + self.b2
+        z -= z.max(axis=1, keepdims=True)
+        p = np.exp(z)
+        return p / p.sum(axis=1, keepdims=True)
+
+    def predecir(self, trazos: np.ndarray, tamanos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        p = self.probabilidades(caracteristicas(trazos, tamanos))
+        clases = p.argmax(axis=1)
+        return clases, p[np.arange(len(p)), clases]
+
+
+# --- Entrenamiento ---------------------------------------------------------
+
+# Tamaño relativo mínimo de un dígito renderizado para usarlo como muestra
+TAMANO_MINIMO_DIGITO = 0.3
+
+# Tablero real (captura de sudoku.com; la imagen entera es el tablero) y
+# sus pistas, para medir el clasificador fuera de los renders sintéticos
+CELDAS_PATH = os.path.join(os.path.dirname(PESOS_PATH), "celdas.png")
+GRILLA_CELDAS = [
+    [0, 2, 9, 0, 0, 5, 1, 7, 0],
+    [0, 5, 8, 0, 2, 6, 9, 0, 3],
+    [3, 0, 0, 0, 0, 0, 6, 0, 2],
+    [0, 0, 0, 4, 7, 9, 0, 0, 1],
+    [4, 0, 0, 1, 6, 0, 0, 0, 0],
+    [9, 0, 0, 5, 0, 8, 4, 0, 0],
+    [8, 0, 0, 9, 0, 0, 0, 2, 4],
+    [0, 4, 3, 0, 0, 7, 0, 1, 0],
+    [0, 0, 0, 0, 5, 4, 3, 8, 6],
+]
+
+def _mascaras_digitos(templates: Dict[int, np.ndarray]) -> Dict[int, np.ndarray]:
+    """Trazo de cada template binarizado, recortado y como float en [0, 1]"""
+    mascaras = {}
+    for digito, template in templates.items():
+        if not 1 <= digito < CLASES:
+            continue
+        trazo = template == 0
+        filas = np.flatnonzero(trazo.any(axis=1))
+        columnas = np.flatnonzero(trazo.any(axis=0))
+        mascaras[digito] = trazo[filas[0]:filas[-1] + 1, columnas[0]:columnas[-1] + 1].astype(np.float32)
+    return mascaras
+
+
+def renderizar_celda(mascara, rng: np.random.Generator) -> np.ndarray:
+    """
+    Celda en escala de grises con el trazo `mascara` (o, si es None, solo
+    con artefactos que no son dígitos) variando tamaño, grosor, inclinación,
+    posición, colores, líneas de la grilla mal alineadas, ruido y JPEG.
+    """
+    import cv2
+
+    lado = int(rng.integers(28, 101))
+    fondo = rng.uniform(190, 255)
+    tinta = rng.uniform(0, 110)
+    celda = np.full((lado, lado), fondo, dtype=np.float32)
+    capa = np.zeros((lado, lado), dtype=np.float32)
+
+    if mascara is not None:
+        alto = max(8, int(lado * rng.uniform(0.4, 0.75)))
+        ancho = max(3, int(mascara.shape[1] * alto / mascara.shape[0] * rng.uniform(0.85, 1.15)))
+        trazo = cv2.resize(mascara, (ancho, alto), interpolation=cv2.INTER_AREA)
+        if rng.random() < 0.4:
+            nucleo = np.ones((2, 2), np.uint8)
+            # Adelgazar solo los dígitos grandes: en los pequeños borra el 1
+            trazo = cv2.erode(trazo, nucleo) if alto >= 40 and rng.random() < 0.4 else cv2.dilate(trazo, nucleo)
+        giro = cv2.getRotationMatrix2D((ancho / 2, alto / 2), rng.uniform(-6, 6), 1.0)
+        giro[0, 1] += rng.uniform(-0.1, 0.1)
+        margen = max(alto, ancho) // 4
+        giro[:, 2] += margen
+        trazo = cv2.warpAffine(trazo, giro, (ancho + 2 * margen, alto + 2 * margen))
+        h, w = trazo.shape
+        y = int(np.clip((lado - h) / 2 + rng.uniform(-0.08, 0.08) * lado, 0, max(0, lado - h)))
+        x = int(np.clip((lado - w) / 2 + rng.uniform(-0.08, 0.08) * lado, 0, max(0, lado - w)))
+        h, w = min(h, lado - y), min(w, lado - x)
+        capa[y:y + h, x:x + w] = trazo[:h, :w]
+    else:
+        # Segmentos cortos y puntos en el interior de la celda
+        for _ in range(int(rng.integers(1, 3))):
+            p1 = rng.uniform(0.15, 0.85, 2) * lado
+            if rng.random() < 0.6:
+                largo = rng.uniform(0.1, 0.3) * lado
+                angulo = rng.uniform(0, np.pi)
+                p2 = p1 + largo * np.array([np.cos(angulo), np.sin(angulo)])
+                cv2.line(capa, tuple(int(v) for v in p1), tuple(int(v) for v in p2), 1.0,
+                         int(rng.integers(1, 4)))
+            else:
+                cv2.circle(capa, tuple(int(v) for v in p1), int(rng.integers(1, 4)), 1.0, -1)
+
+    celda = celda * (1 - capa) + tinta * capa
+
+    # Líneas de la grilla en los bordes, a veces desplazadas hacia dentro
+    for lado_celda in range(4):
+        if rng.random() < 0.7:
+            desplazamiento = int(rng.uniform(0, 0.14) * lado)
+            grosor = int(rng.integers(1, 4))
+            valor = rng.uniform(0, 140)
+            a, b = desplazamiento, desplazamiento + grosor
+            if lado_celda == 0:
+                celda[a:b, :] = valor
+            elif lado_celda == 1:
+                celda[lado - b:lado - a, :] = valor
+            elif lado_celda == 2:
+                celda[:, a:b] = valor
+            else:
+                celda[:, lado - b:lado - a] = valor
+
+    celda += rng.normal(0, rng.uniform(0, 10), celda.shape)
+    celda = np.clip(celda, 0, 255).astype(np.uint8)
+    if rng.random() < 0.3:
+        celda = cv2.GaussianBlur(celda, (3, 3), 0)
+    if rng.random() < 0.4:
+        _, jpeg = cv2.imencode(".jpg", celda, [cv2.IMWRITE_JPEG_QUALITY, int(rng.integers(40, 96))])
+        celda = cv2.imdecode(jpeg, cv2.IMREAD_GRAYSCALE)
+    return celda
+
+
+def generar_muestras(detector, por_clase: int,
+                     rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    `por_clase` trazos canónicos (con su tamaño) por clase, obtenidos pasando celdas
+    renderizadas por el mismo preprocesamiento que usa el detector
+    """
+    mascaras = _mascaras_digitos(detector.templates)
+    trazos, tamanos, etiquetas = [], [], []
+    for clase in range(CLASES):
+        if clase and clase not in mascaras:
+            continue
+        obtenidas = 0
+        while obtenidas < por_clase:
+            celda = renderizar_celda(mascaras.get(clase), rng)
+            _, lote, tamano = detector.trazos_celdas([celda])
+            # Se descartan los dígitos que el ruido ha reducido a fragmentos
+            if len(lote) and (not clase or tamano[0] >= TAMANO_MINIMO_DIGITO):
+                trazos.append(lote[0])
+                tamanos.append(tamano[0])
+                etiquetas.append(clase)
+                obtenidas += 1
+    return np.stack(trazos), np.array(tamanos, dtype=np.float32), np.array(etiquetas)
+
+
+def entrenar(x: np.ndarray, y: np.ndarray, ocultas: int = 64, epocas: int = 40,
+             lr: float = 0.005, rng: np.random.Generator = None) -> DigitClassifier:
+    """Entropía cruzada con Adam en mini-lotes de 128"""
+    rng = rng if rng is not None else np.random.default_rng()
+    entradas = x.shape[1]
+    params = {
+        "w1": rng.normal(0, np.sqrt(2 / entradas), (entradas, ocultas)).astype(np.float32),
+        "b1": np.zeros(ocultas, np.float32),
+        "w2": rng.normal(0, np.sqrt(2 / ocultas), (ocultas, CLASES)).astype(np.float32),
+        "b2": np.zeros(CLASES, np.float32),
+    }
+    m = {k: np.zeros_like(v) for k, v in params.items()}
+    v = {k: np.zeros_like(p) for k, p in params.items()}
+    objetivo = np.eye(CLASES, dtype=np.float32)[y]
+    paso = 0
+    for epoca in range(epocas):
+        orden = rng.permutation(len(x))
+        for inicio in range(0, len(x), 128):
+            lote = orden[inicio:inicio + 128]
+            xb, tb = x[lote], objetivo[lote]
+            oculta = np.maximum(xb @ params["w1"] + params["b1"], 0)
+            z = oculta @ params["w2"] + params["b2"]
+            z -= z.max(axis=1, keepdims=True)
+            p = np.exp(z)
+            p /= p.sum(axis=1, keepdims=True)
+
+            dz = (p - tb) / len(lote)
+            doculta = (dz @ params["w2"].T) * (oculta > 0)
+            gradientes = {"w1": xb.T @ doculta, "b1": doculta.sum(axis=0),
+                          "w2": oculta.T @ dz, "b2": dz.sum(axis=0)}
+            paso += 1
+            for k, g in gradientes.items():
+                m[k] = 0.9 * m[k] + 0.1 * g
+                v[k] = 0.999 * v[k] + 0.001 * g * g
+                params[k] -= lr * (m[k] / (1 - 0.9 ** paso)) / (np.sqrt(v[k] / (1 - 0.999 ** paso)) + 1e-8)
+    return DigitClassifier(**params)
+
+
+def evaluar_celdas(clasificador: DigitClassifier, detector) -> None:
+    """Aciertos del clasificador en las 81 celdas de CELDAS_PATH"""
+    import cv2
+    from main import UMBRAL_CLASIFICADOR
+
+    imagen = cv2.imread(CELDAS_PATH, cv2.IMREAD_GRAYSCALE)
+    if imagen is None:
+        print(f"[ERROR] No se pudo cargar {CELDAS_PATH}")
+        return
+    indices, trazos, tamanos = detector.trazos_celdas(detector.segmentar_celdas(imagen))
+    grilla = np.zeros(81, dtype=int)
+    clases, probabilidades = clasificador.predecir(trazos, tamanos)
+    aceptadas = (clases > 0) & (probabilidades >= UMBRAL_CLASIFICADOR)
+    grilla[indices[aceptadas]] = clases[aceptadas]
+    esperada = np.array(GRILLA_CELDAS).ravel()
+    pistas = esperada > 0
+    print(f"[RESULTADO] {CELDAS_PATH}: {np.count_nonzero(grilla == esperada)}/81 celdas, "
+          f"{np.count_nonzero(grilla[pistas] == esperada[pistas])}/{np.count_nonzero(pistas)} pistas")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Entrena el clasificador de dígitos con renders aumentados de los templates")
+    parser.add_argument("-o", "--output", default=PESOS_PATH, help="Fichero de pesos (.npz)")
+    parser.add_argument("-n", "--samples", type=int, default=2500, help="Muestras de entrenamiento por clase")
+    parser.add_argument("--epochs", type=int, default=60)
+    parser.add_argument("--hidden", type=int, default=64, help="Neuronas de la capa oculta")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from main import SudokuBoardDetector
+
+    rng = np.random.default_rng(args.seed)
+    detector = SudokuBoardDetector({"headless": True})
+
+    inicio = time.perf_counter()
+    trazos, tamanos, y = generar_muestras(detector, args.samples, rng)
+    trazos_val, tamanos_val, y_val = generar_muestras(detector, max(1, args.samples // 5), rng)
+    print(f"[INFO] {len(trazos)} muestras de entrenamiento y {len(trazos_val)} de validación "
+          f"en {time.perf_counter() - inicio:.1f} s")
+
+    inicio = time.perf_counter()
+    clasificador = entrenar(caracteristicas(trazos, tamanos), y, args.hidden, args.epochs, rng=rng)
+    print(f"[INFO] Entrenado en {time.perf_counter() - inicio:.1f} s")
+
+    clases, _ = clasificador.predecir(trazos_val, tamanos_val)
+    print(f"[RESULTADO] Precisión en validación: {np.mean(clases == y_val):.4f}")
+    for clase in range(CLASES):
+        fallos = np.count_nonzero((y_val == clase) & (clases != clase))
+        if fallos:
+            print(f"  clase {clase}: {fallos} fallos")
+
+    evaluar_celdas(clasificador, detector)
+
+    lote, tamanos_lote = trazos_val[:81], tamanos_val[:81]
+    inicio = time.perf_counter()
+    for _ in range(100):
+        clasificador.predecir(lote, tamanos_lote)
+    print(f"[INFO] Inferencia de {len(lote)} celdas: {(time.perf_counter() - inicio) * 10:.3f} ms")
+
+    clasificador.guardar(args.output)
+    print(f"[INFO] Pesos guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+from typing import List, Optional, Tuple
+
+from limits import Budget
+
+# Matriz de cobertura exacta del Sudoku 9x9: 729 filas (fila, columna, dígito)
+# y 324 restricciones (celda, fila-dígito, columna-dígito, caja-dígito).
+N_RESTRICCIONES = 324
+
+
+def _restricciones(r: int, c: int, d: int) -> Tuple[int, int, int, int]:
+    b = (r // 3) * 3 + c // 3
+    return (
+        r * 9 + c,
+        81 + r * 9 + d,
+        162 + c * 9 + d,
+        243 + b * 9 + d,
+    )
+
+
+def _construir_plantilla():
+    """
+    Construye una única vez los enlaces de la matriz completa.
+    El nodo 0 es la raíz y los nodos 1..324 las cabeceras de columna.
+    """
+    n_cab = N_RESTRICCIONES + 1
+    L = list(range(-1, n_cab - 1))
+    R = list(range(1, n_cab + 1))
+    L[0] = n_cab - 1
+    R[n_cab - 1] = 0
+    U = list(range(n_cab))
+    D = list(range(n_cab))
+    C = list(range(n_cab))
+    S = [0] * n_cab
+    FILA = [-1] * n_cab
+
+    for r in range(9):
+        for c in range(9):
+            for d in range(9):
+                fila_id = (r * 9 + c) * 9 + d
+                primero = len(C)
+                for k, col in enumerate(_restricciones(r, c, d)):
+                    cab = col + 1
+                    nodo = len(C)
+                    C.append(cab)
+                    FILA.append(fila_id)
+                    # Insertar al final de la columna
+                    U.append(U[cab])
+                    D.append(cab)
+                    D[U[cab]] = nodo
+                    U[cab] = nodo
+                    S[cab] += 1
+                    # Enlazar horizontalmente dentro de la fila
+                    L.append(primero + (k - 1) % 4)
+                    R.append(primero + (k + 1) % 4)
+
+    return L, R, U, D, C, S, FILA
+
+
+_PLANTILLA = _construir_plantilla()
+
+
+class DLXSudokuSolver:
+    """
+    Motor de cobertura exacta (Algorithm X con Dancing Links).
+
+    Resuelve o cuenta soluciones de un Sudoku 9x9. `steps` cuenta los nodos
+    de búsqueda visitados y `solutions` las soluciones encontradas hasta el
+    momento; `solve` es compatible con APISudokuSolver.
+    Con un `budget`, la búsqueda lanza BudgetExceeded al agotarlo.
+    """
+
+    def __init__(self, budget: Optional[Budget] = None):
+        self.steps = 0
+        self.solutions = 0
+        self.budget = budget
+
+    def solve(self, grid: List[List[int]]) -> Optional[List[List[int]]]:
+        """Resuelve un Sudoku usando Dancing Links"""
+        _, solucion = self._ejecutar(grid, 1)
+        return solucion
+
+    def count(self, grid: List[List[int]], limit: int = 1000) -> int:
+        """Cuenta soluciones hasta `limit` (si se alcanza, el conteo es una cota inferior)"""
+        total, _ = self._ejecutar(grid, limit)
+        return total
+
+    def _ejecutar(self, grid: List[List[int]], limite: int) -> Tuple[int, Optional[List[List[int]]]]:
+        self.steps = 0
+        self.solutions = 0
+        # Copia de los enlaces: la plantilla se comparte entre llamadas
+        L, R, U, D, C, S = (list(x) for x in _PLANTILLA[:6])
+        FILA = _PLANTILLA[6]
+
+        def cubrir(c):
+            R[L[c]] = R[c]
+            L[R[c]] = L[c]
+            i = D[c]
+            while i != c:
+                j = R[i]
+                while j != i:
+                    U[D[j]] = U[j]
+                    D[U[j]] = D[j]
+                    S[C[j]] -= 1
+                    j = R[j]
+                i = D[i]
+
+        def descubrir(c):
+            i = U[c]
+            while i != c:
+                j = L[i]
+                while j != i:
+                    S[C[j]] += 1
+                    U[D[j]] = j
+                    D[U[j]] = j
+                    j = L[j]
+                i = U[i]
+            R[L[c]] = c
+            L[R[c]] = c
+
+        # Fijar las pistas cubriendo las columnas de su fila
+        cubiertas = set()
+        fijas = []
+        for r in range(9):
+            for c in range(9):
+                v = grid[r][c]
+                if not v:
+                    continue
+                fila_id = (r * 9 + c) * 9 + (v - 1)
+                for col in _restricciones(r, c, v - 1):
+                    if col in cubiertas:
+                        return 0, None
+                    cubiertas.add(col)
+                    cubrir(col + 1)
+                fijas.append(fila_id)
+
+        parcial = list(fijas)
+        primera = []
+
+        def buscar():
+            self.steps += 1
+            if self.budget is not None:
+                self.budget.check(self.steps)
+            if R[0] == 0:
+                self.solutions += 1
+                if not primera:
+                    primera.extend(parcial)
+                return self.solutions >= limite
+
+            # Columna con menos filas disponibles
+            mejor = R[0]
+            menor = S[mejor]
+            c = R[mejor]
+            while c != 0 and menor > 1:
+                if S[c] < menor:
+                    menor = S[c]
+                    mejor = c
+                c = R[c]
+            if menor == 0:
+                return False
+
+            cubrir(mejor)
+            fila = D[mejor]
+            detener = False
+            while fila != mejor:
+                parcial.append(FILA[fila])
+                j = R[fila]
+                while j != fila:
+                    cubrir(C[j])
+                    j = R[j]
+
+                detener = buscar()
+
+                j = L[fila]
+                while j != fila:
+                    descubrir(C[j])
+                    j = L[j]
+                parcial.pop()
+                if detener:
+                    break
+                fila = D[fila]
+            descubrir(mejor)
+            return detener
+
+        buscar()
+
+        if not primera:
+            return self.solutions, None
+
+        tablero = [[0] * 9 for _ in range(9)]
+        for fila_id in primera:
+            celda, d = divmod(fila_id, 9)
+            r, c = divmod(celda, 9)
+            tablero[r][c] = d + 1
+        return self.solutions, tablero
@@ -0,0 +1,247 @@
+import argparse
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple, Optional
+
+from bitmask_solver import BitmaskSudokuSolver, POPCOUNT
+from limits import BudgetExceeded
+from logic_solver import LogicSudokuSolver, NIVELES
+from wire_format import grilla_a_cadena
+
+# Grupos de celdas que se vacían juntos según la simetría pedida
+SIMETRIAS = {
+    "none": lambda r, c: {(r, c)},
+    "rotational": lambda r, c: {(r, c), (8 - r, 8 - c)},
+    "horizontal": lambda r, c: {(r, c), (r, 8 - c)},
+    "vertical": lambda r, c: {(r, c), (8 - r, c)},
+    "diagonal": lambda r, c: {(r, c), (c, r)},
+}
+
+DIFICULTADES = [nivel for _, nivel in NIVELES]
+
+# Intentos por puzzle antes de rendirse con una dificultad objetivo (hard
+# con simetría es el caso más difícil: del orden de 100 grillas por puzzle)
+MAX_INTENTOS = 1000
+
+
+class PuzzleGenerado(NamedTuple):
+    puzzle: List[List[int]]
+    solution: List[List[int]]
+    clues: int
+    difficulty: int
+    level: str
+
+
+def _orbitas(simetria: str) -> List[List[int]]:
+    """Particiona las 81 celdas en grupos cerrados bajo la simetría"""
+    regla = SIMETRIAS[simetria]
+    vistas = set()
+    orbitas = []
+    for r in range(9):
+        for c in range(9):
+            if (r, c) in vistas:
+                continue
+            grupo = regla(r, c)
+            vistas |= grupo
+            orbitas.append([f * 9 + k for f, k in sorted(grupo)])
+    return orbitas
+
+
+def _comprobar_hora(hasta: Optional[float]) -> None:
+    if hasta is not None and time.time() > hasta:
+        raise BudgetExceeded("tiempo de generación agotado")
+
+
+def grilla_completa(rng: random.Random) -> List[List[int]]:
+    """
+    Genera una grilla resuelta aleatoria: rellena al azar las tres cajas de
+    la diagonal (independientes entre sí), completa con el motor de máscaras
+    de bits y baraja bandas, pilas, filas, columnas y dígitos.
+    """
+    grid = [[0] * 9 for _ in range(9)]
+    for caja in range(3):
+        digitos = rng.sample(range(1, 10), 9)
+        for k, d in enumerate(digitos):
+            grid[caja * 3 + k // 3][caja * 3 + k % 3] = d
+    grid = BitmaskSudokuSolver().solve(grid)
+
+    def orden() -> List[int]:
+        bandas = rng.sample(range(3), 3)
+        return [b * 3 + i for b in bandas for i in rng.sample(range(3), 3)]
+
+    filas, columnas = orden(), orden()
+    etiquetas = [0] + rng.sample(range(1, 10), 9)
+    completa = [[etiquetas[grid[f][c]] for c in columnas] for f in filas]
+    if rng.random() < 0.5:
+        completa = [list(fila) for fila in zip(*completa)]
+    return completa
+
+
+def vaciar(solucion: List[List[int]], simetria: str, rng: random.Random) -> List[List[int]]:
+    """Quita pistas en orden aleatorio mientras el puzzle siga teniendo solución única"""
+    puzzle = [fila[:] for fila in solucion]
+    contador = BitmaskSudokuSolver()
+    orbitas = _orbitas(simetria)
+    rng.shuffle(orbitas)
+
+    for orbita in orbitas:
+        guardado = [puzzle[i // 9][i % 9] for i in orbita]
+        for i in orbita:
+            puzzle[i // 9][i % 9] = 0
+        if contador.count(puzzle, 2) != 1:
+            for i, v in zip(orbita, guardado):
+                puzzle[i // 9][i % 9] = v
+    return puzzle
+
+
+def ajustar_nivel(puzzle: List[List[int]], solucion: List[List[int]], simetria: str,
+                  rng: random.Random, nivel: str,
+                  hasta: Optional[float] = None) -> Optional[List[List[int]]]:
+    """
+    Lleva un puzzle que exige más que `nivel` hasta ese nivel devolviendo
+    pistas de la solución (órbitas completas, para conservar la simetría).
+
+    Donde el motor lógico limitado a `nivel` se atasca se prueban todas las
+    órbitas vacías: si alguna deja el puzzle resuelto justo en `nivel` se
+    termina; si no, se añade la primera que lo deja aún atascado y se
+    repite. Devuelve None si el puzzle ya es más fácil que `nivel` o si
+    cualquier pista lo deja más fácil.
+    """
+    orbita_de = {i: orbita for orbita in _orbitas(simetria) for i in orbita}
+    puzzle = [fila[:] for fila in puzzle]
+
+    def devolver(celdas, valor) -> None:
+        for i in celdas:
+            puzzle[i // 9][i % 9] = valor(i)
+
+    while True:
+        logica = LogicSudokuSolver(max_level=nivel)
+        if logica.solve(puzzle) is not None:
+            return puzzle if logica.level == nivel else None
+
+        # Celdas que el motor no llegó a decidir (más de un candidato)
+        vacias = [i for i in range(81) if POPCOUNT[logica.candidatos(i // 9, i % 9)] > 1]
+        rng.shuffle(vacias)
+        atascada = None
+        probadas = set()
+        for i in vacias:
+            orbita = tuple(k for k in orbita_de[i] if not puzzle[k // 9][k % 9])
+            if orbita in probadas:
+                continue
+            probadas.add(orbita)
+            _comprobar_hora(hasta)
+
+            devolver(orbita, lambda k: solucion[k // 9][k % 9])
+            prueba = LogicSudokuSolver(max_level=nivel)
+            if prueba.solve(puzzle) is None:
+                atascada = atascada or orbita
+            elif prueba.level == nivel:
+                return puzzle
+            devolver(orbita, lambda k: 0)
+
+        if atascada is None:
+            return None
+        devolver(atascada, lambda k: solucion[k // 9][k % 9])
+
+
+def generar_puzzle(simetria: str = "none", dificultad: Optional[str] = None,
+                   seed: Optional[int] = None, max_intentos: int = MAX_INTENTOS,
+                   hasta: Optional[float] = None) -> PuzzleGenerado:
+    """
+    Genera un puzzle de solución única con la simetría indicada. Si se pide
+    `dificultad`, el puzzle mínimo se lleva a ese nivel devolviendo pistas
+    (ajustar_nivel) y solo se cambia de grilla si no se consigue; expert se
+    acepta tal cual o se descarta. ValueError si no se logra en
+    `max_intentos` grillas y BudgetExceeded pasada la hora `hasta`
+    (time.time(), válida también en otro proceso).
+    """
+    if simetria not in SIMETRIAS:
+        raise ValueError(f"Simetría desconocida: {simetria}. Opciones: {', '.join(SIMETRIAS)}")
+    if dificultad is not None and dificultad not in DIFICULTADES:
+        raise ValueError(f"Dificultad desconocida: {dificultad}. Opciones: {', '.join(DIFICULTADES)}")
+
+    rng = random.Random(seed)
+    for _ in range(max_intentos):
+        _comprobar_hora(hasta)
+        solucion = grilla_completa(rng)
+        puzzle = vaciar(solucion, simetria, rng)
+
+        logica = LogicSudokuSolver()
+        logica.solve(puzzle)
+        if dificultad is not None and logica.level != dificultad:
+            # Un puzzle más fácil que el objetivo no se puede endurecer
+            # (ya es mínimo); uno más difícil se ajusta
+            if DIFICULTADES.index(logica.level) < DIFICULTADES.index(dificultad):
+                continue
+            puzzle = ajustar_nivel(puzzle, solucion, simetria, rng, dificultad, hasta)
+            if puzzle is None:
+                continue
+            logica.solve(puzzle)
+        return PuzzleGenerado(
+            puzzle=puzzle,
+            solution=solucion,
+            clues=sum(1 for fila in puzzle for v in fila if v),
+            difficulty=logica.difficulty,
+            level=logica.level,
+        )
+    raise ValueError(f"No se generó un puzzle {dificultad} en {max_intentos} intentos")
+
+
+def _generar_indice(indice: int, simetria: str, dificultad: Optional[str],
+                    seed: Optional[int], hasta: Optional[float]) -> Optional[PuzzleGenerado]:
+    try:
+        return generar_puzzle(simetria, dificultad, None if seed is None else seed + indice, hasta=hasta)
+    except BudgetExceeded:
+        return None
+
+
+def generar_lote(cantidad: int, simetria: str = "none", dificultad: Optional[str] = None,
+                 seed: Optional[int] = None, pool: Optional[ProcessPoolExecutor] = None,
+                 chunksize: int = 1, hasta: Optional[float] = None):
+    """
+    Genera `cantidad` puzzles, en paralelo si se pasa un pool de procesos.
+    Con `seed` el puzzle i usa la semilla seed + i, por lo que el resultado
+    es reproducible con cualquier número de procesos. Pasada la hora
+    `hasta` (time.time()) los puzzles que faltan se devuelven como None.
+    """
+    argumentos = (range(cantidad), [simetria] * cantidad, [dificultad] * cantidad,
+                  [seed] * cantidad, [hasta] * cantidad)
+    if pool is None:
+        return map(_generar_indice, *argumentos)
+    return pool.map(_generar_indice, *argumentos, chunksize=chunksize)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera puzzles de Sudoku de solución única")
+    parser.add_argument("cantidad", type=int, help="Número de puzzles a generar")
+    parser.add_argument("-o", "--output", default="puzzles.txt",
+                        help="Fichero de salida (un puzzle de 81 caracteres por línea)")
+    parser.add_argument("-s", "--symmetry", default="none", choices=list(SIMETRIAS))
+    parser.add_argument("-d", "--difficulty", default=None, choices=DIFICULTADES)
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Procesos a usar (por defecto uno por núcleo)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--with-solution", action="store_true",
+                        help="Añadir la solución y el nivel en cada línea")
+    args = parser.parse_args()
+
+    inicio = time.time()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool, open(args.output, "w") as salida:
+        chunksize = max(1, min(64, args.cantidad // (pool._max_workers * 4)))
+        puzzles = generar_lote(args.cantidad, args.symmetry, args.difficulty, args.seed, pool, chunksize)
+        for k, generado in enumerate(puzzles, 1):
+            linea = grilla_a_cadena(generado.puzzle)
+            if args.with_solution:
+                linea += f" {grilla_a_cadena(generado.solution)} {generado.level}"
+            salida.write(linea + "\n")
+            if k % 1000 == 0:
+                print(f"[INFO] {k}/{args.cantidad} puzzles generados")
+
+    elapsed = time.time() - inicio
+    print(f"[INFO] {args.cantidad} puzzles escritos en {args.output} "
+          f"en {elapsed:.1f} s ({args.cantidad / elapsed * 60:.0f} puzzles/min)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import threading
+import time
+from typing import Optional
+
+
+class BudgetExceeded(Exception):
+    """Se superó el presupuesto de tiempo o de pasos de una resolución"""
+
+
+class Budget:
+    """
+    Presupuesto cooperativo de una resolución.
+
+    Los motores llaman a `check(steps)` en cada nodo de búsqueda; si se
+    supera `max_steps` o la hora límite derivada de `max_ms`, se lanza
+    BudgetExceeded. El reloj solo se consulta cada 64 pasos.
+
+    `cancel` permite detener desde otro hilo la resolución que usa el
+    presupuesto (p. ej. el perdedor de una carrera entre motores).
+    """
+
+    def __init__(self, max_ms: Optional[float] = None, max_steps: Optional[int] = None):
+        self.max_ms = max_ms
+        self.max_steps = max_steps
+        self.deadline = time.perf_counter() + max_ms / 1000 if max_ms else None
+        self.cancelled = False
+
+    def derive(self) -> "Budget":
+        """Presupuesto con los mismos límites (y hora límite) pero cancelable por separado"""
+        hijo = Budget(max_steps=self.max_steps)
+        hijo.max_ms = self.max_ms
+        hijo.deadline = self.deadline
+        return hijo
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def check(self, steps: int) -> None:
+        if self.cancelled:
+            raise BudgetExceeded("cancelado")
+        if self.max_steps is not None and steps > self.max_steps:
+            raise BudgetExceeded(f"más de {self.max_steps} pasos")
+        if self.deadline is not None and not steps & 63 and time.perf_counter() > self.deadline:
+            raise BudgetExceeded(f"más de {self.max_ms:g} ms")
+
+
+class AdmissionControl:
+    """
+    Limita las resoluciones simultáneas y el tamaño de la cola de espera.
+
+    `entrar` devuelve False (sin bloquear) cuando ya hay `max_concurrent`
+    peticiones ejecutando y `max_queue` esperando; en otro caso espera un
+    hueco y devuelve True. Cada `entrar` exitoso se cierra con `salir`.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.rejected = 0
+        self._slots = threading.Semaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._en_curso = 0
+
+    def entrar(self) -> bool:
+        with self._lock:
+            if self._en_curso >= self.max_concurrent + self.max_queue:
+                self.rejected += 1
+                return False
+            self._en_curso += 1
+        self._slots.acquire()
+        return True
+
+    def salir(self) -> None:
+        self._slots.release()
+        with self._lock:
+            self._en_curso -= 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self._en_curso,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,307 @@
+from itertools import combinations
+from typing import Dict, List, Optional
+
+from limits import Budget
+from bitmask_solver import (
+    BitmaskSudokuSolver, TODOS, FILAS, COLUMNAS, CAJAS, UNIDADES, PARES,
+    POPCOUNT, BIT_A_DIGITO,
+)
+
+# Coste de cada técnica; también define el orden en que se intentan
+COSTES = {
+    "naked_single": 1,
+    "hidden_single": 2,
+    "pointing": 5,
+    "claiming": 5,
+    "naked_pair": 8,
+    "hidden_pair": 10,
+    "naked_triple": 12,
+    "hidden_triple": 15,
+    "x_wing": 25,
+    "swordfish": 40,
+    "search": 100,
+}
+
+# Nivel según la técnica más cara necesaria
+NIVELES = [(2, "easy"), (10, "medium"), (40, "hard"), (100, "expert")]
+
+FILA_DE = [i // 9 for i in range(81)]
+COLUMNA_DE = [i % 9 for i in range(81)]
+CAJA_DE = [(i // 27) * 3 + (i % 9) // 3 for i in range(81)]
+
+
+def _celda(i: int) -> List[int]:
+    return [i // 9, i % 9]
+
+
+class LogicSudokuSolver:
+    """
+    Motor lógico que aplica técnicas humanas por orden de coste y solo
+    recurre a búsqueda cuando se atasca.
+
+    Tras `solve`, `trace` contiene las deducciones en formato compacto
+    ({"t": técnica, ...}), `difficulty` la suma de costes y `level` el
+    nivel según la técnica más cara utilizada. El `budget` se comprueba
+    tras cada deducción y se transmite a la búsqueda de respaldo.
+
+    Con `max_level` solo se usan las técnicas de ese nivel o inferiores y
+    no hay búsqueda: `solve` devuelve None si la lógica no basta.
+    """
+
+    def __init__(self, budget: Optional[Budget] = None, max_level: Optional[str] = None):
+        self.steps = 0
+        self.budget = budget
+        self.max_level = max_level
+        self.trace: List[Dict] = []
+        self.difficulty = 0
+        self.level = ""
+        self._tecnicas = [
+            ("naked_single", self._naked_single),
+            ("hidden_single", self._hidden_single),
+            ("pointing", self._pointing),
+            ("claiming", self._claiming),
+            ("naked_pair", lambda: self._naked_subset(2)),
+            ("hidden_pair", lambda: self._hidden_subset(2)),
+            ("naked_triple", lambda: self._naked_subset(3)),
+            ("hidden_triple", lambda: self._hidden_subset(3)),
+            ("x_wing", lambda: self._fish(2)),
+            ("swordfish", lambda: self._fish(3)),
+        ]
+        if max_level is not None:
+            max_coste = next(coste for coste, nivel in NIVELES if nivel == max_level)
+            self._tecnicas = [(n, t) for n, t in self._tecnicas if COSTES[n] <= max_coste]
+
+    def solve(self, grid: List[List[int]]) -> Optional[List[List[int]]]:
+        """Resuelve un Sudoku por deducción lógica (con búsqueda como último recurso)"""
+        self.steps = 0
+        self.trace = []
+        self.difficulty = 0
+        self.level = ""
+        if not self.iniciar(grid):
+            return None
+
+        while not all(self._v):
+            progreso = self.paso()
+            if progreso is False:
+                return None
+            if progreso:
+                self.steps += 1
+                if self.budget is not None:
+                    self.budget.check(self.steps)
+            else:
+                # Ninguna técnica avanza: terminar con búsqueda
+                if self.max_level is not None:
+                    return None
+                buscador = BitmaskSudokuSolver(self.budget)
+                try:
+                    solucion = buscador.solve([self._v[r * 9:(r + 1) * 9] for r in range(9)])
+                finally:
+                    self.steps += buscador.steps
+                self._registrar("search", nodes=buscador.steps)
+                if solucion is None:
+                    return None
+                self._v = [d for fila in solucion for d in fila]
+
+        maximo = max((COSTES[p["t"]] for p in self.trace), default=0)
+        self.level = next(nivel for coste, nivel in NIVELES if maximo <= coste)
+        return [self._v[r * 9:(r + 1) * 9] for r in range(9)]
+
+    # --- Resolución paso a paso (sesiones interactivas) ---
+
+    def iniciar(self, grid: List[List[int]]) -> bool:
+        """Prepara los candidatos con las pistas; False si se contradicen"""
+        self._v = [0] * 81
+        self._c = [TODOS] * 81
+        for r in range(9):
+            for c in range(9):
+                if grid[r][c] and not self._colocar(r * 9 + c, grid[r][c]):
+                    return False
+        return True
+
+    def paso(self) -> Optional[bool]:
+        """
+        Aplica la técnica más barata que avance y la anota en `trace`.
+        None si ninguna avanza, False si se llega a una contradicción.
+        """
+        for _, tecnica in self._tecnicas:
+            progreso = tecnica()
+            if progreso is not None:
+                return progreso
+        return None
+
+    def colocar(self, r: int, c: int, d: int) -> bool:
+        """Coloca un dígito conocido y actualiza los candidatos de sus pares"""
+        return self._colocar(r * 9 + c, d)
+
+    def candidatos(self, r: int, c: int) -> int:
+        """Máscara de candidatos de una celda (un único bit si está decidida)"""
+        return self._c[r * 9 + c]
+
+    # --- Utilidades ---
+
+    def _registrar(self, tecnica: str, **datos) -> None:
+        self.difficulty += COSTES[tecnica]
+        self.trace.append({"t": tecnica, **datos})
+
+    def _colocar(self, i: int, d: int) -> bool:
+        bit = 1 << (d - 1)
+        if self._v[i] or not self._c[i] & bit:
+            return self._v[i] == d
+        self._v[i] = d
+        self._c[i] = bit
+        for p in PARES[i]:
+            if self._c[p] & bit:
+                self._c[p] ^= bit
+                if not self._c[p]:
+                    return False
+        return True
+
+    def _eliminar(self, tecnica: str, objetivos, **datos):
+        """Quita (celda, máscara) de los candidatos. None si no hubo cambios."""
+        quitados = []
+        for i, mascara in objetivos:
+            comun = self._c[i] & mascara
+            if self._v[i] or not comun:
+                continue
+            self._c[i] ^= comun
+            while comun:
+                bit = comun & -comun
+                comun ^= bit
+                quitados.append(_celda(i) + [BIT_A_DIGITO[bit]])
+            if not self._c[i]:
+                return False
+        if not quitados:
+            return None
+        self._registrar(tecnica, removed=quitados, **datos)
+        return True
+
+    def _posiciones(self, unidad: List[int], bit: int) -> List[int]:
+        return [i for i in unidad if not self._v[i] and self._c[i] & bit]
+
+    # --- Técnicas ---
+
+    def _naked_single(self):
+        for i in range(81):
+            if not self._v[i] and POPCOUNT[self._c[i]] == 1:
+                d = BIT_A_DIGITO[self._c[i]]
+                self._registrar("naked_single", cell=_celda(i), value=d)
+                return self._colocar(i, d)
+        return None
+
+    def _hidden_single(self):
+        for unidad in UNIDADES:
+            una_vez = 0
+            varias = 0
+            for i in unidad:
+                cand = self._c[i]
+                varias |= una_vez & cand
+                una_vez |= cand
+            if una_vez != TODOS:
+                return False
+            unicos = una_vez & ~varias
+            for i in unidad:
+                bit = self._c[i] & unicos
+                if not self._v[i] and bit:
+                    if POPCOUNT[bit] > 1:
+                        return False
+                    d = BIT_A_DIGITO[bit]
+                    self._registrar("hidden_single", cell=_celda(i), value=d)
+                    return self._colocar(i, d)
+        return None
+
+    def _pointing(self):
+        # Dígito confinado a una línea dentro de una caja: fuera de la caja se elimina
+        for caja in CAJAS:
+            for d in range(1, 10):
+                bit = 1 << (d - 1)
+                pos = self._posiciones(caja, bit)
+                if len(pos) < 2:
+                    continue
+                for linea_de, lineas in ((FILA_DE, FILAS), (COLUMNA_DE, COLUMNAS)):
+                    if len({linea_de[i] for i in pos}) == 1:
+                        objetivos = [(i, bit) for i in lineas[linea_de[pos[0]]] if i not in caja]
+                        progreso = self._eliminar("pointing", objetivos, digit=d,
+                                                  cells=[_celda(i) for i in pos])
+                        if progreso is not None:
+                            return progreso
+        return None
+
+    def _claiming(self):
+        # Dígito de una línea confinado a una caja: el resto de la caja se elimina
+        for linea in FILAS + COLUMNAS:
+            for d in range(1, 10):
+                bit = 1 << (d - 1)
+                pos = self._posiciones(linea, bit)
+                if len(pos) < 2 or len({CAJA_DE[i] for i in pos}) != 1:
+                    continue
+                objetivos = [(i, bit) for i in CAJAS[CAJA_DE[pos[0]]] if i not in linea]
+                progreso = self._eliminar("claiming", objetivos, digit=d,
+                                          cells=[_celda(i) for i in pos])
+                if progreso is not None:
+                    return progreso
+        return None
+
+    def _naked_subset(self, k: int):
+        tecnica = "naked_pair" if k == 2 else "naked_triple"
+        for unidad in UNIDADES:
+            vacias = [i for i in unidad if not self._v[i] and POPCOUNT[self._c[i]] <= k]
+            for grupo in combinations(vacias, k):
+                union = 0
+                for i in grupo:
+                    union |= self._c[i]
+                if POPCOUNT[union] != k:
+                    continue
+                objetivos = [(i, union) for i in unidad if i not in grupo]
+                progreso = self._eliminar(tecnica, objetivos, cells=[_celda(i) for i in grupo],
+                                          digits=[BIT_A_DIGITO[1 << b] for b in range(9) if union >> b & 1])
+                if progreso is not None:
+                    return progreso
+        return None
+
+    def _hidden_subset(self, k: int):
+        tecnica = "hidden_pair" if k == 2 else "hidden_triple"
+        for unidad in UNIDADES:
+            lugares = {}
+            for d in range(1, 10):
+                pos = self._posiciones(unidad, 1 << (d - 1))
+                if 2 <= len(pos) <= k:
+                    lugares[d] = pos
+            for digitos in combinations(lugares, k):
+                celdas = set()
+                for d in digitos:
+                    celdas.update(lugares[d])
+                if len(celdas) != k:
+                    continue
+                mascara = 0
+                for d in digitos:
+                    mascara |= 1 << (d - 1)
+                objetivos = [(i, TODOS ^ mascara) for i in sorted(celdas)]
+                progreso = self._eliminar(tecnica, objetivos, cells=[_celda(i) for i in sorted(celdas)],
+                                          digits=list(digitos))
+                if progreso is not None:
+                    return progreso
+        return None
+
+    def _fish(self, k: int):
+        tecnica = "x_wing" if k == 2 else "swordfish"
+        for d in range(1, 10):
+            bit = 1 << (d - 1)
+            for bases, cubiertas, cruce in ((FILAS, COLUMNAS, COLUMNA_DE), (COLUMNAS, FILAS, FILA_DE)):
+                lineas = {}
+                for n, linea in enumerate(bases):
+                    pos = self._posiciones(linea, bit)
+                    if 2 <= len(pos) <= k:
+                        lineas[n] = {cruce[i] for i in pos}
+                for grupo in combinations(lineas, k):
+                    cubierta = set()
+                    for n in grupo:
+                        cubierta |= lineas[n]
+                    if len(cubierta) != k:
+                        continue
+                    base = {i for n in grupo for i in bases[n]}
+                    objetivos = [(i, bit) for m in sorted(cubierta) for i in cubiertas[m] if i not in base]
+                    progreso = self._eliminar(tecnica, objetivos, digit=d,
+                                              lines=sorted(grupo), cover=sorted(cubierta))
+                    if progreso is not None:
+                        return progreso
+        return None
@@ -1,21 +1,182 @@
 import cv2
 import numpy as np
+import itertools
 import os
-from typing import List, Tuple, Optional, Dict
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple, Optional, Dict
 from sudoku import Sudoku  # Importar la librería py-sudoku
+from conflicts import buscar_conflictos
+from digit_classifier import PESOS_PATH, DigitClassifier
+
+# Templates relativos al paquete (no al directorio de trabajo)
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+# Templates ya binarizados en un único fichero (ver construir_bundle_templates);
+# si falta o no tiene todos los dígitos se leen los PNG
+TEMPLATES_BUNDLE = os.path.join(TEMPLATES_DIR, "templates.npz")
+
+# Templates cargados por tamaño de grilla, compartidos (solo lectura) por
+# todos los detectores del proceso
+_templates_por_tamano: Dict[int, Dict[int, np.ndarray]] = {}
+_templates_lock = threading.Lock()
+
+# Lado (px) al que se normaliza el trazo de cada celda y de cada template
+# en el reconocimiento por lotes
+LADO_CANONICO = 32
+
+# Fracción de cada borde de la celda que se ignora al buscar el trazo del
+# dígito, para no confundirlo con las líneas de la grilla
+MARGEN_CELDA = 0.12
+
+# Fracción de negro a partir de la cual una fila o columna de la celda se
+# considera una línea de la grilla y no parte del dígito
+FRACCION_LINEA = 0.6
+
+# Reconocedores de dígitos disponibles (config "recognizer")
+RECONOCEDORES = ("templates", "classifier")
+
+# Probabilidad mínima de la clase elegida por el clasificador de dígitos
+UMBRAL_CLASIFICADOR = 0.8
+
+# Clasificadores cargados por ruta de pesos, compartidos como los templates
+_clasificadores: Dict[str, DigitClassifier] = {}
+
+
+def construir_bundle_templates(directorio: str = TEMPLATES_DIR, destino: str = TEMPLATES_BUNDLE) -> int:
+    """
+    Binariza los templates <n>.png de `directorio` (mismo umbral fijo que
+    _preprocess_image) y los guarda juntos en un .npz sin comprimir.
+    Devuelve el número de templates guardados.
+    """
+    templates = {}
+    for nombre in sorted(os.listdir(directorio)):
+        base, extension = os.path.splitext(nombre)
+        if extension != ".png" or not base.isdigit():
+            continue
+        img = cv2.imread(os.path.join(directorio, nombre), cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            print(f"[ERROR] No se pudo cargar el template: {nombre}")
+            continue
+        _, templates[base] = cv2.threshold(img, 150, 255, cv2.THRESH_BINARY)
+    np.savez(destino, **templates)
+    print(f"[INFO] {len(templates)} templates guardados en {destino}")
+    return len(templates)
+
+class DebugSink:
+    """
+    Escribe en `directorio` fotogramas anotados del detector desde un hilo
+    en segundo plano, para depurar sin bloquear las peticiones.
+
+    Solo se captura una fracción `muestreo` de las ejecuciones (decidida al
+    empezar cada una, antes de dibujar nada) y la cola está acotada: si el
+    disco no da abasto los fotogramas se descartan y se cuentan en `dropped`.
+    """
+
+    def __init__(self, directorio: str, muestreo: float = 1.0, max_cola: int = 32):
+        os.makedirs(directorio, exist_ok=True)
+        self.directorio = directorio
+        self.muestreo = muestreo
+        self.written = 0
+        self.dropped = 0
+        self._cola: "queue.Queue" = queue.Queue(maxsize=max_cola)
+        self._contador = itertools.count(1)
+        self._hilo = threading.Thread(target=self._escribir, name="debug-sink", daemon=True)
+        self._hilo.start()
+
+    def muestrear(self) -> bool:
+        return random.random() < self.muestreo
+
+    def enviar(self, clave: str, imagen: np.ndarray) -> None:
+        """Encola el fotograma sin bloquear (se descarta si la cola está llena)"""
+        nombre = f"{time.strftime('%Y%m%d-%H%M%S')}_{next(self._contador):06d}_{re.sub(r'[^a-z0-9]+', '_', clave.lower())}.png"
+        try:
+            self._cola.put_nowait((nombre, imagen))
+        except queue.Full:
+            self.dropped += 1
+
+    def _escribir(self) -> None:
+        while True:
+            elemento = self._cola.get()
+            if elemento is None:
+                return
+            nombre, imagen = elemento
+            if cv2.imwrite(os.path.join(self.directorio, nombre), imagen):
+                self.written += 1
+
+    def cerrar(self, timeout: float = 5.0) -> None:
+        """Escribe lo pendiente y detiene el hilo"""
+        self._cola.put(None)
+        self._hilo.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "directory": self.directorio,
+            "sample_rate": self.muestreo,
+            "queued": self._cola.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
 
 class SudokuBoardDetector:
     """
     Clase para detectar, segmentar y reconocer la grilla 9x9 de un tablero de Sudoku
     a partir de una imagen. Utiliza Template Matching para el reconocimiento de dígitos.
+
+    Para tableros N x N, indicar en `config` las dimensiones de caja
+    ("box_rows", "box_cols"); por defecto 3x3. Los dígitos mayores que 9
+    requieren su template templates/<n>.png.
+
+    Los templates se cargan una vez por proceso y tamaño de grilla y se
+    comparten entre instancias; para reutilizar detectores entre
+    peticiones concurrentes, usar DetectorPool.
+
+    Con "recognizer": "classifier" en `config` los dígitos se reconocen
+    con el clasificador de digit_classifier.py (pesos en "classifier_path",
+    por defecto templates/digit_classifier.npz) en lugar de con templates.
+
+    Con "headless": True en `config` no se abre ninguna ventana ni se
+    dibujan visualizaciones (para servidores). Con "debug_sink" (un
+    DebugSink) las ejecuciones muestreadas dibujan sus visualizaciones y
+    las envían al sink en lugar de mostrarlas.
+
+    Tras `obtener_grilla_final`, `tiempos` contiene los ms de cada etapa
+    (decode, detect, segment, recognize) que se llegaron a ejecutar y
+    `conteos` el trabajo hecho (contours examinados, template_matches) y
+    `confianza` la matriz N x N de confianza del reconocimiento.
     """
 
     def __init__(self, config: Optional[Dict] = None):
         self.config = config if config is not None else {}
-        self.GRID_SIZE = 9
+        self.BOX_ROWS = self.config.get("box_rows", 3)
+        self.BOX_COLS = self.config.get("box_cols", 3)
+        self.GRID_SIZE = self.BOX_ROWS * self.BOX_COLS
         self.UMBRAL_ACEPTACION = 0.7  # Umbral que funciona en template_matching.py
+        self.HEADLESS = self.config.get("headless", False)
+        self.debug_sink: Optional[DebugSink] = self.config.get("debug_sink")
+        # Si la ejecución actual envía sus visualizaciones al sink
+        self._capturar = False
+        self.tiempos: Dict[str, float] = {}
+        self.conteos: Dict[str, int] = {}
+        self._inicio_etapa = 0.0
         # Cargar las plantillas de dígitos al inicializar la clase
         self.templates = self._cargar_templates()
+        # Templates normalizados para el reconocimiento por lotes (una fila
+        # por dígito) y confianza por celda de la última grilla reconocida
+        self._digitos_templates = np.array(sorted(self.templates), dtype=int)
+        self._matriz_templates = (
+            self._normalizar_lote([self._recortar_trazo(self.templates[d], 0.0)[0] for d in self._digitos_templates])
+            if self.templates else np.zeros((0, LADO_CANONICO ** 2), dtype=np.float32))
+        self.confianza: Optional[np.ndarray] = None
+        self.RECONOCEDOR = self.config.get("recognizer", "templates")
+        if self.RECONOCEDOR not in RECONOCEDORES:
+            raise ValueError(f"Reconocedor desconocido: {self.RECONOCEDOR!r} (válidos: {', '.join(RECONOCEDORES)})")
+        self.clasificador = self._cargar_clasificador() if self.RECONOCEDOR == "classifier" else None
 
     def _preprocess_image(self, image_path: str, invert: bool = False) -> Optional[np.ndarray]:
         """
@@ -39,6 +200,48 @@ class SudokuBoardDetector:
         return binary_img
 
     def _cargar_templates(self) -> Dict[int, np.ndarray]:
+        """
+        Devuelve los templates de dígitos del tamaño de grilla, leyéndolos
+        solo la primera vez en el proceso (del bundle o de los PNG)
+        """
+        with _templates_lock:
+            templates = _templates_por_tamano.get(self.GRID_SIZE)
+            if templates is None:
+                templates = self._leer_bundle() or self._leer_pngs()
+                _templates_por_tamano[self.GRID_SIZE] = templates
+        return templates
+
+    def _cargar_clasificador(self) -> Optional[DigitClassifier]:
+        """
+        Clasificador de dígitos compartido por el proceso; None (se usan los
+        templates) si la grilla no es 9x9 o no hay fichero de pesos
+        """
+        if self.GRID_SIZE != 9:
+            print("[ERROR] El clasificador solo reconoce los dígitos 1-9; se usan los templates")
+            return None
+        path = self.config.get("classifier_path", PESOS_PATH)
+        with _templates_lock:
+            clasificador = _clasificadores.get(path)
+            if clasificador is None:
+                if not os.path.exists(path):
+                    print(f"[ERROR] No se encontraron los pesos del clasificador: {path}; se usan los templates")
+                    return None
+                clasificador = _clasificadores[path] = DigitClassifier.cargar(path)
+                print(f"[Setup] Clasificador de dígitos cargado de {path}")
+        return clasificador
+
+    def _leer_bundle(self) -> Optional[Dict[int, np.ndarray]]:
+        """Templates ya binarizados del bundle .npz; None si falta alguno"""
+        if not os.path.exists(TEMPLATES_BUNDLE):
+            return None
+        with np.load(TEMPLATES_BUNDLE) as bundle:
+            templates = {i: bundle[str(i)] for i in range(1, self.GRID_SIZE + 1) if str(i) in bundle.files}
+        if len(templates) < self.GRID_SIZE:
+            return None
+        print(f"[Setup] {len(templates)} templates cargados de {TEMPLATES_BUNDLE}")
+        return templates
+
+    def _leer_pngs(self) -> Dict[int, np.ndarray]:
         """
         Carga y preprocesa las imágenes de los dígitos (templates) usando EXACTAMENTE
         el mismo preprocesamiento que en template_matching.py
@@ -46,7 +249,7 @@ class SudokuBoardDetector:
         templates = {}
         print("[Setup] Cargando templates de dígitos...")
         for i in range(1, self.GRID_SIZE + 1):
-            template_path = f'./templates/{i}.png'
+            template_path = os.path.join(TEMPLATES_DIR, f"{i}.png")
 
             # Usar el mismo preprocesamiento que en template_matching.py
             template_img = self._preprocess_image(template_path, invert=False)
@@ -59,6 +262,20 @@ class SudokuBoardDetector:
 
         return templates
 
+    @property
+    def _dibujar(self) -> bool:
+        """Si hay que construir las visualizaciones (ventana o sink)"""
+        return not self.HEADLESS or self._capturar
+
+    def _mostrar(self, clave: str, titulo: str, imagen: np.ndarray) -> None:
+        """Envía la visualización al sink o la muestra en una ventana"""
+        if self._capturar:
+            self.debug_sink.enviar(clave, imagen)
+        if not self.HEADLESS:
+            cv2.imshow(titulo, imagen)
+            cv2.waitKey(0)
+            cv2.destroyAllWindows()
+
     def detectar_tablero(self, imagen: np.ndarray) -> Optional[Dict]:
         """ Detecta y retorna la ROI del tablero. """
         print("[Paso 1] Buscando la ROI y las sub-grillas...")
@@ -68,10 +285,11 @@ class SudokuBoardDetector:
 
         # 2. Encontrar contornos
         contornos, _ = cv2.findContours(imagen_procesada, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+        self.conteos["contours"] = self.conteos.get("contours", 0) + len(contornos)
 
         contorno_tablero_optimo = None
         max_area = 0
-        imagen_vis = imagen.copy()
+        imagen_vis = imagen.copy() if self._dibujar else None
 
         # 3. Seleccionar el contorno del tablero 9x9
         for contorno in contornos:
@@ -97,9 +315,10 @@ class SudokuBoardDetector:
             roi_tablero = imagen[y:y+h, x:x+w]
             resultados["roi_tablero"] = roi_tablero
 
-            cv2.drawContours(imagen_vis, [contorno_tablero_optimo], 0, (0, 0, 255), 3)
+            if imagen_vis is not None:
+                cv2.drawContours(imagen_vis, [contorno_tablero_optimo], 0, (0, 0, 255), 3)
 
-            # --- Detección de las 9 Sub-Grillas ---
+            # --- Detección de las N Sub-Grillas ---
             contornos_bloque = []
             for contorno in contornos:
                 area = cv2.contourArea(contorno)
@@ -108,29 +327,28 @@ class SudokuBoardDetector:
 
                 if (x <= x_c and y <= y_c and x + w >= x_c + w_c and y + h >= y_c + h_c):
                     if 0.9 <= aspect_ratio_c <= 1.1:
-                        if area > max_area / 12.0 and area < max_area * 0.9:
+                        if area > max_area / (self.GRID_SIZE * 4 / 3) and area < max_area * 0.9:
                             contornos_bloque.append(contorno)
 
             if contornos_bloque:
                 contornos_bloque.sort(key=cv2.contourArea, reverse=True)
-                contornos_bloque_final = contornos_bloque[:9]
+                contornos_bloque_final = contornos_bloque[:self.GRID_SIZE]
 
                 for contorno_bloque in contornos_bloque_final:
                     x_b, y_b, w_b, h_b = cv2.boundingRect(contorno_bloque)
-                    cv2.rectangle(imagen_vis, (x_b, y_b), (x_b + w_b, y_b + h_b), (255, 0, 0), 2)
+                    if imagen_vis is not None:
+                        cv2.rectangle(imagen_vis, (x_b, y_b), (x_b + w_b, y_b + h_b), (255, 0, 0), 2)
                     resultados["sub_grids_coords"].append((x_b, y_b, w_b, h_b))
 
-            cv2.imshow("Tablero y Sub-Grillas Detectados", imagen_vis)
-            cv2.waitKey(0)
-            cv2.destroyAllWindows()
+            if imagen_vis is not None:
+                self._mostrar("tablero", "Tablero y Sub-Grillas Detectados", imagen_vis)
 
             return resultados
 
         else:
             print("[ERROR] No se pudo encontrar un contorno de tablero principal con criterios adecuados.")
-            cv2.imshow("No se detecto Tablero", imagen_vis)
-            cv2.waitKey(0)
-            cv2.destroyAllWindows()
+            if imagen_vis is not None:
+                self._mostrar("sin_tablero", "No se detecto Tablero", imagen_vis)
 
         return None
 
@@ -144,15 +362,15 @@ class SudokuBoardDetector:
 
     def segmentar_celdas(self, roi_tablero_gris: np.ndarray,
                          roi_tablero_original: Optional[np.ndarray] = None) -> List[np.ndarray]:
-        """ Divide la imagen del tablero (ROI) en 81 sub-imágenes (celdas). """
-        print("[Paso 2] Segmentando 81 celdas...")
+        """ Divide la imagen del tablero (ROI) en N x N sub-imágenes (celdas). """
+        print(f"[Paso 2] Segmentando {self.GRID_SIZE ** 2} celdas...")
         h, w = roi_tablero_gris.shape[:2]
 
         celdas = []
         cell_w = w // self.GRID_SIZE
         cell_h = h // self.GRID_SIZE
 
-        imagen_vis = roi_tablero_original.copy() if roi_tablero_original is not None else None
+        imagen_vis = roi_tablero_original.copy() if roi_tablero_original is not None and self._dibujar else None
 
         for r in range(self.GRID_SIZE):
             for c in range(self.GRID_SIZE):
@@ -168,9 +386,7 @@ class SudokuBoardDetector:
                     cv2.rectangle(imagen_vis, (x_min, y_min), (x_max, y_max), (0, 255, 255), 1)
 
         if imagen_vis is not None:
-            cv2.imshow("Segmentacion 81 Celdas", imagen_vis)
-            cv2.waitKey(0)
-            cv2.destroyAllWindows()
+            self._mostrar("segmentacion", f"Segmentacion {self.GRID_SIZE ** 2} Celdas", imagen_vis)
 
         return celdas
 
@@ -184,63 +400,165 @@ class SudokuBoardDetector:
 
         return binary_celda
 
-    def reconocer_digito(self, celda_img: np.ndarray) -> int:
+    def _recortar_trazo(self, binaria: np.ndarray, margen: float) -> Optional[Tuple[np.ndarray, float]]:
         """
-        Aplica el MISMO Template Matching que funciona en template_matching.py
+        Recorta el trazo (píxeles negros) de una celda o template binarizado,
+        ignorando la fracción `margen` de cada borde, y lo devuelve centrado
+        en un cuadrado de LADO_CANONICO (conservando la proporción, para no
+        convertir un 1 en un bloque) junto con su tamaño: el lado mayor del
+        trazo como fracción del de la celda. None si no hay trazo.
         """
-        # 1. Preprocesar la celda exactamente como en template_matching.py
-        celda_preprocesada = self._preprocesar_celda(celda_img)
-
-        # 2. Comprobar si la celda está vacía (similar a template_matching)
-        if np.count_nonzero(celda_preprocesada) < 150:
-            return 0
-
-        # 3. Template Matching IDÉNTICO a template_matching.py
-        mejor_match = 0
-        mejor_digito = 0
-
-        for digito, template in self.templates.items():
-            h_temp, w_temp = template.shape[:2]
-
-            # Verificar que la celda no sea más pequeña que el template
-            if celda_preprocesada.shape[0] < h_temp or celda_preprocesada.shape[1] < w_temp:
-                # Redimensionar template para que quepa en la celda
-                scale_h = celda_preprocesada.shape[0] / h_temp
-                scale_w = celda_preprocesada.shape[1] / w_temp
-                scale = min(scale_h, scale_w) * 0.8  # Reducir un poco para margen
-                new_h = int(h_temp * scale)
-                new_w = int(w_temp * scale)
-                template_resized = cv2.resize(template, (new_w, new_h), interpolation=cv2.INTER_AREA)
-            else:
-                template_resized = template
-
-            # Aplicar Template Matching
-            resultado = cv2.matchTemplate(celda_preprocesada, template_resized, cv2.TM_CCOEFF_NORMED)
-
-            # Encontrar el máximo valor
-            _, max_val, _, _ = cv2.minMaxLoc(resultado)
-
-            if max_val > mejor_match:
-                mejor_match = max_val
-                mejor_digito = digito
-
-        # 4. Aplicar el mismo umbral de aceptación
-        if mejor_match >= self.UMBRAL_ACEPTACION:
-            return mejor_digito
-        else:
-            return 0
+        h, w = binaria.shape[:2]
+        my, mx = int(h * margen), int(w * margen)
+        trazo = binaria[my:h - my, mx:w - mx] == 0
+        # Restos de las líneas de la grilla si la ROI no está bien alineada:
+        # filas o columnas casi enteras de negro que llegan a los dos bordes
+        # del interior. El palo de un 1 o un 4 también puede superar la
+        # fracción, pero no toca los bordes
+        bh, bw = max(1, trazo.shape[0] // 10), max(1, trazo.shape[1] // 10)
+        lineas_h = ((trazo.mean(axis=1) > FRACCION_LINEA)
+                    & trazo[:, :bw].any(axis=1) & trazo[:, -bw:].any(axis=1))
+        lineas_v = ((trazo.mean(axis=0) > FRACCION_LINEA)
+                    & trazo[:bh, :].any(axis=0) & trazo[-bh:, :].any(axis=0))
+        trazo[lineas_h, :] = False
+        trazo[:, lineas_v] = False
+        filas = np.flatnonzero(trazo.any(axis=1))
+        if filas.size == 0:
+            return None
+        columnas = np.flatnonzero(trazo.any(axis=0))
+        trazo = trazo[filas[0]:filas[-1] + 1, columnas[0]:columnas[-1] + 1]
+        alto, ancho = trazo.shape
+        lado = max(alto, ancho)
+        cuadrado = np.zeros((lado, lado), dtype=np.float32)
+        y, x = (lado - alto) // 2, (lado - ancho) // 2
+        cuadrado[y:y + alto, x:x + ancho] = trazo
+        canonico = cv2.resize(cuadrado, (LADO_CANONICO, LADO_CANONICO), interpolation=cv2.INTER_AREA)
+        # Suavizar tolera trazos más finos o desplazados un par de píxeles
+        return cv2.GaussianBlur(canonico, (5, 5), 0), lado / max(h, w)
+
+    @staticmethod
+    def _normalizar_lote(trazos) -> np.ndarray:
+        """Apila los trazos como filas de media cero y norma uno"""
+        lote = np.stack(trazos).reshape(len(trazos), -1)
+        lote = lote - lote.mean(axis=1, keepdims=True)
+        normas = np.linalg.norm(lote, axis=1, keepdims=True)
+        return lote / np.maximum(normas, 1e-6)
+
+    def reconocer_digitos(self, celdas: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Reconoce todas las celdas de una vez: cada trazo se normaliza a
+        LADO_CANONICO, se apilan en una matriz y la correlación cruzada
+        normalizada contra todos los templates es un único producto de
+        matrices (celdas x templates), en lugar de un matchTemplate por
+        celda y template.
+
+        Con el reconocedor "classifier" los mismos trazos pasan en un solo
+        lote por el clasificador (ver digit_classifier.py) en lugar de
+        compararse con los templates.
+
+        Devuelve la grilla N x N (0 en las vacías) y la confianza de cada
+        celda: la mejor correlación (o la probabilidad de la clase elegida)
+        para las celdas con trazo, aceptadas si llega a UMBRAL_ACEPTACION
+        (o UMBRAL_CLASIFICADOR), y 1.0 para las vacías.
+        """
+        n = self.GRID_SIZE
+        grilla = np.zeros(n * n, dtype=int)
+        confianza = np.ones(n * n, dtype=np.float32)
+
+        indices, trazos, tamanos = self.trazos_celdas(celdas)
+        if not len(indices):
+            return grilla.reshape(n, n), confianza.reshape(n, n)
+
+        if self.clasificador is not None:
+            clases, probabilidades = self.clasificador.predecir(trazos, tamanos)
+            self.conteos["classified"] = self.conteos.get("classified", 0) + len(indices)
+            confianza[indices] = probabilidades
+            aceptadas = (clases > 0) & (probabilidades >= UMBRAL_CLASIFICADOR)
+            grilla[indices[aceptadas]] = clases[aceptadas]
+        elif len(self._digitos_templates):
+            puntuaciones = self._normalizar_lote(trazos) @ self._matriz_templates.T
+            self.conteos["template_matches"] = self.conteos.get("template_matches", 0) + puntuaciones.size
+            mejores = puntuaciones.argmax(axis=1)
+            valores = puntuaciones[np.arange(len(indices)), mejores]
+            confianza[indices] = valores
+            aceptadas = valores >= self.UMBRAL_ACEPTACION
+            grilla[indices[aceptadas]] = self._digitos_templates[mejores[aceptadas]]
+
+        return grilla.reshape(n, n), confianza.reshape(n, n)
+
+    def trazos_celdas(self, celdas: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Índices de las celdas con trazo, sus trazos canónicos apilados en
+        una matriz (una fila de LADO_CANONICO ** 2 por celda) y el tamaño
+        relativo de cada trazo. Es la entrada de los dos reconocedores por
+        lotes y del entrenamiento del clasificador.
+        """
+        indices, trazos, tamanos = [], [], []
+        for i, celda_img in enumerate(celdas):
+            binaria = self._preprocesar_celda(celda_img)
+            # Celda vacía: casi sin píxeles blancos tras binarizar
+            if np.count_nonzero(binaria) < 150:
+                continue
+            recorte = self._recortar_trazo(binaria, MARGEN_CELDA)
+            if recorte is not None:
+                indices.append(i)
+                trazos.append(recorte[0].ravel())
+                tamanos.append(recorte[1])
+        if not trazos:
+            return (np.zeros(0, dtype=int), np.zeros((0, LADO_CANONICO ** 2), dtype=np.float32),
+                    np.zeros(0, dtype=np.float32))
+        return np.array(indices), np.stack(trazos), np.array(tamanos, dtype=np.float32)
+
+    def _iniciar_etapas(self) -> None:
+        self.tiempos = {}
+        self.conteos = {"contours": 0, "template_matches": 0}
+        self.confianza = None
+        self._capturar = self.debug_sink is not None and self.debug_sink.muestrear()
+        self._inicio_etapa = time.perf_counter()
+
+    def _etapa(self, nombre: str) -> None:
+        """Anota los ms transcurridos desde la etapa anterior"""
+        ahora = time.perf_counter()
+        self.tiempos[nombre] = (ahora - self._inicio_etapa) * 1000
+        self._inicio_etapa = ahora
 
     def obtener_grilla_final(self, imagen_path: str) -> Optional[np.ndarray]:
-        """ Orquesta el proceso completo para obtener la matriz 9x9 del Sudoku. """
+        """ Orquesta el proceso completo para obtener la matriz N x N del Sudoku. """
+        self._iniciar_etapas()
         imagen = cv2.imread(imagen_path)
+        self._etapa("decode")
         if imagen is None:
             print(f"[ERROR] No se pudo cargar la imagen: {imagen_path}")
             return None
+        return self._grilla_desde_imagen(imagen)
+
+    def obtener_grilla_desde_bytes(self, datos: bytes) -> Optional[np.ndarray]:
+        """
+        Igual que obtener_grilla_final con la imagen codificada (PNG, JPEG...)
+        en memoria: se decodifica con cv2.imdecode, sin pasar por disco.
+        """
+        self._iniciar_etapas()
+        imagen = cv2.imdecode(np.frombuffer(datos, dtype=np.uint8), cv2.IMREAD_COLOR)
+        self._etapa("decode")
+        if imagen is None:
+            print("[ERROR] No se pudo decodificar la imagen recibida")
+            return None
+        return self._grilla_desde_imagen(imagen)
+
+    def obtener_grilla_desde_array(self, imagen: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Igual que obtener_grilla_final con la imagen ya decodificada (BGR o
+        escala de grises), p. ej. una captura de pantalla convertida a numpy.
+        """
+        self._iniciar_etapas()
+        return self._grilla_desde_imagen(imagen)
 
+    def _grilla_desde_imagen(self, imagen: np.ndarray) -> Optional[np.ndarray]:
         if len(imagen.shape) == 2:
             imagen = cv2.cvtColor(imagen, cv2.COLOR_GRAY2BGR)
 
         resultados_deteccion = self.detectar_tablero(imagen)
+        self._etapa("detect")
 
         if resultados_deteccion is None or resultados_deteccion.get("roi_tablero") is None:
             print("[ERROR] No se pudo detectar el tablero de Sudoku o la ROI es nula.")
@@ -250,21 +568,18 @@ class SudokuBoardDetector:
 
         if len(roi_tablero.shape) == 3:
              roi_tablero_gris = cv2.cvtColor(roi_tablero, cv2.COLOR_BGR2GRAY)
-             roi_tablero_original_color = roi_tablero.copy()
+             # La copia en color solo se usa para la visualización
+             roi_tablero_original_color = roi_tablero.copy() if self._dibujar else None
         else:
              roi_tablero_gris = roi_tablero
              roi_tablero_original_color = None
 
         celdas_img_list = self.segmentar_celdas(roi_tablero_gris, roi_tablero_original_color)
-
-        grilla = np.zeros((self.GRID_SIZE, self.GRID_SIZE), dtype=int)
+        self._etapa("segment")
 
         print("[Paso 3] Reconociendo dígitos...")
-        for i, celda_img in enumerate(celdas_img_list):
-            r, c = divmod(i, self.GRID_SIZE)
-
-            digito = self.reconocer_digito(celda_img)
-            grilla[r, c] = digito
+        grilla, self.confianza = self.reconocer_digitos(celdas_img_list)
+        self._etapa("recognize")
 
         print("[OK] Grilla obtenida con éxito.")
         print("\nGrilla de Sudoku detectada:")
@@ -277,17 +592,23 @@ class SudokuBoardDetector:
         Resuelve el Sudoku usando la librería py-sudoku.
 
         Args:
-            grilla: Array 9x9 con 0 en celdas vacías
+            grilla: Array N x N con 0 en celdas vacías
 
         Returns:
-            Array 9x9 resuelto o None si no tiene solución
+            Array N x N resuelto o None si no tiene solución
         """
         try:
             # Convertir el array numpy a lista de listas
             board = grilla.tolist()
 
-            # Crear un objeto Sudoku con la grilla detectada
-            puzzle = Sudoku(3, 3, board=board)
+            # Descartar antes de buscar las grillas con pistas contradictorias
+            conflicto = buscar_conflictos(board, self.BOX_ROWS, self.BOX_COLS)
+            if conflicto is not None:
+                print(f"[ERROR] {conflicto.message}. Revisar las celdas: {conflicto.cells}")
+                return None
+
+            # Crear un objeto Sudoku con la grilla detectada (ancho y alto de caja)
+            puzzle = Sudoku(self.BOX_COLS, self.BOX_ROWS, board=board)
 
             # Verificar si el puzzle es válido
             if not puzzle.validate():
@@ -338,7 +659,7 @@ class SudokuBoardDetector:
 
             # Mostrar comparación
             print("\n[Comparación:]")
-            for i in range(9):
+            for i in range(self.GRID_SIZE):
                 fila_detectada = " ".join(str(x) if x != 0 else "." for x in grilla_detectada[i])
                 fila_resuelta = " ".join(str(x) for x in grilla_resuelta[i])
                 print(f"Fila {i+1}: {fila_detectada}   ->   {fila_resuelta}")
@@ -357,8 +678,8 @@ class SudokuBoardDetector:
             Lista de tuplas (fila, col, valor) con las celdas llenadas
         """
         diferencia = []
-        for i in range(9):
-            for j in range(9):
+        for i in range(original.shape[0]):
+            for j in range(original.shape[1]):
                 if original[i, j] == 0 and resuelta[i, j] != 0:
                     diferencia.append((i, j, resuelta[i, j]))
         return diferencia
@@ -400,12 +721,12 @@ class SudokuBoardDetector:
         imagen_resultado = imagen_original.copy()
 
         # Calcular dimensiones de cada celda
-        cell_w = w // 9
-        cell_h = h // 9
+        cell_w = w // self.GRID_SIZE
+        cell_h = h // self.GRID_SIZE
 
         # Dibujar los números de la solución en las celdas vacías
-        for i in range(9):
-            for j in range(9):
+        for i in range(self.GRID_SIZE):
+            for j in range(self.GRID_SIZE):
                 if grilla_detectada[i, j] == 0:  # Solo dibujar en celdas vacías
                     # Calcular posición del texto
                     text_x = x + j * cell_w + cell_w // 3
@@ -421,10 +742,8 @@ class SudokuBoardDetector:
         # Dibujar un rectángulo alrededor del tablero
         cv2.rectangle(imagen_resultado, (x, y), (x + w, y + h), (0, 255, 0), 3)
 
-        # Mostrar la imagen
-        cv2.imshow("Sudoku Resuelto", imagen_resultado)
-        cv2.waitKey(0)
-        cv2.destroyAllWindows()
+        # Mostrar la imagen (o enviarla al sink si esta ejecución se muestrea)
+        self._mostrar("solucion", "Sudoku Resuelto", imagen_resultado)
 
         # Guardar la imagen si se especifica una ruta de salida
         if output_path:
@@ -433,6 +752,50 @@ class SudokuBoardDetector:
 
         return imagen_resultado
 
+class DetectorPool:
+    """
+    Detectores reutilizables entre peticiones, por dimensiones de caja.
+
+    Cada detector guarda el estado de su última ejecución (`tiempos`,
+    `conteos`), así que se presta a una sola petición a la vez con `usar`.
+    Si no hay uno libre se crea otro (barato: los templates ya están en
+    memoria); al devolverlo se conservan como mucho `max_libres` por tamaño.
+    Todos se crean con `config` (p. ej. headless y debug_sink).
+    """
+
+    def __init__(self, max_libres: int = 8, config: Optional[Dict] = None):
+        self.max_libres = max_libres
+        self.config = config if config is not None else {}
+        self._libres: Dict[Tuple[int, int], List[SudokuBoardDetector]] = {}
+        self._lock = threading.Lock()
+
+    def _crear(self, box_rows: int, box_cols: int) -> SudokuBoardDetector:
+        return SudokuBoardDetector({**self.config, "box_rows": box_rows, "box_cols": box_cols})
+
+    def precargar(self, cantidad: int, box_rows: int = 3, box_cols: int = 3) -> None:
+        """Crea de antemano `cantidad` detectores (p. ej. al arrancar el servidor)"""
+        nuevos = [self._crear(box_rows, box_cols) for _ in range(cantidad)]
+        with self._lock:
+            libres = self._libres.setdefault((box_rows, box_cols), [])
+            libres.extend(nuevos[:max(0, self.max_libres - len(libres))])
+
+    @contextmanager
+    def usar(self, box_rows: int = 3, box_cols: int = 3) -> Iterator[SudokuBoardDetector]:
+        clave = (box_rows, box_cols)
+        with self._lock:
+            libres = self._libres.get(clave)
+            detector = libres.pop() if libres else None
+        if detector is None:
+            detector = self._crear(box_rows, box_cols)
+        try:
+            yield detector
+        finally:
+            with self._lock:
+                libres = self._libres.setdefault(clave, [])
+                if len(libres) < self.max_libres:
+                    libres.append(detector)
+
+
 # --- Ejemplo de Uso ---
 if __name__ == '__main__':
     detector = SudokuBoardDetector()
@@ -0,0 +1,142 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Métricas en proceso con formato de exposición de Prometheus. Registrar
+# una observación es una búsqueda binaria y unas sumas bajo un cerrojo;
+# el texto solo se genera cuando alguien consulta /metrics.
+
+BUCKETS_SEGUNDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                    0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_PASOS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000,
+                 10000, 50000, 100000)
+
+
+def _etiquetas(nombres: Sequence[str], valores: Tuple[str, ...], extra: str = "") -> str:
+    pares = [f'{n}="{v}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+class Counter:
+    """Contador monótono, opcionalmente con etiquetas"""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *valores: str, amount: float = 1) -> None:
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0) + amount
+
+    def render(self) -> List[str]:
+        lineas = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            valores = sorted(self._valores.items())
+        for clave, valor in valores:
+            lineas.append(f"{self.name}{_etiquetas(self.labels, clave)} {valor:g}")
+        return lineas
+
+
+class Histogram:
+    """Histograma de buckets fijos (acumulados al exponerse, como en Prometheus)"""
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, valor: float, *valores: str) -> None:
+        i = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                # [cuenta por bucket..., +Inf, suma]
+                serie = self._series[valores] = [0] * (len(self.buckets) + 2)
+            serie[i] += 1
+            serie[-1] += valor
+
+    def render(self) -> List[str]:
+        lineas = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((clave, serie[:]) for clave, serie in self._series.items())
+        for clave, serie in series:
+            acumulado = 0
+            for limite, cuenta in zip(self.buckets + (float("inf"),), serie):
+                acumulado += cuenta
+                le = "+Inf" if limite == float("inf") else f"{limite:g}"
+                etiquetas = _etiquetas(self.labels, clave, f'le="{le}"')
+                lineas.append(f"{self.name}_bucket{etiquetas} {acumulado}")
+            lineas.append(f"{self.name}_sum{_etiquetas(self.labels, clave)} {serie[-1]:g}")
+            lineas.append(f"{self.name}_count{_etiquetas(self.labels, clave)} {acumulado}")
+        return lineas
+
+
+class Gauge:
+    """Valor instantáneo calculado al exponerse (p. ej. estadísticas de la caché)"""
+
+    def __init__(self, name: str, help: str, funcion: Callable[[], float]):
+        self.name = name
+        self.help = help
+        self.funcion = funcion
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge",
+                f"{self.name} {float(self.funcion()):g}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metricas = []
+
+    def register(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def render(self) -> str:
+        lineas = []
+        for metrica in self._metricas:
+            lineas.extend(metrica.render())
+        return "\n".join(lineas) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que cuenta peticiones por ruta y código de estado y
+    mide su duración. Usa la plantilla de la ruta (p. ej. /solve) para no
+    multiplicar series con rutas desconocidas.
+    """
+
+    def __init__(self, app, peticiones: Counter, duracion: Histogram):
+        self.app = app
+        self.peticiones = peticiones
+        self.duracion = duracion
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        estado = 500
+
+        async def enviar(mensaje):
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+            await send(mensaje)
+
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            ruta = getattr(scope.get("route"), "path", "other")
+            self.peticiones.inc(ruta, str(estado))
+            self.duracion.observe(time.perf_counter() - inicio, ruta)
@@ -23,17 +23,17 @@ try:
     
     print("[+] Tomando captura de toda la pantalla...")
     
-    # 1. Capturar TODA la ventana del navegador (sin depender del canvas)
-    screenshot_filename = "sudoku_pantalla_completa.png"
-    driver.save_screenshot(screenshot_filename)
-    print(f"[+] Captura de pantalla completa guardada como: '{screenshot_filename}'")
+    # 1. Capturar TODA la ventana del navegador (sin depender del canvas),
+    # como PNG en memoria: no se escribe a disco
+    screenshot_png = driver.get_screenshot_as_png()
+    print(f"[+] Captura de pantalla completa tomada ({len(screenshot_png)} bytes)")
     
     # --- Procesar la imagen con la lógica existente ---
     print("\n[+] Procesando la imagen para detectar el Sudoku...")
     detector = SudokuBoardDetector()
     
     # Obtener la grilla de números detectada
-    grilla_detectada = detector.obtener_grilla_final(screenshot_filename)
+    grilla_detectada = detector.obtener_grilla_desde_bytes(screenshot_png)
     
     if grilla_detectada is None:
         print("[-] No se pudo detectar el tablero en la imagen. Saliendo.")
@@ -0,0 +1,150 @@
+import threading
+from typing import List, Optional
+
+from bitmask_solver import BitmaskSudokuSolver
+from dlx_solver import DLXSudokuSolver
+from limits import Budget, BudgetExceeded
+from logic_solver import LogicSudokuSolver
+
+MOTORES = {
+    "bitmask": BitmaskSudokuSolver,
+    "dlx": DLXSudokuSolver,
+    "logic": LogicSudokuSolver,
+}
+
+# Motores por clase de puzzle; con dos o más se lanzan en carrera y el
+# primero en terminar cancela al resto. Ajustable con los `method` de producción.
+RUTAS = {
+    "easy": ("bitmask",),
+    "hard": ("bitmask", "dlx"),
+    "nxn": ("bitmask",),
+}
+
+# Celdas sin decidir tras la propagación a partir de las cuales el puzzle es
+# "hard": en los corpus de benchmark.py por debajo de este valor ningún motor
+# pasa de unos pocos ms, por encima aparecen las colas largas
+UMBRAL_DIFICIL = 55
+
+# Ventaja del primer motor de una carrera: el resto solo arranca si no ha
+# terminado en este tiempo. La mayoría de puzzles "hard" se resuelven antes
+# y no pagan la carrera (con el GIL los motores se reparten la CPU)
+VENTAJA_MS = 20
+
+
+class PortfolioSolver:
+    """
+    Motor de cartera: hace una pasada barata de propagación, clasifica el
+    puzzle por las celdas que quedan sin decidir y lo envía al motor más
+    adecuado o lanza una carrera entre varios (en hilos, con cancelación
+    cooperativa a través del presupuesto y ventaja para el primero).
+
+    Tras `solve`, `puzzle_class` indica la clase asignada y `method` el
+    motor ganador ("portfolio:<motor>"). `steps` son los del ganador.
+    """
+
+    def __init__(self, budget: Optional[Budget] = None):
+        self.steps = 0
+        self.budget = budget
+        self.puzzle_class = ""
+        self.method = "portfolio"
+
+    def solve(self, grid: List[List[int]], box_rows: Optional[int] = None,
+              box_cols: Optional[int] = None) -> Optional[List[List[int]]]:
+        self.steps = 0
+        self.method = "portfolio"
+        n = len(grid)
+
+        candidatos = BitmaskSudokuSolver().propagate(grid, box_rows, box_cols)
+        if candidatos is None:
+            self.puzzle_class = "propagation"
+            self.method = "portfolio:propagation"
+            return None
+
+        # Los motores parten de la grilla ya propagada
+        pendientes = sum(1 for m in candidatos if m & (m - 1))
+        reducida = [[0 if m & (m - 1) else m.bit_length() for m in candidatos[r * n:(r + 1) * n]]
+                    for r in range(n)]
+        if not pendientes:
+            self.puzzle_class = "propagation"
+            self.method = "portfolio:propagation"
+            return reducida
+
+        if n != 9:
+            self.puzzle_class = "nxn"
+        else:
+            self.puzzle_class = "hard" if pendientes >= UMBRAL_DIFICIL else "easy"
+
+        motores = RUTAS[self.puzzle_class]
+        if len(motores) == 1:
+            solver = MOTORES[motores[0]](self.budget)
+            try:
+                return solver.solve(reducida) if n == 9 else solver.solve(reducida, box_rows, box_cols)
+            finally:
+                self.steps = solver.steps
+                self.method = f"portfolio:{motores[0]}"
+        return self._competir(motores, reducida)
+
+    def _competir(self, motores, grid: List[List[int]]) -> Optional[List[List[int]]]:
+        """Ejecuta los motores a la vez; el primero en terminar cancela al resto"""
+        base = self.budget if self.budget is not None else Budget()
+        budgets = {nombre: base.derive() for nombre in motores}
+        solvers = {nombre: MOTORES[nombre](budgets[nombre]) for nombre in motores}
+        resultado = {}
+        cerrojo = threading.Lock()
+        terminado = threading.Event()
+
+        errores = []
+
+        def correr(nombre: str) -> None:
+            # Toda excepción se guarda: en un hilo se perdería y en el
+            # principal dejaría la carrera sin esperar a los demás
+            try:
+                solucion = solvers[nombre].solve(grid)
+            except BudgetExceeded as e:
+                if not budgets[nombre].cancelled:
+                    errores.append(e)
+                return
+            except Exception as e:
+                errores.append(e)
+                return
+            with cerrojo:
+                if "ganador" in resultado:
+                    return
+                resultado["ganador"] = nombre
+                resultado["solucion"] = solucion
+            terminado.set()
+            for otro in motores:
+                if otro != nombre:
+                    budgets[otro].cancel()
+
+        def correr_con_retraso(nombre: str) -> None:
+            if not terminado.wait(VENTAJA_MS / 1000):
+                correr(nombre)
+
+        hilos = [threading.Thread(target=correr_con_retraso, args=(nombre,), daemon=True)
+                 for nombre in motores[1:]]
+        for hilo in hilos:
+            hilo.start()
+        correr(motores[0])
+        for hilo in hilos:
+            hilo.join()
+
+        if "ganador" not in resultado:
+            self.steps = max(s.steps for s in solvers.values())
+            # Ningún motor terminó: se agotó el presupuesto común (lo más
+            # informativo si además alguno falló) o todos fallaron
+            agotado = next((e for e in errores if isinstance(e, BudgetExceeded)), None)
+            if agotado is not None or errores:
+                raise agotado or errores[0]
+            # Sin error registrado no debería ocurrir: se resuelve en serie
+            solver = MOTORES[motores[0]](self.budget)
+            try:
+                return solver.solve(grid)
+            finally:
+                self.steps = solver.steps
+                self.method = f"portfolio:{motores[0]}"
+
+        ganador = resultado["ganador"]
+        self.steps = solvers[ganador].steps
+        self.method = f"portfolio:{ganador}"
+        return resultado["solucion"]
@@ -0,0 +1,148 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from bitmask_solver import POPCOUNT
+from logic_solver import LogicSudokuSolver
+
+
+class SesionSudoku:
+    """
+    Estado de una partida interactiva 9x9.
+
+    Guarda la grilla del usuario, la solución (calculada una sola vez al
+    crear la sesión) y un motor lógico cuyos candidatos se actualizan de
+    forma incremental: cada celda rellenada se coloca en él y cada pista
+    avanza solo las deducciones necesarias. Como el motor solo contiene
+    hechos ciertos, borrar una celda del usuario no obliga a recalcularlo.
+    """
+
+    def __init__(self, grid: List[List[int]], solucion: List[List[int]]):
+        self.grid = [fila[:] for fila in grid]
+        self.solucion = solucion
+        self.pistas_iniciales = {(r, c) for r in range(9) for c in range(9) if grid[r][c]}
+        self.logica = LogicSudokuSolver()
+        self.logica.iniciar(grid)
+        # Celdas ya deducidas por el motor que el usuario aún no ha rellenado
+        self._deducidas: Dict[tuple, dict] = {}
+        self.lock = threading.Lock()
+
+    @property
+    def restantes(self) -> int:
+        return sum(1 for fila in self.grid for v in fila if not v)
+
+    def rellenar(self, r: int, c: int, valor: int) -> bool:
+        """
+        Rellena (o borra con 0) una celda del usuario. Devuelve False sin
+        cambiar nada si el valor no coincide con la solución; ValueError
+        si la celda es una pista inicial.
+        """
+        if (r, c) in self.pistas_iniciales:
+            raise ValueError(f"La celda ({r},{c}) es una pista inicial")
+        if valor and valor != self.solucion[r][c]:
+            return False
+        self.grid[r][c] = valor
+        if valor:
+            self.logica.colocar(r, c, valor)
+        return True
+
+    def pista(self) -> Optional[dict]:
+        """
+        Siguiente movimiento: la deducción lógica más barata que coloca un
+        dígito en una celda vacía, con las eliminaciones que la preceden.
+        Si la lógica se atasca se toma de la solución la celda vacía con
+        menos candidatos. None si la grilla está completa.
+        """
+        for (r, c), paso in self._deducidas.items():
+            if not self.grid[r][c]:
+                return {"cell": [r, c], "value": paso["value"], "technique": paso["t"], "explanation": []}
+
+        explicacion = []
+        while True:
+            antes = len(self.logica.trace)
+            if not self.logica.paso():
+                break
+            for paso in self.logica.trace[antes:]:
+                if "value" not in paso:
+                    explicacion.append(paso)
+                    continue
+                r, c = paso["cell"]
+                if not self.grid[r][c]:
+                    self._deducidas[(r, c)] = paso
+                    return {"cell": [r, c], "value": paso["value"], "technique": paso["t"],
+                            "explanation": explicacion}
+
+        vacias = [(r, c) for r in range(9) for c in range(9) if not self.grid[r][c]]
+        if not vacias:
+            return None
+        r, c = min(vacias, key=lambda rc: POPCOUNT[self.logica.candidatos(*rc)])
+        return {"cell": [r, c], "value": self.solucion[r][c], "technique": "solution",
+                "explanation": explicacion}
+
+
+class SessionStore:
+    """
+    Sesiones en memoria con caducidad por inactividad (`ttl_s`) y un
+    máximo de sesiones; al superarlo se expulsa la usada hace más tiempo.
+    Las caducadas se purgan al acceder, sin hilos de limpieza.
+    """
+
+    def __init__(self, ttl_s: float = 900, max_sessions: int = 10000):
+        self.ttl_s = ttl_s
+        self.max_sessions = max_sessions
+        self.expired = 0
+        self._sesiones: "OrderedDict[str, SesionSudoku]" = OrderedDict()
+        self._ultimo_uso: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _purgar(self, ahora: float) -> None:
+        # Ordenadas por último uso: las caducadas están al principio
+        while self._sesiones:
+            clave = next(iter(self._sesiones))
+            if ahora - self._ultimo_uso[clave] < self.ttl_s:
+                break
+            self._eliminar(clave)
+            self.expired += 1
+
+    def _eliminar(self, clave: str) -> None:
+        del self._sesiones[clave]
+        del self._ultimo_uso[clave]
+
+    def crear(self, sesion: SesionSudoku) -> str:
+        clave = secrets.token_urlsafe(16)
+        ahora = time.monotonic()
+        with self._lock:
+            self._purgar(ahora)
+            self._sesiones[clave] = sesion
+            self._ultimo_uso[clave] = ahora
+            while len(self._sesiones) > self.max_sessions:
+                self._eliminar(next(iter(self._sesiones)))
+        return clave
+
+    def obtener(self, clave: str) -> Optional[SesionSudoku]:
+        """Devuelve la sesión y renueva su caducidad; None si no existe o caducó"""
+        ahora = time.monotonic()
+        with self._lock:
+            self._purgar(ahora)
+            sesion = self._sesiones.get(clave)
+            if sesion is not None:
+                self._sesiones.move_to_end(clave)
+                self._ultimo_uso[clave] = ahora
+            return sesion
+
+    def eliminar(self, clave: str) -> bool:
+        with self._lock:
+            if clave not in self._sesiones:
+                return False
+            self._eliminar(clave)
+            return True
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self._sesiones),
+            "max_sessions": self.max_sessions,
+            "ttl_s": self.ttl_s,
+            "expired": self.expired,
+        }
@@ -0,0 +1,107 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+# Almacén persistente de soluciones en SQLite, compartido por todos los
+# procesos (workers de uvicorn y pool de resolución) y que sobrevive a los
+# reinicios. Cada proceso e hilo abre su propia conexión; el modo WAL
+# permite lecturas concurrentes mientras otro proceso escribe.
+
+# Cada cuántas escrituras (por proceso) se comprueba el límite de tamaño
+COMPACTAR_CADA = 1000
+
+# Al compactar se deja el almacén en esta fracción del máximo
+FRACCION_TRAS_COMPACTAR = 0.9
+
+# Solo se renueva la fecha de uso de una entrada leída si es más antigua
+# que esto, para no convertir cada acierto en una escritura
+RENOVAR_USO_S = 60
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS solutions (
+    key TEXT PRIMARY KEY,
+    solution TEXT NOT NULL,
+    last_used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS solutions_last_used ON solutions (last_used);
+"""
+
+
+class SolutionStore:
+    """
+    Soluciones indexadas por una clave de texto (la forma canónica de 81
+    caracteres), con un máximo de `max_entries`. Al superarlo se borran las
+    usadas hace más tiempo y se devuelve el espacio libre al sistema.
+
+    Los errores de SQLite (p. ej. base bloqueada demasiado tiempo por otro
+    proceso) se propagan como sqlite3.Error: quien llama decide si ignorarlos.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000, timeout_s: float = 1.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.timeout_s = timeout_s
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._escrituras = 0
+        with self._conexion() as con:
+            self._compactar(con)
+
+    def _conexion(self) -> sqlite3.Connection:
+        # Una conexión por hilo y proceso: las heredadas tras un fork no se usan
+        con = getattr(self._local, "con", None)
+        if con is None or self._local.pid != os.getpid():
+            con = sqlite3.connect(self.path, timeout=self.timeout_s)
+            # auto_vacuum solo tiene efecto al crear la base (antes de las tablas)
+            con.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            con.execute("PRAGMA journal_mode = WAL")
+            con.execute("PRAGMA synchronous = NORMAL")
+            con.executescript(_ESQUEMA)
+            self._local.con = con
+            self._local.pid = os.getpid()
+        return con
+
+    def get(self, clave: str) -> Optional[str]:
+        con = self._conexion()
+        fila = con.execute("SELECT solution, last_used FROM solutions WHERE key = ?", (clave,)).fetchone()
+        if fila is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        ahora = time.time()
+        if ahora - fila[1] > RENOVAR_USO_S:
+            with con:
+                con.execute("UPDATE solutions SET last_used = ? WHERE key = ?", (ahora, clave))
+        return fila[0]
+
+    def put(self, clave: str, solucion: str) -> None:
+        con = self._conexion()
+        with con:
+            con.execute("INSERT OR REPLACE INTO solutions (key, solution, last_used) VALUES (?, ?, ?)",
+                        (clave, solucion, time.time()))
+        self._escrituras += 1
+        if self._escrituras % COMPACTAR_CADA == 0:
+            self._compactar(con)
+
+    def _compactar(self, con: sqlite3.Connection) -> None:
+        """Borra las entradas menos usadas si se supera el máximo"""
+        total = con.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+        if total <= self.max_entries:
+            return
+        sobrantes = total - int(self.max_entries * FRACCION_TRAS_COMPACTAR)
+        with con:
+            con.execute("DELETE FROM solutions WHERE key IN "
+                        "(SELECT key FROM solutions ORDER BY last_used LIMIT ?)", (sobrantes,))
+        con.execute("PRAGMA incremental_vacuum")
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "size": self._conexion().execute("SELECT COUNT(*) FROM solutions").fetchone()[0],
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
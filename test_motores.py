@@ -0,0 +1,129 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+from batch_solver import solve_many
+from bitmask_solver import BitmaskSudokuSolver, dimensiones_caja
+from canonical_cache import aplicar, canonicalizar, invertir
+from dlx_solver import DLXSudokuSolver
+from logic_solver import LogicSudokuSolver
+from portfolio import PortfolioSolver
+from wire_format import desempaquetar, empaquetar, parsear_linea
+
+CORPORA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpora")
+
+MOTORES = {
+    "bitmask": BitmaskSudokuSolver,
+    "dlx": DLXSudokuSolver,
+    "logic": LogicSudokuSolver,
+    "portfolio": PortfolioSolver,
+}
+
+
+def cargar(corpus: str, cantidad: int):
+    with open(os.path.join(CORPORA_DIR, f"{corpus}.txt")) as f:
+        lineas = [linea for linea in f if linea.strip() and not linea.startswith("#")]
+    return [parsear_linea(linea) for linea in lineas[:cantidad]]
+
+
+PUZZLES = cargar("easy", 2) + cargar("hard", 2) + cargar("17clue", 2)
+
+
+def es_solucion(puzzle, solucion) -> bool:
+    """La solución respeta las pistas y cada fila, columna y caja tiene 1..n"""
+    n = len(puzzle)
+    box_rows, box_cols = dimensiones_caja(n)
+    s = np.asarray(solucion)
+    digitos = list(range(1, n + 1))
+    cajas = [s[r:r + box_rows, c:c + box_cols].ravel()
+             for r in range(0, n, box_rows) for c in range(0, n, box_cols)]
+    return (all(puzzle[r][c] in (0, s[r, c]) for r in range(n) for c in range(n))
+            and all(sorted(u) == digitos for u in [*s, *s.T, *cajas]))
+
+
+def contradictoria():
+    """Puzzle válido con una pista repetida en su primera fila"""
+    grid = [fila[:] for fila in PUZZLES[0]]
+    r, c = next((0, c) for c in range(9) if grid[0][c])
+    vacia = next(k for k in range(9) if not grid[0][k])
+    grid[0][vacia] = grid[r][c]
+    return grid
+
+
+@pytest.mark.parametrize("grid", PUZZLES)
+def test_motores_coinciden(grid):
+    soluciones = {nombre: motor().solve(grid) for nombre, motor in MOTORES.items()}
+    lote, resueltos = solve_many(np.array([grid]))
+    soluciones["batch"] = lote[0].tolist() if resueltos[0] else None
+
+    assert es_solucion(grid, soluciones["bitmask"])
+    # Son de solución única: todos los motores han de dar la misma
+    assert all(s == soluciones["bitmask"] for s in soluciones.values())
+    assert BitmaskSudokuSolver().count(grid, 2) == DLXSudokuSolver().count(grid, 2) == 1
+
+
+def test_conteo_coincide_con_varias_soluciones():
+    grid = [fila[:] for fila in PUZZLES[0]]
+    for r, c in [(r, c) for r in range(9) for c in range(9) if grid[r][c]][:12]:
+        grid[r][c] = 0
+
+    total = DLXSudokuSolver().count(grid, 10000)
+    assert total > 1
+    assert BitmaskSudokuSolver().count(grid, 10000) == total
+    assert BitmaskSudokuSolver().count(grid, 3) == DLXSudokuSolver().count(grid, 3) == 3
+
+
+@pytest.mark.parametrize("grid", cargar("16x16", 2))
+def test_motores_nxn(grid):
+    for motor in (BitmaskSudokuSolver, PortfolioSolver):
+        assert es_solucion(grid, motor().solve(grid, 4, 4))
+    assert BitmaskSudokuSolver().count(grid, 1, 4, 4) == 1
+
+
+def test_grilla_contradictoria():
+    grid = contradictoria()
+    for motor in MOTORES.values():
+        assert motor().solve(grid) is None
+    assert BitmaskSudokuSolver().count(grid) == DLXSudokuSolver().count(grid) == 0
+    _, resueltos = solve_many(np.array([grid]))
+    assert not resueltos[0]
+
+
+def test_empaquetar_ida_y_vuelta():
+    grids = [*PUZZLES, BitmaskSudokuSolver().solve(PUZZLES[0]), [[0] * 9 for _ in range(9)]]
+    datos = empaquetar(grids)
+
+    assert len(datos) == 41 * len(grids)
+    assert desempaquetar(datos).tolist() == grids
+    assert desempaquetar(empaquetar([])).shape == (0, 9, 9)
+    with pytest.raises(ValueError):
+        desempaquetar(datos[:-1])
+
+
+def transformar(grid, rng: random.Random):
+    """Grilla equivalente: bandas, pilas, filas, columnas, transposición y dígitos"""
+    def orden():
+        return [b * 3 + i for b in rng.sample(range(3), 3) for i in rng.sample(range(3), 3)]
+
+    filas, columnas = orden(), orden()
+    etiquetas = [0] + rng.sample(range(1, 10), 9)
+    nueva = [[etiquetas[grid[f][c]] for c in columnas] for f in filas]
+    return [list(fila) for fila in zip(*nueva)] if rng.random() < 0.5 else nueva
+
+
+@pytest.mark.parametrize("grid", PUZZLES[:4])
+def test_canonicalizar_invertir(grid):
+    rng = random.Random(7)
+    solucion = BitmaskSudokuSolver().solve(grid)
+    clave, tr = canonicalizar(grid)
+
+    # Invertir deshace aplicar, y la forma canónica no depende de la simetría
+    assert invertir(aplicar(solucion, tr), tr) == solucion
+    for _ in range(3):
+        equivalente = transformar(grid, rng)
+        clave_eq, tr_eq = canonicalizar(equivalente)
+        assert clave_eq == clave
+        # La solución guardada en forma canónica resuelve la grilla equivalente
+        assert es_solucion(equivalente, invertir(aplicar(solucion, tr), tr_eq))
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from digit_classifier import CELDAS_PATH, GRILLA_CELDAS
+from main import SudokuBoardDetector
+
+
+@pytest.mark.parametrize("reconocedor", ["templates", "classifier"])
+def test_reconoce_celdas_png(reconocedor):
+    detector = SudokuBoardDetector({"headless": True, "recognizer": reconocedor})
+    detector._iniciar_etapas()
+    imagen = cv2.imread(CELDAS_PATH, cv2.IMREAD_GRAYSCALE)
+
+    grilla, confianza = detector.reconocer_digitos(detector.segmentar_celdas(imagen))
+
+    assert grilla.tolist() == GRILLA_CELDAS
+    assert confianza.shape == (9, 9)
+
+
+def test_templates_se_reconocen_a_si_mismos():
+    detector = SudokuBoardDetector({"headless": True})
+    detector._iniciar_etapas()
+    digitos = sorted(detector.templates)
+    celdas = [np.pad(detector.templates[d], 8, constant_values=255) for d in digitos]
+    celdas += [np.full((60, 60), 255, dtype=np.uint8)] * (81 - len(celdas))
+
+    grilla, _ = detector.reconocer_digitos(celdas)
+
+    assert grilla.ravel()[:len(digitos)].tolist() == digitos
+    assert not grilla.ravel()[len(digitos):].any()
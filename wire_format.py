@@ -0,0 +1,103 @@
+import json
+from typing import List, Union
+
+import numpy as np
+
+# Bytes por grilla en el formato binario empaquetado: 81 celdas de 4 bits
+# (dos por byte, nibble alto primero) y un nibble final de relleno a cero
+BYTES_POR_GRILLA = 41
+
+# Traducción de caracteres a valores en una sola pasada: '1'-'9' a su
+# dígito, '0' y '.' a 0 y cualquier otro byte a 0xFF (inválido)
+_INVALIDO = 0xFF
+_A_VALOR = bytearray([_INVALIDO]) * 256
+for _d in range(10):
+    _A_VALOR[48 + _d] = _d
+_A_VALOR[ord(".")] = 0
+_A_VALOR = bytes(_A_VALOR)
+
+# Traducción inversa de valores a caracteres (0 = '.')
+_A_CARACTER = bytes([ord(".")]) + b"123456789" + bytes(246)
+
+
+def parsear_cadena(texto: Union[str, bytes]) -> List[List[int]]:
+    """
+    Convierte el formato compacto de 81 caracteres en una grilla 9x9.
+    Las celdas vacías se indican con '.' o '0'. La conversión y la
+    validación se hacen en una sola pasada con bytes.translate.
+    """
+    datos = texto.encode() if isinstance(texto, str) else bytes(texto)
+    datos = datos.strip()
+    if len(datos) != 81:
+        raise ValueError(f"Se esperaban 81 caracteres, se recibieron {len(datos)}")
+
+    valores = datos.translate(_A_VALOR)
+    if _INVALIDO in valores:
+        i = valores.index(_INVALIDO)
+        raise ValueError(f"Carácter inválido en posición {i}: {datos[i:i + 1].decode(errors='replace')!r}")
+    return [list(valores[r:r + 9]) for r in range(0, 81, 9)]
+
+
+def parsear_cadenas(datos: bytes) -> List[List[List[int]]]:
+    """Convierte un cuerpo de texto con un puzzle de 81 caracteres por línea"""
+    grillas = []
+    for k, linea in enumerate(l for l in datos.split(b"\n") if l.strip()):
+        try:
+            grillas.append(parsear_cadena(linea))
+        except ValueError as e:
+            raise ValueError(f"Grilla {k}: {e}")
+    return grillas
+
+
+def grilla_a_cadena(grid: List[List[int]]) -> str:
+    """Serializa una grilla 9x9 al formato de 81 caracteres ('.' = vacía)"""
+    return bytes(v for fila in grid for v in fila).translate(_A_CARACTER).decode()
+
+
+def empaquetar(grids) -> bytes:
+    """Empaqueta grillas 9x9 en el formato binario (41 bytes por grilla)"""
+    valores = np.zeros((len(grids), 82), dtype=np.uint8)
+    if len(grids):
+        valores[:, :81] = np.asarray(grids, dtype=np.uint8).reshape(-1, 81)
+    return (valores[:, 0::2] << 4 | valores[:, 1::2]).tobytes()
+
+
+def desempaquetar(datos: bytes) -> np.ndarray:
+    """
+    Desempaqueta el formato binario en un array (N, 9, 9) de uint8.
+    Lanza ValueError si la longitud no es múltiplo de 41 o algún valor
+    no es un dígito válido.
+    """
+    if len(datos) % BYTES_POR_GRILLA:
+        raise ValueError(f"La longitud del cuerpo ({len(datos)}) no es múltiplo de {BYTES_POR_GRILLA}")
+
+    empaquetado = np.frombuffer(datos, dtype=np.uint8).reshape(-1, BYTES_POR_GRILLA)
+    valores = np.empty((len(empaquetado), 82), dtype=np.uint8)
+    valores[:, 0::2] = empaquetado >> 4
+    valores[:, 1::2] = empaquetado & 0x0F
+
+    invalidas = (valores[:, :81] > 9).any(axis=1) | (valores[:, 81] != 0)
+    if invalidas.any():
+        raise ValueError(f"Grilla {int(np.argmax(invalidas))}: valores fuera de rango")
+    return valores[:, :81].reshape(-1, 9, 9)
+
+
+def parsear_linea(linea: str) -> List[List[int]]:
+    """
+    Interpreta una línea de un flujo NDJSON de puzzles: cadena de 81
+    caracteres (con o sin comillas), grilla JSON o objeto {"grid": ...}.
+    """
+    linea = linea.strip()
+    if not linea.startswith(("[", "{", '"')):
+        return parsear_cadena(linea)
+
+    dato = json.loads(linea)
+    if isinstance(dato, dict):
+        dato = dato.get("grid")
+    if isinstance(dato, str):
+        return parsear_cadena(dato)
+    if not isinstance(dato, list) or not all(
+        isinstance(fila, list) and all(type(v) is int for v in fila) for fila in dato
+    ):
+        raise ValueError("La línea no contiene una grilla de enteros")
+    return dato